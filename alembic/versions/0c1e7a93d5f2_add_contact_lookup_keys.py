@@ -0,0 +1,85 @@
+"""add contact lookup keys
+
+Revision ID: 0c1e7a93d5f2
+Revises: 604ab64b06cf
+Create Date: 2026-10-19 11:03:17.548210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.services.normalization import normalize_email, normalize_name
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c1e7a93d5f2'
+down_revision: Union[str, None] = '604ab64b06cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column(
+        'first_name_key', sa.String(length=50), nullable=True))
+    op.add_column('contacts', sa.Column(
+        'last_name_key', sa.String(length=50), nullable=True))
+    op.add_column('contacts', sa.Column(
+        'email_key', sa.String(length=150), nullable=True))
+
+    # Accent folding is done in Python so existing rows get exactly the
+    # keys the application computes for new ones.
+    contacts = sa.table(
+        'contacts',
+        sa.column('id', sa.Integer),
+        sa.column('first_name', sa.String),
+        sa.column('last_name', sa.String),
+        sa.column('email', sa.String),
+        sa.column('first_name_key', sa.String),
+        sa.column('last_name_key', sa.String),
+        sa.column('email_key', sa.String),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(
+        contacts.c.id, contacts.c.first_name,
+        contacts.c.last_name, contacts.c.email
+    )).all()
+    if rows:
+        bind.execute(
+            contacts.update()
+            .where(contacts.c.id == sa.bindparam('row_id'))
+            .values(
+                first_name_key=sa.bindparam('first_name_key'),
+                last_name_key=sa.bindparam('last_name_key'),
+                email_key=sa.bindparam('email_key'),
+            ),
+            [{'row_id': row.id,
+              'first_name_key': normalize_name(row.first_name),
+              'last_name_key': normalize_name(row.last_name),
+              'email_key': normalize_email(row.email)} for row in rows]
+        )
+
+    for column in ('first_name', 'last_name', 'email'):
+        op.drop_index(f'ix_contacts_user_id_{column}', table_name='contacts')
+        op.create_index(
+            f'ix_contacts_user_id_{column}_key',
+            'contacts',
+            ['user_id', f'{column}_key'],
+            postgresql_ops={f'{column}_key': 'text_pattern_ops'}
+        )
+
+
+def downgrade() -> None:
+    for column in ('first_name', 'last_name', 'email'):
+        op.drop_index(
+            f'ix_contacts_user_id_{column}_key', table_name='contacts')
+        op.create_index(
+            f'ix_contacts_user_id_{column}',
+            'contacts',
+            ['user_id', column],
+            postgresql_ops={column: 'text_pattern_ops'}
+        )
+    op.drop_column('contacts', 'email_key')
+    op.drop_column('contacts', 'last_name_key')
+    op.drop_column('contacts', 'first_name_key')
@@ -0,0 +1,31 @@
+"""add User / contact_count
+
+Revision ID: 3f9d0e5c7a21
+Revises: 8e2f4b6a1c93
+Create Date: 2026-10-19 13:41:52.106377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9d0e5c7a21'
+down_revision: Union[str, None] = '8e2f4b6a1c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column(
+        'contact_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE users SET contact_count = ("
+        "SELECT count(*) FROM contacts WHERE contacts.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'contact_count')
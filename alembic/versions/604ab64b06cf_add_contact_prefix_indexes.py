@@ -0,0 +1,33 @@
+"""add contact prefix indexes
+
+Revision ID: 604ab64b06cf
+Revises: b5af2c174083
+Create Date: 2026-10-19 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '604ab64b06cf'
+down_revision: Union[str, None] = 'b5af2c174083'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for column in ('first_name', 'last_name', 'email'):
+        op.create_index(
+            f'ix_contacts_user_id_{column}',
+            'contacts',
+            ['user_id', column],
+            postgresql_ops={column: 'text_pattern_ops'}
+        )
+
+
+def downgrade() -> None:
+    for column in ('first_name', 'last_name', 'email'):
+        op.drop_index(f'ix_contacts_user_id_{column}', table_name='contacts')
@@ -0,0 +1,75 @@
+"""add birthday dispatch
+
+Revision ID: 7b3e1d9c2f48
+Revises: 5a7c2e9b4d10
+Create Date: 2026-10-19 16:24:11.630914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e1d9c2f48'
+down_revision: Union[str, None] = '5a7c2e9b4d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column(
+        'birth_month', sa.SmallInteger(), nullable=True))
+    op.add_column('contacts', sa.Column(
+        'birth_day', sa.SmallInteger(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE contacts SET "
+            "birth_month = EXTRACT(MONTH FROM birth_date), "
+            "birth_day = EXTRACT(DAY FROM birth_date)"
+        )
+    else:
+        op.execute(
+            "UPDATE contacts SET "
+            "birth_month = CAST(strftime('%m', birth_date) AS INTEGER), "
+            "birth_day = CAST(strftime('%d', birth_date) AS INTEGER)"
+        )
+    op.create_index(
+        'ix_contacts_birth_month_birth_day_user_id_id', 'contacts',
+        ['birth_month', 'birth_day', 'user_id', 'id']
+    )
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.add_column(sa.Column(
+            'dedupe_key', sa.String(length=200), nullable=True))
+        batch_op.create_unique_constraint(
+            'uq_email_outbox_dedupe_key', ['dedupe_key'])
+    op.create_table(
+        'job_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job', sa.String(length=50), nullable=False),
+        sa.Column('run_date', sa.Date(), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('shards', sa.Integer(), nullable=False),
+        sa.Column('last_user_id', sa.Integer(), server_default='0',
+                  nullable=False),
+        sa.Column('last_id', sa.Integer(), server_default='0',
+                  nullable=False),
+        sa.Column('processed', sa.Integer(), server_default='0',
+                  nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('job', 'run_date', 'shard', 'shards',
+                            name='uq_job_checkpoints_job_run_date_shard')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_checkpoints')
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.drop_constraint('uq_email_outbox_dedupe_key', type_='unique')
+        batch_op.drop_column('dedupe_key')
+    op.drop_index('ix_contacts_birth_month_birth_day_user_id_id',
+                  table_name='contacts')
+    op.drop_column('contacts', 'birth_day')
+    op.drop_column('contacts', 'birth_month')
@@ -0,0 +1,49 @@
+"""store contact phone as E.164 string
+
+Revision ID: 8e2f4b6a1c93
+Revises: 0c1e7a93d5f2
+Create Date: 2026-10-19 12:26:05.771934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2f4b6a1c93'
+down_revision: Union[str, None] = '0c1e7a93d5f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column(
+            'phone',
+            existing_type=sa.Integer(),
+            type_=sa.String(length=16),
+            postgresql_using='phone::text'
+        )
+    # Integer phones never kept a "+" or leading zeros, so the stored
+    # digits are taken to include the country code.
+    op.execute(
+        "UPDATE contacts SET phone = '+' || phone "
+        "WHERE phone NOT LIKE '+%'"
+    )
+    op.create_index(
+        'ix_contacts_user_id_phone', 'contacts', ['user_id', 'phone']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_phone', table_name='contacts')
+    op.execute("UPDATE contacts SET phone = ltrim(phone, '+')")
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column(
+            'phone',
+            existing_type=sa.String(length=16),
+            type_=sa.Integer(),
+            postgresql_using='phone::integer'
+        )
@@ -0,0 +1,27 @@
+"""add User / avatar_hash
+
+Revision ID: 9c4a2f6e1b37
+Revises: 7b3e1d9c2f48
+Create Date: 2026-10-19 17:08:45.291604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4a2f6e1b37'
+down_revision: Union[str, None] = '7b3e1d9c2f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column(
+        'avatar_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'avatar_hash')
@@ -0,0 +1,27 @@
+"""add User / plan
+
+Revision ID: b2d8e4f1a6c3
+Revises: 9c4a2f6e1b37
+Create Date: 2026-10-19 18:12:30.518822
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d8e4f1a6c3'
+down_revision: Union[str, None] = '9c4a2f6e1b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column(
+        'plan', sa.String(length=20), server_default='free', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'plan')
@@ -0,0 +1,43 @@
+"""widen contact name keys
+
+Revision ID: d7a3c5e9f2b4
+Revises: b2d8e4f1a6c3
+Create Date: 2026-10-19 21:40:52.113647
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3c5e9f2b4'
+down_revision: Union[str, None] = 'b2d8e4f1a6c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Accent and case folding can make a key longer than the name it is
+    # built from, e.g. "ß" becomes "ss" and "ﬃ" becomes "ffi".
+    with op.batch_alter_table('contacts') as batch_op:
+        for column in ('first_name_key', 'last_name_key'):
+            batch_op.alter_column(
+                column,
+                existing_type=sa.String(length=50),
+                type_=sa.Text(),
+                existing_nullable=True
+            )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('contacts') as batch_op:
+        for column in ('first_name_key', 'last_name_key'):
+            batch_op.alter_column(
+                column,
+                existing_type=sa.Text(),
+                type_=sa.String(length=50),
+                existing_nullable=True,
+                postgresql_using=f'left({column}, 50)'
+            )
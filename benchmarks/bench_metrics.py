@@ -0,0 +1,95 @@
+"""
+Measures the overhead the metrics middleware adds to a request.
+
+Two comparisons are made, each calling the app in-process through the
+ASGI interface:
+
+* ``isolated``: ``MetricsMiddleware`` around a minimal ASGI app that only
+  sends a response, so that the difference is the cost of the middleware
+  alone (counters, histogram, route lookup);
+* ``fastapi``: the same trivial FastAPI endpoint with and without the
+  middleware. The difference is the same cost, but it is small next to
+  the run-to-run noise of a full FastAPI request.
+
+The apps are timed in turns and the best round of each is kept.
+
+Run from the project root::
+
+    python -m benchmarks.bench_metrics
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+
+from src.middleware.metrics import MetricsMiddleware
+
+
+REQUESTS = 20_000
+ROUNDS = 7
+ROUTE = SimpleNamespace(path="/items/{item_id}")
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+    "method": "GET", "scheme": "http", "path": "/items/1",
+    "raw_path": b"/items/1", "query_string": b"", "root_path": "",
+    "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+}
+
+
+async def minimal_app(scope, receive, send):
+    scope["route"] = ROUTE
+    await send({"type": "http.response.start", "status": 200,
+                "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def make_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def run(app) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(SCOPE), receive, send)
+    return time.perf_counter() - start
+
+
+async def compare(bare, metrics) -> dict:
+    apps = {"bare": bare, "metrics": metrics}
+    best = {}
+    for _ in range(ROUNDS):
+        for label, app in apps.items():
+            seconds = await run(app)
+            best[label] = min(best.get(label, seconds), seconds)
+    return best
+
+
+def main() -> None:
+    for name, bare, metrics in (
+            ("isolated", minimal_app, MetricsMiddleware(minimal_app)),
+            ("fastapi", make_app(False), make_app(True))):
+        best = asyncio.run(compare(bare, metrics))
+        bare_us, metrics_us = (best[label] / REQUESTS * 1e6
+                               for label in ("bare", "metrics"))
+        print(f"{name:>8}: bare {bare_us:6.1f} us, metrics "
+              f"{metrics_us:6.1f} us, overhead "
+              f"{metrics_us - bare_us:5.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
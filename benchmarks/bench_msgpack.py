@@ -0,0 +1,47 @@
+"""
+Compares encoding and decoding a batch of contacts as JSON and MessagePack.
+
+The payload is the JSON-compatible form FastAPI produces for
+``List[ContactResponse]``, so both formats carry the same data.
+
+Run from the project root::
+
+    python -m benchmarks.bench_msgpack
+"""
+import json
+import timeit
+
+import msgpack
+import orjson
+
+from benchmarks.bench_serialization import make_rows
+from src.services.serialization import contact_rows_adapter, CONTACT_FIELDS
+
+
+ROWS = 1000
+NUMBER = 100
+
+
+def main() -> None:
+    payload = contact_rows_adapter.dump_python(
+        [dict(zip(CONTACT_FIELDS, row)) for row in make_rows(ROWS)],
+        mode="json")
+    codecs = {
+        "json": (lambda: json.dumps(payload).encode(), json.loads),
+        "orjson": (lambda: orjson.dumps(payload), orjson.loads),
+        "msgpack": (lambda: msgpack.packb(payload), msgpack.unpackb),
+    }
+    print(f"{ROWS} contacts, best of {NUMBER} runs")
+    for name, (encode, decode) in codecs.items():
+        encoded = encode()
+        assert decode(encoded) == payload
+        encode_time = min(timeit.repeat(encode, number=1, repeat=NUMBER))
+        decode_time = min(timeit.repeat(
+            lambda: decode(encoded), number=1, repeat=NUMBER))
+        print(f"{name:>8}: {len(encoded):8d} bytes, "
+              f"encode {encode_time * 1000:6.2f} ms, "
+              f"decode {decode_time * 1000:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Compares the cost of rate limiting one request, in microseconds:
+
+* ``fastapi_limiter``: the previous limiter, one script call per request;
+* ``leased``: ``RateLimiter.hit``, which leases tokens from Redis in
+  chunks and spends most of them without a round trip;
+* ``local``: ``RateLimiter.hit`` without Redis (the degraded mode).
+
+Redis is an in-process fakeredis; ``--rtt`` adds a simulated network
+round trip to every command. A lease holds ``lease_fraction`` of the
+limit, so lower ``--limit`` values mean more round trips.
+
+Needs the development requirements (``fakeredis`` and the previous
+``fastapi-limiter``)::
+
+    pip install -r requirements-dev.txt
+
+Run from the project root::
+
+    python -m benchmarks.bench_rate_limiter --rtt 0.0005
+"""
+import argparse
+import asyncio
+import time
+
+import fakeredis
+from fastapi_limiter import FastAPILimiter
+from fastapi_limiter.depends import RateLimiter as FastAPIRateLimiter
+from fastapi import Depends, FastAPI
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.services.rate_limiter import Limit, RateLimiter
+
+
+REQUESTS = 20_000
+# High enough that no request is rejected.
+LIMIT = "1000000/minute"
+PATH = "/api/contacts/"
+
+
+class LatentRedis(fakeredis.FakeAsyncRedis):
+    """
+    Waits ``rtt`` seconds before every command.
+    """
+    rtt = 0.0
+
+    async def execute_command(self, *args, **options):
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return await super().execute_command(*args, **options)
+
+
+def make_request(dependency) -> Request:
+    app = FastAPI()
+    app.get(PATH, dependencies=[Depends(dependency)])(lambda: None)
+    return Request({"type": "http", "method": "GET", "path": PATH,
+                    "headers": [], "client": ("127.0.0.1", 1), "app": app})
+
+
+async def per_request(hit, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await hit()
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def main(rtt: float, requests: int, limit: Limit) -> None:
+    LatentRedis.rtt = rtt
+
+    await FastAPILimiter.init(LatentRedis())
+    dependency = FastAPIRateLimiter(times=limit.times,
+                                    seconds=int(limit.seconds))
+    request, response = make_request(dependency), Response()
+    old = await per_request(lambda: dependency(request, response), requests)
+    await FastAPILimiter.close()
+
+    redis = LatentRedis()
+    leased = RateLimiter()
+    leased.init(redis)
+    new = await per_request(lambda: leased.hit("contacts:list:user:1",
+                                               limit), requests)
+    await redis.aclose()
+
+    local = RateLimiter()
+    degraded = await per_request(
+        lambda: local.hit("contacts:list:user:1", limit), requests)
+
+    print(f"rtt {rtt * 1000:g} ms, {requests} requests, "
+          f"{limit.times} per {limit.seconds:g} s")
+    print(f"{'fastapi_limiter':>16}: {old:9.1f} us/request")
+    print(f"{'leased':>16}: {new:9.1f} us/request")
+    print(f"{'local':>16}: {degraded:9.1f} us/request")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rtt", type=float, default=0.0,
+                        help="simulated Redis round trip, in seconds")
+    parser.add_argument("--requests", type=int, default=REQUESTS)
+    parser.add_argument("--limit", default=LIMIT,
+                        help="the limit, e.g. 600/minute")
+    args = parser.parse_args()
+    asyncio.run(main(args.rtt, args.requests, Limit.parse(args.limit)))
@@ -0,0 +1,79 @@
+"""
+Compares SMTP throughput, in messages per second, of:
+
+* ``per message``: what ``FastMail`` did — connect, log in, send and quit
+  for every message;
+* ``pool``: ``SMTPPool`` reusing a few authenticated connections.
+
+The local sink delays the greeting and the login to stand in for the TLS
+handshake and authentication of a remote relay. Relays cap the number of
+simultaneous connections per client, so both variants use at most
+``CONNECTIONS`` at a time.
+
+Run from the project root::
+
+    python -m benchmarks.bench_smtp
+"""
+import asyncio
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from src.services.smtp_pool import SMTPPool
+from tests.smtp_sink import SMTPSink
+
+
+MESSAGES = 500
+CONNECTIONS = 4
+CONNECT_DELAY = 0.02
+AUTH_DELAY = 0.01
+
+
+def make_message(number: int) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = f"Confirm your email {number}"
+    message["From"] = "sender@example.com"
+    message["To"] = f"user{number}@example.com"
+    message.set_content("<p>Please confirm</p>" * 20, subtype="html")
+    return message
+
+
+async def run(send, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(number):
+        async with semaphore:
+            await send(make_message(number))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(number) for number in range(MESSAGES)))
+    return MESSAGES / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    sink = SMTPSink(connect_delay=CONNECT_DELAY, auth_delay=AUTH_DELAY)
+    await sink.start()
+    options = dict(hostname=sink.host, port=sink.port, username="user",
+                   password="secret", start_tls=False,
+                   local_hostname="localhost")
+
+    async def per_message(message):
+        await aiosmtplib.send(message, **options)
+
+    rate = await run(per_message, CONNECTIONS)
+    print(f"{'per message':>14}: {rate:8.1f} msg/s")
+    for size in (1, CONNECTIONS):
+        pool = SMTPPool(sink.host, sink.port, username="user",
+                        password="secret", size=size)
+        pool.local_hostname = "localhost"
+        await pool.start()
+        # The pool queues the extra senders itself.
+        rate = await run(pool.send, MESSAGES)
+        await pool.close()
+        print(f"{f'pool of {size}':>14}: {rate:8.1f} msg/s")
+    await sink.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
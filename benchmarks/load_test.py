@@ -0,0 +1,444 @@
+"""
+End-to-end HTTP load test of the API.
+
+Boots ``main:app`` with uvicorn in a child process, against a local
+SQLite (default) or Postgres database and an in-process Redis stand-in,
+seeds benchmark users and contacts, then drives a weighted mix of
+requests from concurrent virtual users with an async ``httpx`` client.
+
+Per-endpoint throughput and p50/p95/p99 latency are written to a JSON
+file together with the commit hash, so that runs on two commits can be
+compared::
+
+    python -m benchmarks.load_test --output before.json
+    git checkout other-branch
+    python -m benchmarks.load_test --output after.json --baseline before.json
+
+The rate limiter is disabled: the benchmark measures the endpoints, not
+the 10 requests per minute limit.
+The birthdays endpoint uses PostgreSQL functions, so it is left out of
+the mix on SQLite.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, List
+
+DEFAULT_ENV = {
+    "SECRET_KEY": "load-test-secret",
+    "ALGORITHM": "HS256",
+    "MAIL_USERNAME": "load-test",
+    "MAIL_PASSWORD": "load-test",
+    "MAIL_FROM": "load-test@example.com",
+    "MAIL_PORT": "465",
+    "MAIL_SERVER": "localhost",
+    "CLOUDINARY_NAME": "load-test",
+    "CLOUDINARY_API_KEY": "0",
+    "CLOUDINARY_API_SECRET": "load-test",
+    "POSTGRES_DB": "load-test",
+    "POSTGRES_USER": "load-test",
+    "POSTGRES_PASSWORD": "load-test",
+    "POSTGRES_PORT": "5432",
+    "REDIS": "localhost",
+}
+
+DEFAULT_MIX = ("login=5,list=30,lookup=30,create=10,update=10,delete=5,"
+               "birthdays=10")
+PASSWORD = "load-test-password"
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the Redis client used as the user cache.
+    """
+
+    def __init__(self):
+        self.data: Dict[str, bytes] = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def serve(port: int) -> None:
+    """
+    Runs the application with the Redis stand-in and without the rate
+    limiter (child process).
+    """
+    from contextlib import asynccontextmanager
+
+    import uvicorn
+
+    from main import app
+    from src.services.auth import auth_service
+    from src.services.rate_limiter import rate_limiter
+
+    auth_service.r = LocalRedis()
+    rate_limiter.enabled = False
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+
+    app.router.lifespan_context = lifespan
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def seed(users: int, contacts: int) -> Dict[str, List[int]]:
+    """
+    Replaces the benchmark users and their contacts.
+
+    :return: The contact IDs of every benchmark user, by email.
+    :rtype: Dict[str, List[int]]
+    """
+    from sqlalchemy import delete, insert, select
+
+    from src.database.db import SessionLocal, engine
+    from src.database.models import Base, Contact, User
+    from src.services.auth import auth_service
+    from src.services.normalization import normalize_email, normalize_name
+
+    Base.metadata.create_all(bind=engine)
+    emails = [f"load-test-{i}@example.com" for i in range(users)]
+    password = auth_service.get_password_hash(PASSWORD)
+    rng = random.Random(0)
+    ids = {}
+    with SessionLocal() as db:
+        old = select(User.id).where(User.email.in_(emails))
+        db.execute(delete(Contact).where(Contact.user_id.in_(old)))
+        db.execute(delete(User).where(User.email.in_(emails)))
+        for email in emails:
+            user = User(email=email, password=password, confirmed=True,
+                        contact_count=contacts)
+            db.add(user)
+            db.flush()
+            rows = []
+            for i in range(contacts):
+                first, last = f"First{rng.randrange(500)}", f"Last{i}"
+                address = f"{first}.{last}.{user.id}@example.com"
+                birth_date = date(1960 + rng.randrange(45),
+                                  1 + rng.randrange(12),
+                                  1 + rng.randrange(28))
+                rows.append({
+                    "first_name": first,
+                    "last_name": last,
+                    "email": address,
+                    "phone": f"+38050{rng.randrange(10 ** 7):07d}",
+                    "birth_date": birth_date,
+                    "birth_month": birth_date.month,
+                    "birth_day": birth_date.day,
+                    "additional_data": "",
+                    "created_at": datetime.now(),
+                    "user_id": user.id,
+                    "first_name_key": normalize_name(first),
+                    "last_name_key": normalize_name(last),
+                    "email_key": normalize_email(address),
+                })
+            if rows:
+                db.execute(insert(Contact), rows)
+            ids[email] = list(db.scalars(
+                select(Contact.id).where(Contact.user_id == user.id)))
+        db.commit()
+    return ids
+
+
+def contact_body(rng: random.Random) -> dict:
+    suffix = rng.randrange(10 ** 9)
+    return {
+        "first_name": f"Load{suffix}",
+        "last_name": "Test",
+        "email": f"load{suffix}@example.com",
+        "phone": f"+38067{suffix % 10 ** 7:07d}",
+        "birth_date": "1990-05-17",
+        "created_at": datetime.now().isoformat(),
+        "additional_data": "created by the load test",
+    }
+
+
+class VirtualUser:
+
+    def __init__(self, email: str, contact_ids: List[int], token: str):
+        self.email = email
+        self.contact_ids = contact_ids
+        self.created: List[int] = []
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+
+async def login(client, user, rng):
+    return await client.post("/api/auth/login", data={
+        "username": user.email, "password": PASSWORD})
+
+
+async def list_contacts(client, user, rng):
+    skip = rng.randrange(max(len(user.contact_ids) - 50, 1))
+    return await client.get(f"/api/contacts/?skip={skip}&limit=50",
+                            headers=user.headers)
+
+
+async def lookup(client, user, rng):
+    if not user.contact_ids:
+        return None
+    contact_id = rng.choice(user.contact_ids)
+    return await client.get(f"/api/contacts/{contact_id}",
+                            headers=user.headers)
+
+
+async def create(client, user, rng):
+    response = await client.post("/api/contacts/", json=contact_body(rng),
+                                 headers=user.headers)
+    if response.status_code == 201:
+        user.created.append(response.json()["id"])
+    return response
+
+
+async def update(client, user, rng):
+    if not user.contact_ids:
+        return None
+    contact_id = rng.choice(user.contact_ids)
+    return await client.put(f"/api/contacts/{contact_id}",
+                            json=contact_body(rng), headers=user.headers)
+
+
+async def remove(client, user, rng):
+    # Only contacts created during the run are deleted, so that the
+    # seeded data set keeps its size.
+    if not user.created:
+        return None
+    contact_id = user.created.pop(rng.randrange(len(user.created)))
+    return await client.delete(f"/api/contacts/{contact_id}",
+                               headers=user.headers)
+
+
+async def birthdays(client, user, rng):
+    return await client.get("/api/contacts/birthdays/",
+                            headers=user.headers)
+
+
+OPERATIONS = {
+    "login": login,
+    "list": list_contacts,
+    "lookup": lookup,
+    "create": create,
+    "update": update,
+    "delete": remove,
+    "birthdays": birthdays,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in filter(None, mix.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{name}' in --mix")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(values: List[float], p: float) -> float:
+    index = max(math.ceil(p / 100 * len(values)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def drive(base_url: str, seeded: Dict[str, List[int]],
+                weights: Dict[str, float], args) -> dict:
+    import httpx
+
+    names, cumulative = list(weights), list(weights.values())
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits,
+                                 timeout=30) as client:
+        users = []
+        for email, contact_ids in seeded.items():
+            response = await client.post("/api/auth/login", data={
+                "username": email, "password": PASSWORD})
+            response.raise_for_status()
+            users.append(VirtualUser(
+                email, contact_ids, response.json()["access_token"]))
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        start = time.perf_counter()
+        measure_from = start + args.warmup
+        deadline = measure_from + args.duration
+
+        async def worker(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, cumulative)[0]
+                user = rng.choice(users)
+                began = time.perf_counter()
+                try:
+                    response = await OPERATIONS[name](client, user, rng)
+                except httpx.HTTPError:
+                    response = False
+                if response is None:
+                    continue
+                if began < measure_from:
+                    continue
+                if response is False or response.status_code >= 400:
+                    errors[name] += 1
+                else:
+                    latencies[name].append(time.perf_counter() - began)
+
+        await asyncio.gather(*(worker(args.seed + i)
+                               for i in range(args.concurrency)))
+
+    seconds = args.duration
+    endpoints = {name: summarize(latencies[name], errors[name], seconds)
+                 for name in weights}
+    everything = [value for values in latencies.values()
+                  for value in values]
+    return {
+        "endpoints": endpoints,
+        "total": summarize(everything, sum(errors.values()), seconds),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def wait_until_ready(base_url: str, process, timeout: float = 30) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("The application exited during startup")
+        try:
+            if httpx.get(base_url + "/").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("The application did not start in time")
+
+
+def print_report(results: dict, baseline: dict | None) -> None:
+    print(f"{'endpoint':<10} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'errors':>7}" + ("  p95 vs baseline" if baseline else ""))
+    rows = dict(results["endpoints"], total=results["total"])
+    for name, row in rows.items():
+        line = (f"{name:<10} {row['rps']:>8} {row.get('p50_ms', '-'):>8} "
+                f"{row.get('p95_ms', '-'):>8} {row.get('p99_ms', '-'):>8} "
+                f"{row['errors']:>7}")
+        if baseline:
+            old = dict(baseline["endpoints"],
+                       total=baseline["total"]).get(name, {})
+            if old.get("p95_ms") and row.get("p95_ms"):
+                change = (row["p95_ms"] / old["p95_ms"] - 1) * 100
+                line += f"  {change:+.1f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url",
+                        help="Defaults to a temporary SQLite file.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts", type=int, default=200,
+                        help="Contacts seeded per user.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20,
+                        help="Measured seconds, after the warm-up.")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="Operation weights, e.g. list=3,lookup=1.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--baseline",
+                        help="A previous results file to compare with.")
+    parser.add_argument("--serve", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    for key, value in DEFAULT_ENV.items():
+        os.environ.setdefault(key, value)
+    if args.serve:
+        serve(args.port)
+        return
+    database_url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "load_test.db")
+    os.environ["SQLALCHEMY_DATABASE_URL"] = database_url
+    weights = parse_mix(args.mix)
+    if database_url.startswith("sqlite") and \
+            weights.pop("birthdays", None) is not None:
+        print("Skipping birthdays: the endpoint needs PostgreSQL")
+    if not weights:
+        raise SystemExit("No operation left to run in --mix")
+
+    seeded = seed(args.users, args.contacts)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--serve",
+         "--port", str(args.port)])
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url, process)
+        results = asyncio.run(drive(base_url, seeded, weights, args))
+    finally:
+        process.terminate()
+        process.wait()
+
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0],
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("serve", "baseline", "output",
+                                  "database_url")},
+        **results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_report(results, baseline)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
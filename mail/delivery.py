@@ -0,0 +1,170 @@
+"""
+The delivery queue of the mail service.
+
+Accepted messages wait in bounded in-memory queues and are sent by a
+fixed number of worker tasks over a pool of reused SMTP connections. The
+number of messages sent at the same time to one recipient domain is
+limited, since receiving servers throttle or defer senders that open too
+many sessions.
+"""
+import asyncio
+from collections import defaultdict, deque
+from email.message import EmailMessage
+from time import perf_counter
+from typing import Deque, Dict, List, Optional, Tuple
+
+from src.services.metrics import (CallbackMetric, Counter, Histogram,
+                                  Registry)
+from src.services.smtp_pool import SMTPPool
+
+
+class DeliveryQueue:
+    """
+    Each recipient domain has its own queue, and only the messages its
+    ``per_domain_limit`` allows are handed to the workers. A worker never
+    waits for a domain, so a batch for one domain cannot hold up the
+    messages for the others.
+    """
+
+    def __init__(self, pool: SMTPPool, queue_size: int = 10000,
+                 workers: int = 16, per_domain_limit: int = 4):
+        self.pool = pool
+        self.queue_size = queue_size
+        self.workers = workers
+        self.per_domain_limit = per_domain_limit
+        # Messages the workers may send right away.
+        self.ready: Optional[asyncio.Queue] = None
+        # Messages held back by the limit of their domain.
+        self.held: Dict[str, Deque[Tuple[float, EmailMessage]]] = \
+            defaultdict(deque)
+        # Messages of each domain that are ready or being sent.
+        self.active: Dict[str, int] = defaultdict(int)
+        self.waiting = 0
+        self.unfinished = 0
+        self.idle: Optional[asyncio.Event] = None
+        self.tasks: List[asyncio.Task] = []
+
+        self.registry = Registry()
+        self.registry.register(CallbackMetric(
+            "mail_queue_depth", "Messages waiting to be sent.", "gauge",
+            lambda: self.waiting))
+        self.accepted = self.registry.register(Counter(
+            "mail_messages_accepted_total", "Messages accepted for delivery."))
+        self.rejected = self.registry.register(Counter(
+            "mail_messages_rejected_total",
+            "Messages rejected because the queue was full."))
+        self.delivered = self.registry.register(Counter(
+            "mail_messages_delivered_total",
+            "Delivery attempts by outcome.", ("status",)))
+        self.delivery_seconds = self.registry.register(Histogram(
+            "mail_delivery_seconds",
+            "Time to send one message."))
+        self.queue_seconds = self.registry.register(Histogram(
+            "mail_queue_seconds",
+            "Time messages wait in the queue, including the wait for "
+            "their domain.",
+            buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)))
+
+    async def start(self) -> None:
+        """
+        Starts the SMTP pool and the worker tasks.
+        """
+        self.ready = asyncio.Queue()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        await self.pool.start()
+        self.tasks = [asyncio.create_task(self._work())
+                      for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 30) -> None:
+        """
+        Waits for the queued messages to be sent, then stops the workers
+        and closes the SMTP connections.
+
+        :param drain_timeout: Seconds to wait for the queue to drain.
+        :type drain_timeout: float
+        """
+        try:
+            await asyncio.wait_for(self.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.pool.close()
+
+    def free_slots(self) -> int:
+        return self.queue_size - self.waiting
+
+    async def join(self) -> None:
+        """
+        Waits until every accepted message has been sent or has failed.
+        """
+        await self.idle.wait()
+
+    def submit(self, messages: List[EmailMessage]) -> bool:
+        """
+        Queues a batch of messages, all or none.
+
+        :param messages: The messages, with their sender and recipient set.
+        :type messages: List[EmailMessage]
+        :return: False if the queue has no room for the whole batch.
+        :rtype: bool
+        """
+        if len(messages) > self.free_slots():
+            self.rejected.inc(amount=len(messages))
+            return False
+        now = perf_counter()
+        for message in messages:
+            domain = message["To"].rpartition("@")[2].strip(" >").lower()
+            if self.active[domain] < self.per_domain_limit:
+                self.active[domain] += 1
+                self.ready.put_nowait((domain, now, message))
+            else:
+                self.held[domain].append((now, message))
+        self.waiting += len(messages)
+        self.unfinished += len(messages)
+        self.idle.clear()
+        self.accepted.inc(amount=len(messages))
+        return True
+
+    def release(self, domain: str) -> None:
+        """
+        Hands the next held message of a domain to the workers, in place
+        of one that was sent.
+        """
+        held = self.held.get(domain)
+        if held:
+            self.ready.put_nowait((domain, *held.popleft()))
+            if not held:
+                del self.held[domain]
+            return
+        self.active[domain] -= 1
+        if not self.active[domain]:
+            del self.active[domain]
+
+    async def _work(self) -> None:
+        while True:
+            domain, queued_at, message = await self.ready.get()
+            self.waiting -= 1
+            try:
+                await self.deliver(message, queued_at)
+            finally:
+                self.release(domain)
+                self.unfinished -= 1
+                if not self.unfinished:
+                    self.idle.set()
+
+    async def deliver(self, message: EmailMessage,
+                      queued_at: float) -> None:
+        start = perf_counter()
+        self.queue_seconds.observe(start - queued_at)
+        try:
+            await self.pool.send(message)
+        except Exception:
+            # The sender keeps its own durable retries (the outbox of the
+            # API); a failed message is only counted here.
+            self.delivered.inc("failed")
+        else:
+            self.delivered.inc("sent")
+        self.delivery_seconds.observe(perf_counter() - start)
@@ -1,56 +1,183 @@
+"""
+A mail delivery service.
+
+``POST /send-batch`` renders one template for many recipients and queues
+the messages; they are sent in the background by the delivery queue
+(mail.delivery) over reused SMTP connections. The delivery metrics are
+exposed on ``GET /metrics``.
+
+The SMTP server and credentials are read from the environment or .env
+(``MAIL_SERVER``, ``MAIL_PORT``, ``MAIL_USERNAME``, ``MAIL_PASSWORD``,
+``MAIL_FROM``), like the settings of the API.
+
+Run from the project root::
+
+    python -m mail.main
+"""
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
 from pathlib import Path
+from typing import List
 
 import uvicorn
-from fastapi import FastAPI, BackgroundTasks
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from pydantic import EmailStr, BaseModel
-from typing import List
+from fastapi import FastAPI, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from jinja2 import TemplateNotFound
+from pydantic import BaseModel, EmailStr, Field
+from pydantic_settings import BaseSettings
+
+from mail.delivery import DeliveryQueue
+from src.services.smtp_pool import SMTPPool
+from src.services.templating import TemplateRenderer
+
+
+class MailSettings(BaseSettings):
+    mail_username: str
+    mail_password: str
+    mail_from: str
+    mail_from_name: str = "Example email"
+    mail_port: int
+    mail_server: str
+    mail_use_tls: bool = True
+    mail_pool_size: int = 8
+    mail_queue_size: int = 10000
+    mail_workers: int = 16
+    mail_per_domain_limit: int = 4
+    mail_max_batch: int = 1000
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+        extra = "ignore"
+
+
+settings = MailSettings()
 
 
 class EmailSchema(BaseModel):
     email: EmailStr
 
 
-conf = ConnectionConfig(
-    MAIL_USERNAME="valentyna_email@meta.ua",
-    MAIL_PASSWORD="jmr5ydj@AMP3fhw4men",
-    MAIL_FROM="valentyna_email@meta.ua",
-    MAIL_PORT=465,
-    MAIL_SERVER="smtp.meta.ua",
-    MAIL_FROM_NAME="Example email",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-    # TIMEOUT=60,  # Increase timeout to 60 seconds
+class RecipientSchema(BaseModel):
+    email: EmailStr
+    context: dict = {}
+
+
+class BatchSchema(BaseModel):
+    template: str
+    subject: str
+    context: dict = {}
+    recipients: List[RecipientSchema] = Field(
+        min_length=1, max_length=settings.mail_max_batch)
+
+
+templates = TemplateRenderer(Path(__file__).parent / 'templates')
+
+delivery = DeliveryQueue(
+    SMTPPool(
+        hostname=settings.mail_server,
+        port=settings.mail_port,
+        username=settings.mail_username,
+        password=settings.mail_password,
+        use_tls=settings.mail_use_tls,
+        size=settings.mail_pool_size,
+    ),
+    queue_size=settings.mail_queue_size,
+    workers=settings.mail_workers,
+    per_domain_limit=settings.mail_per_domain_limit,
 )
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    templates.load()
+    await delivery.start()
+    yield
+    await delivery.stop()
 
-@app.post("/send-email")
-async def send_in_background(
-    background_tasks: BackgroundTasks,
-    body: EmailSchema
-       ):
-    message = MessageSchema(
-        subject="Fastapi mail module",
-        recipients=[body.email],
-        template_body={"fullname": "Billy Jones"},
-        subtype=MessageType.html
-    )
 
-    fm = FastMail(conf)
+app = FastAPI(lifespan=lifespan)
+
+
+def queue_full() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                         detail="Delivery queue is full",
+                         headers={"Retry-After": "5"})
+
+
+def build_message(recipient: str, subject: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = f"{settings.mail_from_name} <{settings.mail_from}>"
+    message["To"] = recipient
+    message.set_content(html, subtype="html")
+    return message
+
+
+async def queue_batch(body: BatchSchema) -> int:
+    """
+    Renders and queues the messages of a batch.
+
+    :param body: The batch.
+    :type body: BatchSchema
+    :return: The number of queued messages.
+    :rtype: int
+    :raises HTTPException: 422 if the template does not exist, 503 with
+      ``Retry-After`` if the queue has no room for the batch.
+    """
+    if len(body.recipients) > delivery.free_slots():
+        # Rejected before the batch is rendered for nothing.
+        delivery.rejected.inc(amount=len(body.recipients))
+        raise queue_full()
 
-    background_tasks.add_task(
-        fm.send_message,
-        message,
-        template_name="example_email.html"
-        )
+    def render() -> List[EmailMessage]:
+        return [build_message(recipient.email, body.subject,
+                              templates.render(body.template, **{
+                                  **body.context, **recipient.context}))
+                for recipient in body.recipients]
 
+    try:
+        # Rendering a large batch would stall the event loop.
+        messages = await run_in_threadpool(render)
+    except TemplateNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown template {body.template}")
+    if not delivery.submit(messages):
+        raise queue_full()
+    return len(messages)
+
+
+@app.post("/send-batch", status_code=status.HTTP_202_ACCEPTED)
+async def send_batch(body: BatchSchema):
+    """
+    Queues one templated email for each recipient.
+
+    The template is rendered with the batch ``context`` overridden by the
+    ``context`` of each recipient. The batch is queued as a whole or
+    rejected with 503 when the queue is full.
+    """
+    return {"queued": await queue_batch(body)}
+
+
+@app.post("/send-email", status_code=status.HTTP_202_ACCEPTED)
+async def send_in_background(body: EmailSchema):
+    await queue_batch(BatchSchema(
+        template="example_email.html",
+        subject="Fastapi mail module",
+        context={"fullname": "Billy Jones"},
+        recipients=[RecipientSchema(email=body.email)],
+    ))
     return {"message": "email has been sent"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse,
+         include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(delivery.registry.render(),
+                             media_type="text/plain; version=0.0.4")
+
+
 if __name__ == '__main__':
-    uvicorn.run('main:app', port=8000, reload=True)
+    uvicorn.run('mail.main:app', port=8000, reload=True)
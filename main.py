@@ -1,17 +1,28 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Security
 import redis.asyncio as redis
-from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 # from fastapi.lifespan import Lifespan
 
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, metrics, profiles
 from src.database import models
 from src.database.db import engine
 from src.conf.config import settings
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.load_shedding import LoadSheddingMiddleware
+from src.middleware.metrics import MetricsMiddleware
+from src.middleware.profiling import ProfilingMiddleware
+from src.middleware.tracing import TracingMiddleware
+from src.middleware.query_stats import QueryStatsMiddleware
+from src.services.avatars import AvatarStaticFiles, get_avatar_storage
+from src.services.content_negotiation import NegotiatedResponse
+from src.services.profiling import profiling_switch
+from src.services.rate_limiter import rate_limiter
+from src.services.tracing import JsonLinesExporter, tracer
 
 
 models.Base.metadata.create_all(bind=engine)
@@ -23,14 +34,60 @@ async def app_lifespan(app: FastAPI):
         host=settings.redis_host,
         port=settings.redis_port,
         db=0, encoding="utf-8",
-        decode_responses=True
+        decode_responses=True,
+        # A slow Redis sends the limiter to its local buckets instead of
+        # holding up the requests.
+        socket_connect_timeout=settings.rate_limit_redis_timeout,
+        socket_timeout=settings.rate_limit_redis_timeout
         )
-    await FastAPILimiter.init(r)
+    rate_limiter.init(r)
+    # Configures the storage client once instead of on every upload.
+    get_avatar_storage()
+    if settings.tracing_enabled:
+        tracer.configure(JsonLinesExporter(settings.tracing_file),
+                         settings.tracing_sample_rate)
     yield
+    if tracer.exporter is not None:
+        # Waits for the span writer thread without blocking the loop.
+        await run_in_threadpool(tracer.exporter.flush)
+    await r.aclose()
     print("Shutting down...")
 
-app = FastAPI(lifespan=app_lifespan)
+app = FastAPI(
+    lifespan=app_lifespan, default_response_class=NegotiatedResponse
+    )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    level=settings.compression_level,
+    brotli_quality=settings.compression_brotli_quality,
+    offload_size=settings.compression_offload_size,
+)
+app.add_middleware(
+    QueryStatsMiddleware,
+    repeated_threshold=settings.sql_repeated_query_threshold,
+)
+app.add_middleware(
+    ProfilingMiddleware,
+    directory=settings.profiling_dir,
+    admin_token=settings.profiling_admin_token,
+    switch=profiling_switch,
+    interval=settings.profiling_interval_ms / 1000,
+    keep=settings.profiling_keep,
+)
+app.add_middleware(TracingMiddleware)
+if settings.load_shedding_enabled:
+    # Outside of everything but CORS and the metrics, so that a shed
+    # request costs next to nothing and is still counted.
+    app.add_middleware(
+        LoadSheddingMiddleware,
+        max_in_flight=settings.load_shedding_max_in_flight,
+        target_lag=settings.load_shedding_target_lag_ms / 1000,
+        retry_after=settings.load_shedding_retry_after,
+    )
+# Outside of the load shedding, so that shed responses carry the CORS
+# headers and preflight requests are answered without being counted.
 origins = [
     "http://localhost:3000"
     ]
@@ -40,12 +97,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "Retry-After"],
 )
+# Added last so that it is the outermost middleware and times everything.
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(contacts.router, prefix='/api')
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+app.include_router(metrics.router)
+app.include_router(profiles.router, prefix='/api')
+if settings.avatar_storage == "local":
+    get_avatar_storage()
+    app.mount(settings.avatar_base_url,
+              AvatarStaticFiles(directory=settings.avatar_local_dir),
+              name="avatars")
 
 
 @app.get("/")
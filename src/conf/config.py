@@ -1,4 +1,6 @@
 # from pydantic import BaseSettings
+from typing import Dict
+
 from pydantic_settings import BaseSettings  # NEW
 
 
@@ -9,6 +11,8 @@ class Settings(BaseSettings):
     mail_username: str
     mail_password: str
     mail_from: str
+    # The display name of mail_from, also signing the birthday greetings.
+    mail_from_name: str = 'Desired Name'
     mail_port: int
     mail_server: str
     redis_host: str = 'localhost'
@@ -22,6 +26,55 @@ class Settings(BaseSettings):
     postgres_host: str = "localhost"
     postgres_port: str
     redis: str
+    phone_default_country_code: str = '380'
+    fast_json_responses: bool = False
+    compression_minimum_size: int = 500
+    compression_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_offload_size: int = 262144
+    sql_slow_query_ms: int = 200
+    sql_repeated_query_threshold: int = 5
+    # Initial state; switched at runtime through /api/admin/profiles.
+    profiling_enabled: bool = True
+    profiling_admin_token: str = ''
+    profiling_sample_rate: float = 0.0
+    profiling_interval_ms: int = 5
+    profiling_dir: str = 'profiles'
+    profiling_keep: int = 50
+    smtp_pool_size: int = 4
+    smtp_max_messages_per_connection: int = 100
+    tracing_enabled: bool = False
+    tracing_sample_rate: float = 1.0
+    tracing_file: str = 'traces.jsonl'
+    template_cache_dir: str = ''
+    avatar_storage: str = 'cloudinary'
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_local_dir: str = 'avatars'
+    avatar_base_url: str = '/avatars'
+    avatar_s3_bucket: str = ''
+    avatar_s3_public_url: str = ''
+    avatar_s3_endpoint_url: str = ''
+    avatar_s3_access_key: str = ''
+    avatar_s3_secret_key: str = ''
+    rate_limit_enabled: bool = True
+    rate_limit_lease_fraction: float = 0.1
+    rate_limit_lease_seconds: float = 5
+    rate_limit_local_share: int = 1
+    rate_limit_retry_seconds: float = 5
+    rate_limit_redis_timeout: float = 0.25
+    # JSON, e.g. {"contacts:list": "100/minute"}; see src.services.rate_limiter
+    rate_limit_rules: Dict[str, str] = {}
+    auth_ip_limit: str = '30/minute'
+    # Per account and client IP, and per account from all addresses.
+    auth_account_limit: str = '10/minute'
+    auth_account_total_limit: str = '100/minute'
+    # Password hashes at a time per worker, 0 for the number of CPUs.
+    auth_hash_concurrency: int = 0
+    auth_hash_queue: int = 8
+    load_shedding_enabled: bool = True
+    load_shedding_max_in_flight: int = 100
+    load_shedding_target_lag_ms: float = 200
+    load_shedding_retry_after: int = 2
 
     class Config:
         env_file = ".env"
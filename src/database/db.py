@@ -3,6 +3,8 @@ from sqlalchemy.orm import sessionmaker
 # import os
 # from dotenv import load_dotenv
 from src.conf.config import settings
+from src.database.instrumentation import instrument_engine
+from src.services.metrics import db_pool_checkout_seconds
 
 
 # load_dotenv()
@@ -11,7 +13,13 @@ from src.conf.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# SQLite connections are opened in the threadpool that runs the sync
+# dependencies but used from the event loop as well.
+connect_args = ({"check_same_thread": False}
+                if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {})
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+instrument_engine(engine, settings.sql_slow_query_ms / 1000)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -19,7 +27,18 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Dependency
 def get_db():
     db = SessionLocal()
+    # Check out the connection up front to measure the pool wait.
+    with db_pool_checkout_seconds.time():
+        db.connection()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_session_factory():
+    """
+    Returns the session factory, for routes that open sessions outliving
+    the request, e.g. while a response streams.
+    """
+    return SessionLocal
@@ -0,0 +1,106 @@
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+slow_query_logger = logging.getLogger("src.database.slow_queries")
+repeated_query_logger = logging.getLogger("src.database.repeated_queries")
+
+# Literals left in the SQL text (IN lists rendered by the dialect, inline
+# values) are redacted as well as the bound parameters.
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryStats:
+    """
+    The queries issued while handling one request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list:
+        """
+        Returns the statements executed at least ``threshold`` times, the
+        usual sign of an N+1 query pattern.
+
+        :param threshold: The number of executions to report from.
+        :type threshold: int
+        :return: ``(statement, count)`` pairs, most repeated first.
+        :rtype: list
+        """
+        return [(statement, count)
+                for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+    def server_timing(self) -> str:
+        return (f'db;dur={self.duration * 1000:.1f};'
+                f'desc="{self.count} queries"')
+
+
+# Set by QueryStatsMiddleware for the duration of a request.
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None)
+
+
+def redact(statement: str) -> str:
+    """
+    Replaces literal values in an SQL statement with ``?``.
+
+    :param statement: The SQL statement.
+    :type statement: str
+    :return: The statement without literal values.
+    :rtype: str
+    """
+    return _LITERALS.sub("?", " ".join(statement.split()))
+
+
+def instrument_engine(engine: Engine, slow_query_seconds: float) -> None:
+    """
+    Attributes the queries of an engine to the current request and logs
+    the slow ones.
+
+    Only the SQL text is logged, never the bound parameters, since they
+    carry contact details and password hashes.
+
+    :param engine: The engine to instrument.
+    :type engine: Engine
+    :param slow_query_seconds: Queries taking at least this long are logged.
+    :type slow_query_seconds: float
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany):
+        duration = perf_counter() - conn.info["query_start"].pop()
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        if duration >= slow_query_seconds:
+            slow_query_logger.warning(
+                "Slow query (%.1f ms): %s", duration * 1000,
+                redact(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
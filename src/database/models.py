@@ -1,4 +1,7 @@
-from sqlalchemy import Integer, String, ForeignKey, Boolean
+from sqlalchemy import (
+    Integer, SmallInteger, String, ForeignKey, Boolean, Index, JSON, Text,
+    UniqueConstraint
+)
 from sqlalchemy.orm import (
     Mapped, mapped_column, DeclarativeBase, relationship
 )
@@ -17,8 +20,16 @@ class Contact(Base):
     first_name: Mapped[str] = mapped_column(String(50))
     last_name: Mapped[str] = mapped_column(String(50))
     email: Mapped[str] = mapped_column(String(150))
-    phone: Mapped[int] = mapped_column(Integer)
+    # Normalized lookup keys, kept in sync by the contacts repository.
+    first_name_key: Mapped[Optional[str]] = mapped_column(Text)
+    last_name_key: Mapped[Optional[str]] = mapped_column(Text)
+    email_key: Mapped[Optional[str]] = mapped_column(String(150))
+    phone: Mapped[str] = mapped_column(String(16))
     birth_date: Mapped[Date] = mapped_column(Date)
+    # Month and day of birth_date, kept in sync by the contacts repository
+    # so the birthdays of a day can be read from an index.
+    birth_month: Mapped[Optional[int]] = mapped_column(SmallInteger)
+    birth_day: Mapped[Optional[int]] = mapped_column(SmallInteger)
     additional_data: Mapped[Optional[str]]
     created_at: Mapped[DateTime] = mapped_column(DateTime)
     user_id: Mapped[int] = mapped_column(
@@ -27,6 +38,23 @@ class Contact(Base):
         )
     user: Mapped["User"] = relationship("User", back_populates="contact")
 
+    __table_args__ = (
+        # text_pattern_ops lets Postgres serve both point lookups and
+        # ``LIKE 'prefix%'`` typeahead from a btree regardless of the
+        # database collation.
+        Index("ix_contacts_user_id_first_name_key", "user_id",
+              "first_name_key",
+              postgresql_ops={"first_name_key": "text_pattern_ops"}),
+        Index("ix_contacts_user_id_last_name_key", "user_id",
+              "last_name_key",
+              postgresql_ops={"last_name_key": "text_pattern_ops"}),
+        Index("ix_contacts_user_id_email_key", "user_id", "email_key",
+              postgresql_ops={"email_key": "text_pattern_ops"}),
+        Index("ix_contacts_user_id_phone", "user_id", "phone"),
+        Index("ix_contacts_birth_month_birth_day_user_id_id", "birth_month",
+              "birth_day", "user_id", "id"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -37,6 +65,73 @@ class User(Base):
     password: Mapped[str] = mapped_column(String(255), nullable=False)
     refresh_token: Mapped[str] = mapped_column(String(255), nullable=True)
     avatar: Mapped[str] = mapped_column(String(255), nullable=True)
+    # SHA-256 of the uploaded avatar, see src.services.avatars.
+    avatar_hash: Mapped[Optional[str]] = mapped_column(String(64))
     contact: Mapped[List["Contact"]] = relationship(
         "Contact", back_populates="user")
     confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Selects the rate limits of the user, see src.services.rate_limiter.
+    plan: Mapped[str] = mapped_column(
+        String(20), default="free", server_default="free")
+    # Maintained by the contacts repository, reconciled by
+    # src.workers.reconcile_counts.
+    contact_count: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False)
+
+
+class EmailOutbox(Base):
+    """
+    An email waiting to be sent by the outbox worker
+    (src.workers.email_outbox).
+
+    ``next_attempt_at`` doubles as the lease of a claimed row: a worker
+    moves it into the future when it claims the row, so a crashed worker's
+    rows become due again once the lease expires.
+    """
+    __tablename__ = "email_outbox"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50))
+    recipient: Mapped[str] = mapped_column(String(150))
+    # Set for emails that must be queued at most once, such as the
+    # birthday greetings of a day.
+    dedupe_key: Mapped[Optional[str]] = mapped_column(String(200))
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    status: Mapped[str] = mapped_column(
+        String(20), default="pending", server_default="pending")
+    attempts: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0")
+    next_attempt_at: Mapped[DateTime] = mapped_column(DateTime)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[DateTime] = mapped_column(DateTime)
+    sent_at: Mapped[Optional[DateTime]] = mapped_column(DateTime)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status",
+              "next_attempt_at"),
+        UniqueConstraint("dedupe_key", name="uq_email_outbox_dedupe_key"),
+    )
+
+
+class JobCheckpoint(Base):
+    """
+    The progress of one shard of a scheduled job run, such as the
+    birthday dispatcher (src.workers.birthdays) for a day.
+    """
+    __tablename__ = "job_checkpoints"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job: Mapped[str] = mapped_column(String(50))
+    run_date: Mapped[Date] = mapped_column(Date)
+    shard: Mapped[int] = mapped_column(Integer)
+    shards: Mapped[int] = mapped_column(Integer)
+    last_user_id: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0")
+    last_id: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0")
+    processed: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0")
+    finished_at: Mapped[Optional[DateTime]] = mapped_column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint("job", "run_date", "shard", "shards",
+                         name="uq_job_checkpoints_job_run_date_shard"),
+    )
@@ -0,0 +1,220 @@
+import zlib
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import CallbackMetric, registry
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class CompressionStats:
+    """
+    Totals of the bytes passed through the compression middleware.
+    """
+
+    def __init__(self):
+        self.responses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+
+compression_stats = CompressionStats()
+
+registry.register(CallbackMetric(
+    "http_compression_bytes_in_total", "Response bytes before compression.",
+    "counter", lambda: compression_stats.bytes_in))
+registry.register(CallbackMetric(
+    "http_compression_bytes_out_total", "Response bytes after compression.",
+    "counter", lambda: compression_stats.bytes_out))
+registry.register(CallbackMetric(
+    "http_compression_bytes_saved_total", "Bytes saved by compression.",
+    "counter", lambda: compression_stats.bytes_saved))
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Picks the best supported encoding from an ``Accept-Encoding`` header.
+
+    :param accept_encoding: The header value, e.g. ``gzip, br;q=0.9``.
+    :type accept_encoding: str
+    :return: ``br``, ``gzip`` or None if neither is acceptable.
+    :rtype: str | None
+    """
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class Compressor:
+    """
+    Incremental gzip or brotli compressor for one response body.
+    """
+
+    def __init__(self, encoding: str, level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self.brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes the gzip header and trailer.
+            self.zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """
+        Compresses the next chunk of the body.
+
+        Non-final chunks are flushed so that a client reading a stream
+        can decode everything received so far.
+
+        :param data: The chunk.
+        :type data: bytes
+        :param final: Whether this is the last chunk of the body.
+        :type final: bool
+        :return: The compressed bytes.
+        :rtype: bytes
+        """
+        if self.encoding == "br":
+            output = self.brotli.process(data)
+            return output + (self.brotli.finish() if final
+                             else self.brotli.flush())
+        output = self.zlib.compress(data)
+        return output + self.zlib.flush(
+            zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli or gzip, as negotiated with the client.
+
+    Bodies smaller than ``minimum_size`` are sent as they are. Streaming
+    responses are compressed chunk by chunk, without buffering. Chunks of
+    at least ``offload_size`` bytes are compressed in a worker thread so
+    that the event loop keeps serving other requests.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int = 500,
+            level: int = 6,
+            brotli_quality: int = 4,
+            offload_size: int = 256 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(
+            Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    def __init__(
+            self,
+            middleware: CompressionMiddleware,
+            encoding: str,
+            send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.initial_message: Message = {}
+        self.started = False
+        self.compressor: Compressor | None = None
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk tells us whether and
+            # how to compress.
+            self.initial_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            if self.should_compress(headers, body, more_body):
+                self.compressor = Compressor(
+                    self.encoding,
+                    self.middleware.level,
+                    self.middleware.brotli_quality
+                    )
+                headers["Content-Encoding"] = self.encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = await self.compress(body, final=True)
+                    headers["Content-Length"] = str(len(body))
+                    message["body"] = body
+                    await self.downstream(self.initial_message)
+                    await self.downstream(message)
+                    return
+            await self.downstream(self.initial_message)
+
+        if self.compressor is not None:
+            message["body"] = await self.compress(body, final=not more_body)
+        await self.downstream(message)
+
+    def should_compress(
+            self,
+            headers: MutableHeaders,
+            body: bytes,
+            more_body: bool) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.middleware.minimum_size
+
+    async def compress(self, body: bytes, final: bool) -> bytes:
+        if len(body) >= self.middleware.offload_size:
+            compressed = await anyio.to_thread.run_sync(
+                self.compressor.compress, body, final)
+        else:
+            compressed = self.compressor.compress(body, final)
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(compressed)
+        if final:
+            compression_stats.responses += 1
+        return compressed
@@ -0,0 +1,144 @@
+import asyncio
+import re
+from typing import Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.services.metrics import CallbackMetric, Counter, registry
+
+
+CRITICAL = "critical"
+NORMAL = "normal"
+BULK = "bulk"
+
+# For each priority: the share of ``max_in_flight`` its requests may
+# fill, and how many times the target lag they tolerate.
+LEVELS = {
+    CRITICAL: (1.0, float("inf")),
+    NORMAL: (0.8, 2.0),
+    BULK: (0.5, 1.0),
+}
+
+# (methods or None for all, path pattern, priority); the first match
+# wins and the other requests are NORMAL.
+DEFAULT_PRIORITIES = (
+    (("GET",), r"/api/auth/refresh_token", CRITICAL),
+    (("GET",), r"/api/contacts/\d+", CRITICAL),
+    (("GET",), r"/metrics", CRITICAL),
+    (None, r"/api/contacts/(export|import)", BULK),
+)
+
+
+class LoopLagMonitor:
+    """
+    Measures the event loop lag, the time a ready callback waits in the
+    loop's queue, with a timer that should fire every ``interval``
+    seconds. A timer that is overdue counts as lag right away.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.next_tick = 0.0
+        self.loop = None
+
+    def ensure_started(self) -> None:
+        """
+        Starts the timer on the running loop, unless it runs there.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+        # A plain timer rather than a task, so a closed loop (e.g. of a
+        # test client) just drops it.
+        self.loop = loop
+        self.last_lag = 0.0
+        self.next_tick = loop.time() + self.interval
+        loop.call_at(self.next_tick, self.tick)
+
+    def tick(self) -> None:
+        now = self.loop.time()
+        self.last_lag = max(0.0, now - self.next_tick)
+        self.next_tick = now + self.interval
+        self.loop.call_at(self.next_tick, self.tick)
+
+    def lag(self) -> float:
+        """
+        :return: The event loop lag, in seconds.
+        :rtype: float
+        """
+        if self.loop is None or self.loop.is_closed():
+            return 0.0
+        return max(self.last_lag, self.loop.time() - self.next_tick)
+
+
+loop_lag = LoopLagMonitor()
+
+http_requests_shed_total = registry.register(Counter(
+    "http_requests_shed_total", "Requests rejected by load shedding.",
+    ("priority",)))
+registry.register(CallbackMetric(
+    "event_loop_lag_seconds",
+    "How late the event loop runs a ready callback.", "gauge",
+    loop_lag.lag))
+
+
+class LoadSheddingMiddleware:
+    """
+    Rejects requests with a fast 503 while the worker is overloaded,
+    instead of letting them queue up until every request is slow.
+
+    The worker is overloaded for a priority when its requests in flight
+    reach that priority's share of ``max_in_flight``, or when the event
+    loop lag (see :class:`LoopLagMonitor`) exceeds its multiple of
+    ``target_lag``. Critical requests, such as refreshing a token or
+    reading one contact, are shed last and bulk ones, such as exports
+    and imports, first.
+    """
+
+    def __init__(self, app: ASGIApp, max_in_flight: int = 100,
+                 target_lag: float = 0.2, retry_after: int = 2,
+                 priorities: Iterable[Tuple[Optional[Tuple[str, ...]], str,
+                                            str]] = DEFAULT_PRIORITIES):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.target_lag = target_lag
+        self.retry_after = retry_after
+        self.priorities = [(methods, re.compile(pattern), priority)
+                           for methods, pattern, priority in priorities]
+        self.in_flight = 0
+
+    def priority(self, scope: Scope) -> str:
+        for methods, pattern, priority in self.priorities:
+            if (methods is None or scope["method"] in methods) and \
+                    pattern.fullmatch(scope["path"].rstrip("/")):
+                return priority
+        return NORMAL
+
+    def admit(self, priority: str) -> bool:
+        share, lag_factor = LEVELS[priority]
+        return self.in_flight < self.max_in_flight * share and \
+            loop_lag.lag() <= self.target_lag * lag_factor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Preflight requests are cheap and must not fail for lack of CORS
+        # headers.
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        loop_lag.ensure_started()
+        priority = self.priority(scope)
+        if not self.admit(priority):
+            http_requests_shed_total.inc(priority)
+            response = JSONResponse(
+                {"detail": "Server is overloaded, try again later"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)})
+            await response(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
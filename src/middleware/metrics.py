@@ -0,0 +1,46 @@
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import (
+    http_request_duration_seconds,
+    http_requests_in_progress,
+    http_requests_total
+)
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and measures their latency per route template
+    (``/api/contacts/{contact_id}``, not the concrete path), so the number
+    of series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start
+            http_requests_in_progress.dec(method)
+            # The router stores the matched route in the shared scope.
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_requests_total.inc(method, path, str(status_code))
+            http_request_duration_seconds.observe(elapsed, method, path)
@@ -0,0 +1,82 @@
+import random
+import secrets
+import threading
+from typing import Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.profiling import (
+    ProfilingSwitch, StackSampler, new_profile_name, save_profile
+)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests on demand.
+
+    While the ``switch`` is enabled, a request is profiled when its
+    ``X-Profile`` header carries the admin token, or at random for the
+    ``sample_rate`` of the switch. Only one request is profiled at a
+    time; the profile name is returned in the ``X-Profile-Id`` header.
+
+    The middleware is always installed so that profiling can be switched
+    on without a restart. Other requests cost an attribute check or two,
+    and a header lookup when an admin token is configured.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            directory: str,
+            admin_token: str = "",
+            switch: Optional[ProfilingSwitch] = None,
+            interval: float = 0.005,
+            keep: int = 50):
+        self.app = app
+        self.directory = directory
+        self.admin_token = admin_token
+        self.switch = switch or ProfilingSwitch()
+        self.interval = interval
+        self.keep = keep
+        self.lock = threading.Lock()
+
+    def requested(self, scope: Scope) -> bool:
+        if not self.switch.enabled:
+            return False
+        if self.admin_token:
+            token = Headers(scope=scope).get("x-profile")
+            if token is not None:
+                return secrets.compare_digest(
+                    token.encode(), self.admin_token.encode())
+        sample_rate = self.switch.sample_rate
+        return sample_rate > 0 and random.random() < sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self.lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        name = new_profile_name(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = name
+            await send(message)
+
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            try:
+                await anyio.to_thread.run_sync(self.finish, sampler, name)
+            finally:
+                self.lock.release()
+
+    def finish(self, sampler: StackSampler, name: str) -> None:
+        sampler.stop()
+        save_profile(self.directory, name, sampler, self.keep)
@@ -0,0 +1,47 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.database.instrumentation import (
+    QueryStats,
+    current_query_stats,
+    redact,
+    repeated_query_logger
+)
+from src.services.metrics import db_queries_per_request
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the SQL queries of each request and reports them in a
+    ``Server-Timing`` header.
+
+    Statements executed ``repeated_threshold`` times or more in one
+    request are logged as a likely N+1 pattern.
+    """
+
+    def __init__(self, app: ASGIApp, repeated_threshold: int = 5):
+        self.app = app
+        self.repeated_threshold = repeated_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            db_queries_per_request.observe(stats.count)
+            for statement, count in stats.repeated(self.repeated_threshold):
+                repeated_query_logger.warning(
+                    "%s %s ran the same query %d times: %s",
+                    scope["method"], scope["path"], count, redact(statement))
@@ -0,0 +1,45 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.tracing import parse_traceparent, tracer
+
+
+class TracingMiddleware:
+    """
+    Opens the root span of every request, continuing the trace of an
+    incoming W3C ``traceparent`` header if there is one.
+
+    The span is named after the route template once routing is done and
+    also covers the background tasks of the request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or tracer.exporter is None:
+            await self.app(scope, receive, send)
+            return
+        remote = parse_traceparent(
+            Headers(scope=scope).get("traceparent", "")) or (None, None, None)
+        trace_id, parent_id, sampled = remote
+        with tracer.span(f"{scope['method']} {scope['path']}",
+                         trace_id=trace_id, parent_id=parent_id,
+                         sampled=sampled) as span:
+            if span is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
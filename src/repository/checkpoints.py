@@ -0,0 +1,45 @@
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.database.models import JobCheckpoint
+from src.services.tracing import traced
+
+
+@traced
+async def get_checkpoint(job: str, run_date: date, shard: int, shards: int,
+                         db: Session) -> JobCheckpoint:
+    """
+    Retrieves the checkpoint of one shard of a job run, creating it at
+    the start of the run.
+
+    :param job: The job name.
+    :type job: str
+    :param run_date: The day the run is for.
+    :type run_date: date
+    :param shard: The shard, from 0 to ``shards - 1``.
+    :type shard: int
+    :param shards: The number of shards the run is split into.
+    :type shards: int
+    :param db: The database session.
+    :type db: Session
+    :return: The checkpoint.
+    :rtype: JobCheckpoint
+    """
+    query = select(JobCheckpoint).where(
+        JobCheckpoint.job == job, JobCheckpoint.run_date == run_date,
+        JobCheckpoint.shard == shard, JobCheckpoint.shards == shards)
+    checkpoint = db.scalar(query)
+    if checkpoint is None:
+        db.add(JobCheckpoint(job=job, run_date=run_date, shard=shard,
+                             shards=shards, last_user_id=0, last_id=0,
+                             processed=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process started the same shard first.
+            db.rollback()
+        checkpoint = db.scalar(query)
+    return checkpoint
@@ -1,19 +1,55 @@
-from typing import List
+from typing import Iterator, List
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_, tuple_
 
 from src.database.models import Contact, User
-from src.schemas import ContactBase, ContactUpdate
+from src.schemas import ContactBase, ContactUpdate, ContactMergeGroup
+from src.services.duplicates import find_duplicate_groups
+from src.services.serialization import CONTACT_FIELDS
+from src.services.normalization import normalize_email, normalize_name
+from src.services.tracing import traced
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 
+def set_lookup_keys(contact: Contact) -> None:
+    """
+    Recomputes the normalized lookup keys of a contact
+      from its current name, email and birth date.
+
+    :param contact: The contact to update.
+    :type contact: Contact
+    """
+    contact.first_name_key = normalize_name(contact.first_name)
+    contact.last_name_key = normalize_name(contact.last_name)
+    contact.email_key = normalize_email(contact.email)
+    contact.birth_month = contact.birth_date.month
+    contact.birth_day = contact.birth_date.day
+
+
+def contact_entities(fields: List[str] | None) -> list:
+    """
+    Builds the entities to query for an optional column projection.
+
+    :param fields: The contact columns to select, or None for contacts.
+    :type fields: List[str] | None
+    :return: The columns, or the Contact model itself.
+    :rtype: list
+    """
+    return [getattr(Contact, field) for field in fields] if fields \
+        else [Contact]
+
+
+@traced
 async def get_contacts(
         skip: int,
         limit: int,
         user: User,
-        db: Session) -> List[Contact]:
+        db: Session,
+        filters: list = (),
+        order_by: list = (),
+        fields: List[str] | None = None) -> List[Contact]:
     """
     Retrieves a list of contacs for a specific user
       with specified pagination parameters.
@@ -26,14 +62,99 @@ async def get_contacts(
     :type user: User
     :param db: The database session.
     :type db: Session
+    :param filters: Extra SQL conditions the contacts must match.
+    :type filters: list
+    :param order_by: The columns to order the contacts by.
+    :type order_by: list
+    :param fields: If given, only these columns are selected and rows
+      are returned instead of contacts.
+    :type fields: List[str] | None
     :return: A list of contacts.
     :rtype: List[Note]
     """
-    return db.query(Contact).filter(
-        Contact.user_id == user.id
-        ).offset(skip).limit(limit).all()
+    query = db.query(*contact_entities(fields)).filter(
+        Contact.user_id == user.id, *filters
+        )
+    if order_by:
+        query = query.order_by(*order_by)
+    return query.offset(skip).limit(limit).all()
+
+
+@traced
+async def get_contact_count(
+        user: User,
+        db: Session,
+        filters: list = ()) -> int:
+    """
+    Counts the contacts of a specific user.
+
+    Without filters the per-user counter is read, which is a primary key
+    lookup; with filters the matching contacts are counted.
+
+    :param user: The user to count contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :param filters: Extra SQL conditions the contacts must match.
+    :type filters: list
+    :return: The number of contacts.
+    :rtype: int
+    """
+    if filters:
+        return db.query(func.count(Contact.id)).filter(
+            Contact.user_id == user.id, *filters
+            ).scalar()
+    return db.query(User.contact_count).filter(User.id == user.id).scalar()
+
+
+def adjust_contact_count(user_id: int, delta: int, db: Session) -> None:
+    """
+    Adds ``delta`` to the contact counter of a user as part of
+      the current transaction.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param delta: The change in the number of contacts.
+    :type delta: int
+    :param db: The database session.
+    :type db: Session
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.contact_count: User.contact_count + delta},
+        synchronize_session=False
+        )
+
 
+def iter_contact_batches(
+        user: User,
+        db: Session,
+        batch_size: int = 1000) -> Iterator[list]:
+    """
+    Yields all contacts of a specific user as batches of row tuples,
+      in ID order, without loading the whole address book at once.
 
+    :param user: The user to export contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :param batch_size: The number of rows fetched per batch.
+    :type batch_size: int
+    :return: Batches of rows with the ContactResponse columns.
+    :rtype: Iterator[list]
+    """
+    last_id = 0
+    while True:
+        rows = db.query(*contact_entities(list(CONTACT_FIELDS))).filter(
+            Contact.user_id == user.id,
+            Contact.id > last_id
+            ).order_by(Contact.id).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+@traced
 async def get_contact_id(
         contact_id: int,
         user: User,
@@ -56,12 +177,15 @@ async def get_contact_id(
         ).first()
 
 
+@traced
 async def get_contact_name(
         contact_name: str,
         user: User,
-        db: Session) -> List[Contact]:
+        db: Session,
+        fields: List[str] | None = None) -> List[Contact]:
     """
     Retrieves a single contact with the specified name for a specific user.
+    The comparison ignores case and accents.
 
     :param contact_name: The name of the contact to retrieve.
     :type contact_name: str
@@ -69,22 +193,27 @@ async def get_contact_name(
     :type user: User
     :param db: The database session.
     :type db: Session
+    :param fields: If given, only these columns are selected and rows
+      are returned instead of contacts.
+    :type fields: List[str] | None
     :return: The contact with the specified name, or None if it does not exist.
     :rtype: Note | None
     """
-    return db.query(Contact).filter(
-        Contact.first_name == contact_name,
+    return db.query(*contact_entities(fields)).filter(
+        Contact.first_name_key == normalize_name(contact_name),
         Contact.user_id == user.id
         ).all()
 
 
+@traced
 async def get_contact_last_name(
         contact_last_name: str,
         user: User,
-        db: Session) -> List[Contact]:
+        db: Session,
+        fields: List[str] | None = None) -> List[Contact]:
     """
     Retrieves a single contact with the specified last name
-      for a specific user.
+      for a specific user. The comparison ignores case and accents.
 
     :param contact_last_name: The name of the contact to retrieve.
     :type contact_last_name: str
@@ -92,20 +221,25 @@ async def get_contact_last_name(
     :type user: User
     :param db: The database session.
     :type db: Session
+    :param fields: If given, only these columns are selected and rows
+      are returned instead of contacts.
+    :type fields: List[str] | None
     :return: The contact with the specified ID, or None if it does not exist.
     :rtype: Note | None
     """
-    return db.query(Contact).filter(
-        Contact.last_name == contact_last_name,
+    return db.query(*contact_entities(fields)).filter(
+        Contact.last_name_key == normalize_name(contact_last_name),
         Contact.user_id == user.id
         ).all()
 
 
+@traced
 async def get_contact_email(contact_email: str,
                             user: User,
                             db: Session) -> Contact:
     """
     Retrieves a single contact with the specified email for a specific user.
+    The comparison ignores case.
 
     :param contact_email: The email of the contact to retrieve.
     :type contact_email: str
@@ -118,11 +252,104 @@ async def get_contact_email(contact_email: str,
     :rtype: Note | None
     """
     return db.query(Contact).filter(
-        Contact.email == contact_email,
+        Contact.email_key == normalize_email(contact_email),
         Contact.user_id == user.id
         ).first()
 
 
+@traced
+async def get_contacts_by_phone(
+        phone: str,
+        user: User,
+        db: Session,
+        fields: List[str] | None = None) -> List[Contact]:
+    """
+    Retrieves the contacts with the specified phone number
+      for a specific user.
+
+    :param phone: The phone number in the E.164 format.
+    :type phone: str
+    :param user: The user to retrieve the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :param fields: If given, only these columns are selected and rows
+      are returned instead of contacts.
+    :type fields: List[str] | None
+    :return: The contacts with the specified phone number.
+    :rtype: List[Contact]
+    """
+    return db.query(*contact_entities(fields)).filter(
+        Contact.user_id == user.id,
+        Contact.phone == phone
+        ).all()
+
+
+@traced
+async def get_contacts_by_phones(
+        phones: List[str],
+        user: User,
+        db: Session) -> List[Contact]:
+    """
+    Retrieves the contacts with any of the specified phone numbers
+      for a specific user in a single query.
+
+    :param phones: The phone numbers in the E.164 format.
+    :type phones: List[str]
+    :param user: The user to retrieve the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The contacts with one of the specified phone numbers.
+    :rtype: List[Contact]
+    """
+    return db.query(Contact).filter(
+        Contact.user_id == user.id,
+        Contact.phone.in_(set(phones))
+        ).all()
+
+
+@traced
+async def get_contact_suggestions(
+        prefix: str,
+        limit: int,
+        user: User,
+        db: Session,
+        fields: List[str] | None = None) -> List[Contact]:
+    """
+    Retrieves contacts whose first name, last name or email starts
+      with the specified prefix for a specific user, ignoring case
+      and accents.
+
+    :param prefix: The beginning of the name or email typed so far.
+    :type prefix: str
+    :param limit: The maximum number of suggestions to return.
+    :type limit: int
+    :param user: The user to retrieve the suggestions for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :param fields: If given, only these columns are selected and rows
+      are returned instead of contacts.
+    :type fields: List[str] | None
+    :return: Up to ``limit`` matching contacts ordered by name.
+    :rtype: List[Contact]
+    """
+    name_prefix = normalize_name(prefix)
+    email_prefix = normalize_email(prefix)
+    return db.query(*contact_entities(fields)).filter(
+        Contact.user_id == user.id,
+        or_(
+            Contact.first_name_key.startswith(name_prefix, autoescape=True),
+            Contact.last_name_key.startswith(name_prefix, autoescape=True),
+            Contact.email_key.startswith(email_prefix, autoescape=True)
+            )
+        ).order_by(
+            Contact.first_name, Contact.last_name, Contact.id
+        ).limit(limit).all()
+
+
+@traced
 async def create_contact(body: ContactBase,
                          user: User,
                          db: Session) -> Contact:
@@ -148,13 +375,47 @@ async def create_contact(body: ContactBase,
         created_at=body.created_at,
         user=user
         )
+    set_lookup_keys(contact)
     db.add(contact)
+    adjust_contact_count(user.id, 1, db)
     db.commit()
     db.refresh(contact)
-    print(f"Created Contact: {contact}")  # Debugging line
     return contact
 
 
+@traced
+async def create_contacts(bodies: List[ContactBase],
+                          user: User,
+                          db: Session) -> List[Contact]:
+    """
+    Creates many contacts for a specific user in one transaction.
+
+    :param bodies: The data for the contacts to create.
+    :type bodies: List[ContactBase]
+    :param user: The user to create the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The newly created contacts.
+    :rtype: List[Contact]
+    """
+    contacts = []
+    for body in bodies:
+        contact = Contact(**body.model_dump(), user_id=user.id)
+        set_lookup_keys(contact)
+        contacts.append(contact)
+    db.add_all(contacts)
+    adjust_contact_count(user.id, len(contacts), db)
+    db.flush()
+    ids = [contact.id for contact in contacts]
+    db.commit()
+    # The commit expires the contacts; one query loads them all again
+    # instead of one refresh per contact when they are serialized.
+    db.query(Contact).filter(Contact.id.in_(ids)).all()
+    return contacts
+
+
+@traced
 async def remove_contact(contact_id: int,
                          user: User,
                          db: Session) -> Contact | None:
@@ -176,10 +437,12 @@ async def remove_contact(contact_id: int,
     ).first()
     if contact:
         db.delete(contact)
+        adjust_contact_count(user.id, -1, db)
         db.commit()
     return contact
 
 
+@traced
 async def update_contact(
         contact_id: int,
         body: ContactUpdate,
@@ -204,22 +467,127 @@ async def update_contact(
         Contact.user_id == user.id
         ).first()
     if contact:
-        contact.first_name = body.first_name,
-        contact.last_name = body.last_name,
-        contact.email = body.email,
-        contact.phone = body.phone,
-        contact.birth_date = body.birth_date,
+        contact.first_name = body.first_name
+        contact.last_name = body.last_name
+        contact.email = body.email
+        contact.phone = body.phone
+        contact.birth_date = body.birth_date
         contact.additional_data = body.additional_data
+        set_lookup_keys(contact)
         db.commit()
     return contact
 
 
-async def get_upcoming_birthdays(db: Session) -> List[Contact]:
+@traced
+async def get_duplicate_contacts(
+        user: User,
+        db: Session,
+        min_score: float = 0.0) -> List[dict]:
+    """
+    Finds groups of contacts of a specific user that are probably
+      the same person.
+
+    :param user: The user to check the contacts of.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :param min_score: Groups scoring lower than this are left out.
+    :type min_score: float
+    :return: The groups as dicts with ``score``, ``reasons`` and
+      ``contacts``, best score first.
+    :rtype: List[dict]
+    """
+    rows = db.query(
+        Contact.id,
+        Contact.first_name_key,
+        Contact.last_name_key,
+        Contact.email_key,
+        Contact.phone
+        ).filter(Contact.user_id == user.id).all()
+    groups = [
+        group for group in find_duplicate_groups(rows)
+        if group["score"] >= min_score
+        ]
+    ids = [contact_id for group in groups
+           for contact_id in group["contact_ids"]]
+    contacts = {
+        contact.id: contact for contact in db.query(Contact).filter(
+            Contact.user_id == user.id,
+            Contact.id.in_(ids)
+            ).all()
+        } if ids else {}
+    return [
+        {"score": group["score"],
+         "reasons": group["reasons"],
+         "contacts": [contacts[contact_id]
+                      for contact_id in group["contact_ids"]]}
+        for group in groups
+        ]
+
+
+@traced
+async def merge_contacts(
+        groups: List[ContactMergeGroup],
+        user: User,
+        db: Session) -> List[Contact] | None:
+    """
+    Merges groups of duplicate contacts of a specific user
+      in one transaction.
+
+    The primary contact of every group keeps its fields, gets the
+    earliest creation date and the additional data of its duplicates;
+    the duplicates are deleted.
+
+    :param groups: The groups to merge.
+    :type groups: List[ContactMergeGroup]
+    :param user: The user to merge the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: Session
+    :return: The merged primary contacts, or None if any of the contacts
+      does not exist.
+    :rtype: List[Contact] | None
+    """
+    ids = {contact_id for group in groups
+           for contact_id in [group.primary_id, *group.duplicate_ids]}
+    contacts = {
+        contact.id: contact for contact in db.query(Contact).filter(
+            Contact.user_id == user.id,
+            Contact.id.in_(ids)
+            ).all()
+        }
+    if len(contacts) != len(ids):
+        return None
+    merged = []
+    for group in groups:
+        primary = contacts[group.primary_id]
+        notes = [primary.additional_data] if primary.additional_data else []
+        for duplicate_id in group.duplicate_ids:
+            duplicate = contacts[duplicate_id]
+            if duplicate.additional_data and \
+                    duplicate.additional_data not in notes:
+                notes.append(duplicate.additional_data)
+            primary.created_at = min(primary.created_at, duplicate.created_at)
+            db.delete(duplicate)
+        primary.additional_data = "\n".join(notes) or None
+        merged.append(primary)
+    adjust_contact_count(user.id, len(merged) - len(ids), db)
+    db.commit()
+    return merged
+
+
+@traced
+async def get_upcoming_birthdays(
+        db: Session,
+        fields: List[str] | None = None) -> List[Contact]:
     """
     Retrieves a list of contacts with upcoming birthdays .
 
     :param db: The database session.
     :type db: Session
+    :param fields: If given, only these columns are selected and rows
+      are returned instead of contacts.
+    :type fields: List[str] | None
     :return: The list of contacts with upcoming birthdays,
       or None if it does not exist.
     :rtype: Note | None
@@ -235,7 +603,68 @@ async def get_upcoming_birthdays(db: Session) -> List[Contact]:
         func.to_char(Contact.birth_date, "DD")
     )
 
-    return db.query(Contact).filter(
+    return db.query(*contact_entities(fields)).filter(
         (month_day_contact >= month_day_today) &
         (month_day_contact <= month_day_next_week)
         ).all()
+
+
+def birthday_month_days(day: date) -> List[tuple]:
+    """
+    Returns the (month, day) pairs of the birthdays celebrated on a day.
+
+    People born on February 29 celebrate on February 28 in common years.
+
+    :param day: The day.
+    :type day: date
+    :return: The (month, day) pairs.
+    :rtype: List[tuple]
+    """
+    month_days = [(day.month, day.day)]
+    if (day.month, day.day) == (2, 28) and \
+            (day + timedelta(days=1)).month == 3:
+        month_days.append((2, 29))
+    return month_days
+
+
+@traced
+async def get_birthday_chunk(
+        day: date,
+        shard: int,
+        shards: int,
+        after: tuple,
+        limit: int,
+        db: Session) -> list:
+    """
+    Retrieves one chunk of the contacts of all users whose birthday is
+      on a day, with the email of their owner.
+
+    The contacts are split into ``shards`` by user and read in
+      ``(user_id, id)`` order from the birthday index, starting after the
+      last contact of the previous chunk.
+
+    :param day: The day.
+    :type day: date
+    :param shard: The shard to read, from 0 to ``shards - 1``.
+    :type shard: int
+    :param shards: The number of shards.
+    :type shards: int
+    :param after: The ``(user_id, id)`` of the last contact already read.
+    :type after: tuple
+    :param limit: The maximum number of contacts.
+    :type limit: int
+    :param db: The database session.
+    :type db: Session
+    :return: Rows with the contact's id, user_id, first_name, last_name,
+      email and birth_date, and the owner's user_email.
+    :rtype: list
+    """
+    return db.query(
+        Contact.id, Contact.user_id, Contact.first_name, Contact.last_name,
+        Contact.email, Contact.birth_date, User.email.label("user_email")
+        ).join(User, User.id == Contact.user_id).filter(
+        or_(*(and_(Contact.birth_month == month, Contact.birth_day == day_)
+              for month, day_ in birthday_month_days(day))),
+        Contact.user_id % shards == shard,
+        tuple_(Contact.user_id, Contact.id) > tuple_(*after)
+        ).order_by(Contact.user_id, Contact.id).limit(limit).all()
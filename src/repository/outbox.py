@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.database.models import EmailOutbox
+from src.services.tracing import traced
+
+
+@traced
+async def enqueue_email(kind: str, recipient: str, payload: dict,
+                        db: Session, commit: bool = True) -> EmailOutbox:
+    """
+    Adds an email to the outbox.
+
+    :param kind: The kind of email, which selects how it is built.
+    :type kind: str
+    :param recipient: The recipient address.
+    :type recipient: str
+    :param payload: The data the email is built from.
+    :type payload: dict
+    :param db: The database session.
+    :type db: Session
+    :param commit: Commit now; pass False to commit the email together
+      with the caller's own changes.
+    :type commit: bool
+    :return: The outbox entry.
+    :rtype: EmailOutbox
+    """
+    now = datetime.now()
+    email = EmailOutbox(kind=kind, recipient=recipient, payload=payload,
+                        status="pending", attempts=0, next_attempt_at=now,
+                        created_at=now)
+    db.add(email)
+    if commit:
+        db.commit()
+    return email
+
+
+@traced
+async def enqueue_emails(emails: List[dict], db: Session,
+                         commit: bool = True) -> int:
+    """
+    Adds a batch of emails to the outbox, skipping the emails whose
+    ``dedupe_key`` is already queued.
+
+    :param emails: The emails, as dicts with the ``kind``, ``recipient``,
+      ``payload`` and ``dedupe_key`` of each.
+    :type emails: List[dict]
+    :param db: The database session.
+    :type db: Session
+    :param commit: Commit now; pass False to commit the emails together
+      with the caller's own changes.
+    :type commit: bool
+    :return: The number of added emails.
+    :rtype: int
+    """
+    keys = [email["dedupe_key"] for email in emails if email["dedupe_key"]]
+    queued = set(db.scalars(select(EmailOutbox.dedupe_key).where(
+        EmailOutbox.dedupe_key.in_(keys)))) if keys else set()
+    now = datetime.now()
+    added = [
+        EmailOutbox(**email, status="pending", attempts=0,
+                    next_attempt_at=now, created_at=now)
+        for email in emails if email["dedupe_key"] not in queued
+    ]
+    db.add_all(added)
+    if commit:
+        db.commit()
+    return len(added)
+
+
+@traced
+async def claim_emails(batch_size: int, lease: timedelta,
+                       db: Session) -> List[EmailOutbox]:
+    """
+    Claims a batch of due emails for sending.
+
+    The rows are locked with ``FOR UPDATE SKIP LOCKED``, so concurrent
+    workers claim disjoint batches without waiting for each other, and
+    leased by moving ``next_attempt_at`` forward before the commit.
+
+    :param batch_size: The maximum number of emails to claim.
+    :type batch_size: int
+    :param lease: How long the claim lasts before another worker may
+      retry the emails.
+    :type lease: timedelta
+    :param db: The database session.
+    :type db: Session
+    :return: The claimed emails.
+    :rtype: List[EmailOutbox]
+    """
+    now = datetime.now()
+    emails = list(db.scalars(
+        select(EmailOutbox)
+        .where(EmailOutbox.status == "pending",
+               EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ))
+    ids = [email.id for email in emails]
+    for email in emails:
+        email.attempts += 1
+        email.next_attempt_at = now + lease
+    db.commit()
+    if ids:
+        # The commit expires the emails; one query loads them all again
+        # instead of one refresh per email.
+        db.scalars(select(EmailOutbox).where(EmailOutbox.id.in_(ids))).all()
+    return emails
+
+
+@traced
+async def mark_sent(email: EmailOutbox, db: Session,
+                    commit: bool = True) -> None:
+    """
+    Records that an email was sent.
+
+    :param email: The outbox entry.
+    :type email: EmailOutbox
+    :param db: The database session.
+    :type db: Session
+    :param commit: Commit now; pass False to commit several updates
+      together.
+    :type commit: bool
+    """
+    email.status = "sent"
+    email.sent_at = datetime.now()
+    email.last_error = None
+    if commit:
+        db.commit()
+
+
+@traced
+async def mark_failed(email: EmailOutbox, error: str, max_attempts: int,
+                      backoff: timedelta, db: Session,
+                      commit: bool = True) -> None:
+    """
+    Records a failed attempt and schedules a retry with exponential
+    backoff, or gives up after ``max_attempts``.
+
+    :param email: The outbox entry.
+    :type email: EmailOutbox
+    :param error: The error message.
+    :type error: str
+    :param max_attempts: The number of attempts before giving up.
+    :type max_attempts: int
+    :param backoff: The delay before the first retry; it doubles with
+      every further attempt.
+    :type backoff: timedelta
+    :param db: The database session.
+    :type db: Session
+    :param commit: Commit now; pass False to commit several updates
+      together.
+    :type commit: bool
+    """
+    email.last_error = error[:1000]
+    if email.attempts >= max_attempts:
+        email.status = "failed"
+    else:
+        email.next_attempt_at = datetime.now() + \
+            backoff * 2 ** (email.attempts - 1)
+    if commit:
+        db.commit()
@@ -1,10 +1,13 @@
 from libgravatar import Gravatar
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from src.database.models import User
+from src.database.models import Contact, User
 from src.schemas import UserModel
+from src.services.tracing import traced
 
 
+@traced
 async def get_user_by_email(email: str, db: Session) -> User:
     """
     Retrieves a single user with the specified email.
@@ -19,6 +22,7 @@ async def get_user_by_email(email: str, db: Session) -> User:
     return db.query(User).filter(User.email == email).first()
 
 
+@traced
 async def create_user(body: UserModel, db: Session) -> User:
     """
     Creates a new user.
@@ -43,6 +47,7 @@ async def create_user(body: UserModel, db: Session) -> User:
     return new_user
 
 
+@traced
 async def update_token(user: User, token: str | None, db: Session) -> None:
     """
     Refresh token.
@@ -60,6 +65,7 @@ async def update_token(user: User, token: str | None, db: Session) -> None:
     db.commit()
 
 
+@traced
 async def confirmed_email(email: str, db: Session) -> None:
     """
     To confirm the user by email.
@@ -76,18 +82,51 @@ async def confirmed_email(email: str, db: Session) -> None:
     db.commit()
 
 
-async def update_avatar(email, url: str, db: Session) -> User:
+@traced
+async def update_avatar(email, url: str, db: Session,
+                        avatar_hash: str | None = None) -> User:
     """
     To update the user's avatar.
 
+    Nothing is written if the avatar has the same hash as the current
+    one.
+
     :param email: The email of the user to update avatar.
     :type email: str
+    :param url: The URL of the new avatar.
+    :type url: str
     :param db: The database session.
     :type db: Session
+    :param avatar_hash: The hash of the new avatar.
+    :type avatar_hash: str | None
     :return: The newly created token.
     :rtype: Note
     """
     user = await get_user_by_email(email, db)
+    if avatar_hash is not None and user.avatar_hash == avatar_hash:
+        return user
     user.avatar = url
+    user.avatar_hash = avatar_hash
     db.commit()
     return user
+
+
+@traced
+async def reconcile_contact_counts(db: Session) -> int:
+    """
+    Resets the contact counter of every user whose counter drifted
+      from the actual number of contacts.
+
+    :param db: The database session.
+    :type db: Session
+    :return: The number of corrected users.
+    :rtype: int
+    """
+    actual = select(func.count(Contact.id)).where(
+        Contact.user_id == User.id
+        ).scalar_subquery()
+    corrected = db.query(User).filter(User.contact_count != actual).update(
+        {User.contact_count: actual}, synchronize_session=False
+        )
+    db.commit()
+    return corrected
@@ -1,7 +1,7 @@
 # from typing import List
 
 from fastapi import APIRouter, HTTPException, Depends, status, Security
-from fastapi import BackgroundTasks, Request
+from fastapi import Request
 from fastapi.security import (
     OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
     )
@@ -10,29 +10,36 @@ from sqlalchemy.orm import Session
 from src.database.db import get_db
 from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
+from src.repository import outbox as repository_outbox
+from src.services.admission import AuthAdmission, hash_budget
 from src.services.auth import auth_service
-from src.services.email import send_email
+from src.services.content_negotiation import MsgPackRoute
 
 
-router = APIRouter(prefix='/auth', tags=["auth"])
+router = APIRouter(
+    prefix='/auth', tags=["auth"], route_class=MsgPackRoute
+    )
 security = HTTPBearer()
 
 
 @router.post("/signup",
              response_model=UserResponse,
-             status_code=status.HTTP_201_CREATED)
+             status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(AuthAdmission("auth:signup", "email"))])
 async def signup(body: UserModel,
-                 background_tasks: BackgroundTasks,
                  request: Request,
                  db: Session = Depends(get_db)
                  ):
     """
     User signup.
 
+    The confirmation email is queued in the outbox in the same
+    transaction as the user and sent by the outbox worker. The request
+    is admitted by :class:`src.services.admission.AuthAdmission` before
+    the password is hashed.
+
     :param body: The data for user creation.
     :type body: UserModel
-    :param background_tasks: Backgroun tasks
-    :type background_tasks: BackgroundTasks
     :param request: Request the user's signup.
     :type request: Request.
     :param db: The database session.
@@ -44,27 +51,32 @@ async def signup(body: UserModel,
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT,
                             detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(
-        send_email,
-        new_user.email,
-        # new_user.username,
-        request.base_url
+    body.password = await hash_budget.run(auth_service.get_password_hash,
+                                          body.password)
+    # Committed together with the user by create_user.
+    await repository_outbox.enqueue_email(
+        "confirm_email", body.email, {"host": str(request.base_url)}, db,
+        commit=False
         )
+    new_user = await repository_users.create_user(body, db)
     return {"user": new_user,
             "detail":
             "User successfully created. Check your email for confirmation."
             }
 
 
-@router.post("/login", response_model=TokenModel)
+@router.post("/login", response_model=TokenModel,
+             dependencies=[Depends(AuthAdmission("auth:login", "username"))])
 async def login(body: OAuth2PasswordRequestForm = Depends(),
                 db: Session = Depends(get_db)
                 ):
     """
     User login.
 
+    The request is admitted by
+    :class:`src.services.admission.AuthAdmission` before the user is
+    looked up and the password verified.
+
     :param body: Password request form.
     :type body: OAuth2PasswordRequestForm.
     :param db: The database session.
@@ -83,7 +95,8 @@ async def login(body: OAuth2PasswordRequestForm = Depends(),
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email not confirmed"
             )
-    if not auth_service.verify_password(
+    if not await hash_budget.run(
+        auth_service.verify_password,
         body.password,
         user.password
             ):
@@ -175,7 +188,6 @@ async def confirmed_email(
 @router.post('/request_email')
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db)
         ):
@@ -184,8 +196,6 @@ async def request_email(
 
     :param body: Request email.
     :type body: RequestEmail.
-    :param background_tasks: BackgroundTasks.
-    :type background_tasks: BackgroundTasks.
     :param request: Request for email confirmation.
     :type request: Request.
     :param db: The database session.
@@ -195,12 +205,9 @@ async def request_email(
     """
     user = await repository_users.get_user_by_email(body.email, db)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(
-            send_email,
-            user.email,
-            # user.username,
-            request.base_url)
+        await repository_outbox.enqueue_email(
+            "confirm_email", user.email, {"host": str(request.base_url)}, db)
     return {"message": "Check your email for confirmation."}
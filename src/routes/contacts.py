@@ -1,41 +1,84 @@
-from typing import List
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-# from fastapi_limiter import RateLimiter
-from fastapi_limiter.depends import RateLimiter
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
 
-from src.database.db import get_db
-from src.schemas import ContactBase, ContactResponse, ContactUpdate
+from src.database.db import get_db, get_session_factory
+from src.schemas import (
+    ContactBase, ContactResponse, ContactUpdate, PhoneLookup, DuplicateGroup,
+    ContactMerge, ContactImport
+)
 from src.repository.contacts import (
     get_contact_id, get_contacts, create_contact, remove_contact,
     update_contact, get_contact_name, get_contact_last_name, get_contact_email,
-    get_upcoming_birthdays
+    get_upcoming_birthdays, get_contact_suggestions, get_contacts_by_phone,
+    get_contacts_by_phones, get_duplicate_contacts, merge_contacts,
+    get_contact_count, iter_contact_batches, create_contacts
 )
 from src.services.auth import auth_service
+from src.services.content_negotiation import MsgPackRoute
+from src.services.normalization import normalize_phone
+from src.services.rate_limiter import RateLimit
+from src.services.contact_query import (
+    parse_fields, parse_filters, parse_sort
+)
+from src.services.serialization import (
+    CONTACT_FIELDS, contact_rows_ndjson, contact_rows_response
+)
+from src.conf.config import settings
 from src.database.models import Contact, User
 
-router = APIRouter(prefix='/contacts')
+router = APIRouter(prefix='/contacts', route_class=MsgPackRoute)
+
+
+def fast_list_fields() -> List[str] | None:
+    """
+    Returns the columns list routes select in the fast JSON mode.
+
+    :return: All contact columns if ``FAST_JSON_RESPONSES`` is enabled,
+      otherwise None so that contacts are loaded and validated.
+    :rtype: List[str] | None
+    """
+    return list(CONTACT_FIELDS) if settings.fast_json_responses else None
 
 
 @router.get("/",
             response_model=List[ContactResponse],
             description='No more than 10 requests per minute',
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+            dependencies=[Depends(RateLimit("contacts:list", "10/minute"))])
 async def read_contacts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    filters: List[str] = Query(
+        default=[], alias="filter",
+        description="field:operator:value, e.g. last_name:prefix:sm"),
+    sort: Optional[str] = Query(
+        default=None, description="Fields, e.g. last_name,-birth_date"),
+    fields: Optional[str] = Query(
+        default=None, description="Fields to return, e.g. first_name,email"),
     db: Session = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user)
      ):
     """
     Retrieves a list of contacs for a specific user
-      with specified pagination parameters.
+      with specified pagination parameters. The total number of matching
+      contacts is returned in the ``X-Total-Count`` header.
 
     :param skip: The number of contacts to skip.
     :type skip: int
     :param limit: The maximum number of contacts to return.
     :type limit: int
+    :param filters: Filter expressions the contacts must match.
+    :type filters: List[str]
+    :param sort: Comma-separated fields to sort by, ``-`` for descending.
+    :type sort: str | None
+    :param fields: Comma-separated fields to return; the other columns
+      are not selected and the rows skip response validation.
+    :type fields: str | None
+    :param response: The response to add the total count header to.
+    :type response: Response
     :param db: The database session.
     :type db: Session
     :param current_user: The user to retrieve contacts for.
@@ -43,10 +86,111 @@ async def read_contacts(
     :return: A list of contacts.
     :rtype: List[Note]
     """
-    contacts = await get_contacts(skip, limit, current_user, db)
+    try:
+        conditions = parse_filters(filters)
+        order_by = parse_sort(sort) if sort else []
+        columns = parse_fields(fields) if fields else fast_list_fields()
+    except ValueError as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    contacts = await get_contacts(
+        skip, limit, current_user, db, conditions, order_by, columns)
+    total = await get_contact_count(current_user, db, conditions)
+    headers = {"X-Total-Count": str(total)}
+    if columns:
+        return contact_rows_response(contacts, columns, headers)
+    response.headers.update(headers)
     return contacts
 
 
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+    session_factory: sessionmaker = Depends(get_session_factory),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Streams all contacts of a specific user as newline-delimited JSON.
+
+    :param session_factory: Opens the session the export reads from.
+    :type session_factory: sessionmaker
+    :param current_user: The user to export contacts for.
+    :type current_user: User
+    :return: A streaming response with one contact per line.
+    :rtype: StreamingResponse
+    """
+    def export_lines():
+        # The body streams after the get_db session is closed, so the
+        # export has its own session, closed when the stream ends.
+        db = session_factory()
+        try:
+            for rows in iter_contact_batches(current_user, db):
+                yield contact_rows_ndjson(rows)
+        finally:
+            db.close()
+
+    # A sync generator: Starlette iterates it in a worker thread, so the
+    # batch queries do not block the event loop.
+    return StreamingResponse(
+        export_lines(),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": 'attachment; filename="contacts.ndjson"'
+            }
+        )
+
+
+@router.get("/suggest", response_model=List[ContactResponse])
+async def read_contact_suggestions(
+    prefix: str = Query(min_length=1, max_length=50),
+    limit: int = Query(default=10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Retrieves as-you-type suggestions matching the beginning of a contact's
+      first name, last name or email.
+
+    :param prefix: The text typed so far.
+    :type prefix: str
+    :param limit: The maximum number of suggestions to return.
+    :type limit: int
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user to retrieve contacts for.
+    :type current_user: User
+    :return: A list of matching contacts.
+    :rtype: List[Contact]
+    """
+    fields = fast_list_fields()
+    contacts = await get_contact_suggestions(
+        prefix, limit, current_user, db, fields)
+    if fields:
+        return contact_rows_response(contacts)
+    return contacts
+
+
+@router.get("/duplicates", response_model=List[DuplicateGroup])
+async def read_duplicate_contacts(
+    min_score: float = Query(default=0.0, ge=0, le=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Retrieves groups of contacts that are probably the same person,
+      e.g. after an import.
+
+    :param min_score: The minimum similarity score of a group.
+    :type min_score: float
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user to retrieve contacts for.
+    :type current_user: User
+    :return: The candidate groups, best score first.
+    :rtype: List[DuplicateGroup]
+    """
+    return await get_duplicate_contacts(current_user, db, min_score)
+
+
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact_id(
     contact_id: int,
@@ -91,11 +235,14 @@ async def read_contact_name(
     :return: The contact with the specified name, or None if it does not exist.
     :rtype: Note | None
     """
-    contact = await get_contact_name(contact_name, current_user, db)
+    fields = fast_list_fields()
+    contact = await get_contact_name(contact_name, current_user, db, fields)
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Contact not found")
+    if fields:
+        return contact_rows_response(contact)
     return contact
 
 
@@ -120,11 +267,15 @@ async def read_contact_last_name(
     :return: The contact with the specified ID, or None if it does not exist.
     :rtype: Note | None
     """
-    contact = await get_contact_last_name(contact_last_name, current_user, db)
+    fields = fast_list_fields()
+    contact = await get_contact_last_name(
+        contact_last_name, current_user, db, fields)
     if not contact:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Contact not found")
+    if fields:
+        return contact_rows_response(contact)
     return contact
 
 
@@ -155,6 +306,69 @@ async def read_contact_email(
     return contact
 
 
+@router.get("/phone/{number}", response_model=List[ContactResponse])
+async def read_contacts_by_phone(
+    number: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Retrieves the contacts with the specified phone number
+      for a specific user (caller ID lookup).
+
+    :param number: The phone number in any common notation.
+    :type number: str
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user to retrieve contacts for.
+    :type current_user: User
+    :return: The contacts with the specified phone number.
+    :rtype: List[Contact]
+    """
+    try:
+        phone = normalize_phone(number, settings.phone_default_country_code)
+    except ValueError as err:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(err))
+    fields = fast_list_fields()
+    contacts = await get_contacts_by_phone(phone, current_user, db, fields)
+    if not contacts:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact not found")
+    if fields:
+        return contact_rows_response(contacts)
+    return contacts
+
+
+@router.post("/phone/lookup", response_model=Dict[str, List[ContactResponse]])
+async def lookup_contacts_by_phones(
+    body: PhoneLookup,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Resolves a batch of phone numbers, e.g. from a call log,
+      to the contacts of a specific user.
+
+    :param body: The phone numbers to resolve.
+    :type body: PhoneLookup
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user to retrieve contacts for.
+    :type current_user: User
+    :return: The matching contacts keyed by the normalized phone number;
+      numbers without a match map to an empty list.
+    :rtype: Dict[str, List[Contact]]
+    """
+    result = {number: [] for number in body.numbers}
+    for contact in await get_contacts_by_phones(
+            body.numbers, current_user, db):
+        result[contact.phone].append(contact)
+    return result
+
+
 @router.post("/",
              response_model=ContactResponse,
              status_code=status.HTTP_201_CREATED)
@@ -178,6 +392,54 @@ async def create_contact_route(
     return await create_contact(body, current_user, db)
 
 
+@router.post("/import",
+             response_model=List[ContactResponse],
+             status_code=status.HTTP_201_CREATED)
+async def import_contacts(
+    body: ContactImport,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Creates up to 1000 contacts for a specific user in one request.
+
+    :param body: The contacts to create.
+    :type body: ContactImport
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user to create contacts for.
+    :type current_user: User
+    :return: The newly created contacts.
+    :rtype: List[Contact]
+    """
+    return await create_contacts(body.contacts, current_user, db)
+
+
+@router.post("/merge", response_model=List[ContactResponse])
+async def merge_contacts_route(
+    body: ContactMerge,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+        ):
+    """
+    Merges groups of duplicate contacts into their primary contacts.
+
+    :param body: The groups to merge.
+    :type body: ContactMerge
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user to retrieve contacts for.
+    :type current_user: User
+    :return: The merged primary contacts.
+    :rtype: List[Contact]
+    """
+    contacts = await merge_contacts(body.groups, current_user, db)
+    if contacts is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    return contacts
+
+
 @router.put("/{contact_id}", response_model=ContactResponse)
 async def update_contact_route(
     body: ContactUpdate,
@@ -244,5 +506,8 @@ async def read_upcoming_birthdays(
       or None if it does not exist.
     :rtype: Note | None
     """
-    contacts = await get_upcoming_birthdays(db)
+    fields = fast_list_fields()
+    contacts = await get_upcoming_birthdays(db, fields)
+    if fields:
+        return contact_rows_response(contacts)
     return contacts
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.services.metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics",
+            response_class=PlainTextResponse,
+            include_in_schema=False)
+async def read_metrics():
+    """
+    Exposes the application metrics in the Prometheus text format.
+
+    :return: The metrics.
+    :rtype: PlainTextResponse
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,83 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+
+from src.conf.config import settings
+from src.schemas import ProfilingSwitchModel
+from src.services.profiling import (
+    list_profiles, profile_path, profiling_switch
+)
+
+router = APIRouter(prefix="/admin/profiles", tags=["admin"])
+
+
+async def require_admin_token(x_admin_token: str = Header("")):
+    """
+    Rejects requests without the profiling admin token.
+
+    :param x_admin_token: The ``X-Admin-Token`` header.
+    :type x_admin_token: str
+    """
+    if not settings.profiling_admin_token or not secrets.compare_digest(
+            x_admin_token.encode(),
+            settings.profiling_admin_token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Invalid admin token")
+
+
+@router.get("/", dependencies=[Depends(require_admin_token)])
+async def read_profiles():
+    """
+    Lists the recent request profiles, newest first.
+
+    :return: The profile names, sizes and creation times.
+    :rtype: List[dict]
+    """
+    return list_profiles(settings.profiling_dir)
+
+
+@router.get("/switch", response_model=ProfilingSwitchModel,
+            dependencies=[Depends(require_admin_token)])
+async def read_switch():
+    """
+    Returns whether requests are profiled by this worker.
+
+    :return: The profiling switch.
+    :rtype: ProfilingSwitch
+    """
+    return profiling_switch
+
+
+@router.put("/switch", response_model=ProfilingSwitchModel,
+            dependencies=[Depends(require_admin_token)])
+async def update_switch(body: ProfilingSwitchModel):
+    """
+    Turns profiling on or off and sets its sample rate, without a
+      restart. The change applies to the worker serving the request.
+
+    :param body: The new state of the switch.
+    :type body: ProfilingSwitchModel
+    :return: The profiling switch.
+    :rtype: ProfilingSwitch
+    """
+    profiling_switch.enabled = body.enabled
+    profiling_switch.sample_rate = body.sample_rate
+    return profiling_switch
+
+
+@router.get("/{name}", dependencies=[Depends(require_admin_token)])
+async def download_profile(name: str):
+    """
+    Downloads a profile in the collapsed stack format.
+
+    :param name: The profile name.
+    :type name: str
+    :return: The profile file.
+    :rtype: FileResponse
+    """
+    path = profile_path(settings.profiling_dir, name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
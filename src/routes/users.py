@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, status, UploadFile, File
 from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
 
 from src.database.db import get_db
 from src.database.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.avatars import (AvatarStorage, AvatarUploadRoute,
+                                  get_avatar_storage, hash_upload,
+                                  store_avatar)
 from src.conf.config import settings
 from src.schemas import UserDb
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"],
+                   route_class=AvatarUploadRoute)
 
 
 @router.get("/me/",
@@ -34,41 +36,37 @@ async def read_users_me(
 async def update_avatar_user(
     file: UploadFile = File(),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    storage: AvatarStorage = Depends(get_avatar_storage)
         ):
     """
     To update the user's avatar.
 
+    The image is resized to 250x250 locally and stored in the configured
+    avatar storage, off the event loop, under the hash of its content.
+    Uploading the current avatar again changes nothing.
+
     :param file: The file with the new avatar.
     :type file: UploadFile.
     :param current_user: Current user.
     :type current_user: User
     :param db: The database session.
     :type db: Session
+    :param storage: The avatar storage.
+    :type storage: AvatarStorage
     :return: The newly created token.
     :rtype: Note
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(
-        file.file, public_id=f'QuotesApp/{current_user.username}',
-        overwrite=True
-        )
-    src_url = cloudinary.CloudinaryImage(
-        f'NotesApp/{current_user.username}')\
-        .build_url(width=250,
-                   height=250,
-                   crop='fill',
-                   version=r.get('version')
-                   )
+    avatar_hash = await hash_upload(file, settings.avatar_max_bytes)
+    # The database copy, the cached current user may be stale.
+    user = await repository_users.get_user_by_email(current_user.email, db)
+    if user.avatar_hash == avatar_hash:
+        return user
+    src_url = await store_avatar(file.file, avatar_hash, storage)
     user = await repository_users.update_avatar(
         current_user.email,
         src_url,
-        db
+        db,
+        avatar_hash
         )
     return user
@@ -1,29 +1,88 @@
 from datetime import datetime, date
-from typing import Optional
-from pydantic import BaseModel, Field, EmailStr
+from typing import List, Optional
+from pydantic import (
+    BaseModel, Field, EmailStr, field_validator, model_validator
+)
 
+from src.conf.config import settings
+from src.services.normalization import normalize_phone
 
-class ContactBase(BaseModel):
+
+class ContactFields(BaseModel):
     first_name: str = Field(max_length=50)
     last_name: str = Field(max_length=50)
     email: EmailStr
-    phone: int = Field(gt=0)
+    phone: str = Field(max_length=16)
     birth_date: date
     additional_data: Optional[str] = None
     created_at: datetime
 
 
+class ContactBase(ContactFields):
+
+    @field_validator("phone", mode="before")
+    @classmethod
+    def parse_phone(cls, value):
+        return normalize_phone(value, settings.phone_default_country_code)
+
+
 class ContactUpdate(ContactBase):
     pass
 
 
-class ContactResponse(ContactBase):
+# Phones are only validated on input: rows stored before they were
+# normalized to E.164 are returned as they are.
+class ContactResponse(ContactFields):
     id: int
 
     class Config:
         from_attributes = True
 
 
+class ContactImport(BaseModel):
+    contacts: List[ContactBase] = Field(min_length=1, max_length=1000)
+
+
+class PhoneLookup(BaseModel):
+    numbers: List[str] = Field(min_length=1, max_length=1000)
+
+    @field_validator("numbers", mode="before")
+    @classmethod
+    def normalize_numbers(cls, value):
+        if not isinstance(value, list):
+            return value
+        return [
+            normalize_phone(number, settings.phone_default_country_code)
+            for number in value
+            ]
+
+
+class DuplicateGroup(BaseModel):
+    score: float
+    reasons: List[str]
+    contacts: List[ContactResponse]
+
+
+class ContactMergeGroup(BaseModel):
+    primary_id: int
+    duplicate_ids: List[int] = Field(min_length=1)
+
+
+class ContactMerge(BaseModel):
+    groups: List[ContactMergeGroup] = Field(min_length=1, max_length=1000)
+
+    @model_validator(mode="after")
+    def check_disjoint_groups(self):
+        seen = set()
+        for group in self.groups:
+            for contact_id in [group.primary_id, *group.duplicate_ids]:
+                if contact_id in seen:
+                    raise ValueError(
+                        f"Contact {contact_id} appears more than once")
+                seen.add(contact_id)
+        return self
+
+
 class UserModel(BaseModel):
     email: str
     password: str = Field(min_length=6, max_length=10)
@@ -51,3 +110,11 @@ class TokenModel(BaseModel):
 
 class RequestEmail(BaseModel):
     email: EmailStr
+
+
+class ProfilingSwitchModel(BaseModel):
+    enabled: bool
+    sample_rate: float = Field(default=0.0, ge=0, le=1)
+
+    class Config:
+        from_attributes = True
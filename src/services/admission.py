@@ -0,0 +1,161 @@
+import math
+import os
+from typing import Callable
+
+import anyio
+from fastapi import HTTPException, Request, status
+from starlette.formparsers import MultiPartException
+
+from src.conf.config import settings
+from src.services.metrics import CallbackMetric, Counter, registry
+from src.services.rate_limiter import Limit, rate_limiter
+
+
+# Retry-After of the requests rejected while every hash slot is taken.
+BUSY_RETRY_SECONDS = 1
+FORM_TYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+
+
+class HashBudget:
+    """
+    Bounds the password hashing of a worker.
+
+    At most ``concurrency`` hashes run at a time, each in a worker thread
+    so the event loop keeps serving other requests, and at most ``queue``
+    more admitted requests wait for a slot. Requests beyond that are
+    refused by :meth:`admit` before they do any work.
+    """
+
+    def __init__(self, concurrency: int, queue: int):
+        self.concurrency = concurrency
+        self.capacity = concurrency + queue
+        self.admitted = 0
+        self.limiter = anyio.CapacityLimiter(concurrency)
+
+    def admit(self) -> bool:
+        """
+        Reserves a place for a request that will hash a password.
+
+        :return: False if the budget is exhausted.
+        :rtype: bool
+        """
+        if self.admitted >= self.capacity:
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.admitted -= 1
+
+    async def run(self, func: Callable, *args):
+        """
+        Runs a hashing function in a worker thread.
+
+        :param func: The function, e.g. ``auth_service.verify_password``.
+        :type func: Callable
+        :return: The result of the function.
+        """
+        return await anyio.to_thread.run_sync(func, *args,
+                                              limiter=self.limiter)
+
+
+hash_budget = HashBudget(
+    settings.auth_hash_concurrency or os.cpu_count() or 1,
+    settings.auth_hash_queue)
+
+auth_admission_rejections_total = registry.register(Counter(
+    "auth_admission_rejections_total",
+    "Auth requests rejected before hashing a password.", ("reason",)))
+registry.register(CallbackMetric(
+    "auth_hash_admitted", "Admitted requests hashing or waiting to hash.",
+    "gauge", lambda: hash_budget.admitted))
+
+
+def too_many_requests(reason: str, wait: float) -> HTTPException:
+    auth_admission_rejections_total.inc(reason)
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                         detail="Too Many Requests",
+                         headers={"Retry-After": str(math.ceil(wait))})
+
+
+async def read_account(request: Request, field: str) -> str:
+    """
+    Reads the account a request is about from its already parsed body.
+
+    :param request: The request.
+    :type request: Request
+    :param field: The form or JSON field holding the email.
+    :type field: str
+    :return: The lowercased email, or an empty string if the body has no
+      such field or cannot be parsed; the endpoint then rejects it.
+    :rtype: str
+    """
+    try:
+        if request.headers.get("content-type", "").startswith(FORM_TYPES):
+            data = await request.form()
+        else:
+            data = await request.json()
+    except (ValueError, MultiPartException):
+        return ""
+    value = data.get(field) if hasattr(data, "get") else None
+    return str(value).strip().lower() if value else ""
+
+
+class AuthAdmission:
+    """
+    A dependency that admits a request to a route hashing a password.
+
+    It runs before the endpoint, so a rejected request costs neither a
+    database lookup nor a hash: it checks the worker's
+    :class:`HashBudget` and the ``auth_ip_limit``, ``auth_account_limit``
+    and ``auth_account_total_limit`` limits of the route, shared by the
+    workers through the rate limiter, and rejects with 429 and
+    ``Retry-After``. The budget place is held until the endpoint returns.
+
+    The account is read from the request body, so anyone can charge it.
+    ``auth_account_limit`` is therefore kept per account and client IP:
+    it stops guessing from one address without locking out the owner,
+    who logs in from another. ``auth_account_total_limit`` bounds the
+    attempts on an account from all addresses together; it is set well
+    above what its owner needs, so that only a distributed attack fills
+    it, and while it does the account is locked out for everyone.
+
+    :param name: The name of the route in the rate limit keys.
+    :type name: str
+    :param account_field: The body field holding the account's email.
+    :type account_field: str
+    """
+
+    def __init__(self, name: str, account_field: str):
+        self.name = name
+        self.account_field = account_field
+        self.ip_limit = Limit.parse(settings.auth_ip_limit)
+        self.account_limit = Limit.parse(settings.auth_account_limit)
+        self.account_total_limit = Limit.parse(
+            settings.auth_account_total_limit)
+
+    async def __call__(self, request: Request):
+        if not hash_budget.admit():
+            raise too_many_requests("busy", BUSY_RETRY_SECONDS)
+        try:
+            await self.check_limits(request)
+            yield
+        finally:
+            hash_budget.release()
+
+    async def check_limits(self, request: Request) -> None:
+        host = request.client.host if request.client else "unknown"
+        wait = await rate_limiter.hit(f"{self.name}:ip:{host}",
+                                      self.ip_limit)
+        if wait:
+            raise too_many_requests("ip", wait)
+        account = await read_account(request, self.account_field)
+        if account:
+            wait = await rate_limiter.hit(
+                f"{self.name}:account:{account}:{host}", self.account_limit)
+            if wait:
+                raise too_many_requests("account", wait)
+            wait = await rate_limiter.hit(f"{self.name}:account:{account}",
+                                          self.account_total_limit)
+            if wait:
+                raise too_many_requests("account_total", wait)
@@ -13,6 +13,8 @@ from src.database.db import get_db
 from src.database.models import User
 from src.repository import users as repository_users
 from src.conf.config import settings
+from src.services.metrics import redis_command_duration_seconds
+from src.services.tracing import tracer
 import redis
 
 import pickle
@@ -170,11 +172,12 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(
-                token,
-                self.SECRET_KEY,
-                algorithms=[self.ALGORITHM]
-                )
+            with tracer.span("auth.jwt_decode"):
+                payload = jwt.decode(
+                    token,
+                    self.SECRET_KEY,
+                    algorithms=[self.ALGORITHM]
+                    )
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -183,13 +186,19 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
+        with tracer.span("redis.get"), \
+                    redis_command_duration_seconds.time("get"):
+            user = self.r.get(f"user:{email}")
         if user is None:
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
+            with tracer.span("redis.set"), \
+                    redis_command_duration_seconds.time("set"):
+                self.r.set(f"user:{email}", pickle.dumps(user))
+            with tracer.span("redis.expire"), \
+                    redis_command_duration_seconds.time("expire"):
+                self.r.expire(f"user:{email}", 900)
         else:
             user = pickle.loads(user)
         return user
@@ -0,0 +1,288 @@
+import hashlib
+import io
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Coroutine
+
+import anyio
+import cloudinary
+import cloudinary.uploader
+from fastapi import HTTPException, Request, Response, UploadFile, status
+from fastapi.routing import APIRoute
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Message
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.conf.config import settings
+
+try:
+    import boto3
+except ImportError:  # boto3 is optional, only the S3 backend needs it
+    boto3 = None
+
+
+AVATAR_SIZE = (250, 250)
+AVATAR_FORMAT = "WEBP"
+AVATAR_CONTENT_TYPE = "image/webp"
+CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 64 * 1024
+# Part of every avatar hash, so that changing the thumbnail size or
+# format gives new names instead of serving the old thumbnails.
+AVATAR_VARIANT = f"{AVATAR_SIZE[0]}x{AVATAR_SIZE[1]}.{AVATAR_FORMAT}"
+# Avatar URLs change with their content, so they can be cached forever.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Thumbnails and uploads run in their own threads, so slow storage cannot
+# take every thread of the default pool used by the sync dependencies.
+avatar_threads = anyio.CapacityLimiter(4)
+
+
+def too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Avatar is larger than {max_bytes} bytes")
+
+
+class AvatarUploadRoute(APIRoute):
+    """
+    A route whose request body may not exceed ``avatar_max_bytes`` plus
+    the multipart overhead.
+
+    Larger bodies are rejected with 413 up front when they declare their
+    ``Content-Length``, otherwise as soon as that much has been received,
+    before Starlette parses and spools the rest of the upload.
+    """
+
+    def get_route_handler(self) -> Callable[[Request],
+                                            Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            max_bytes = settings.avatar_max_bytes
+            limit = max_bytes + MULTIPART_OVERHEAD
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > limit:
+                raise too_large(max_bytes)
+            received = 0
+
+            async def receive() -> Message:
+                nonlocal received
+                message = await request.receive()
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI as is while it parses the body.
+                    raise too_large(max_bytes)
+                return message
+
+            return await handler(Request(request.scope, receive))
+
+        return route_handler
+
+
+async def hash_upload(file: UploadFile, max_bytes: int) -> str:
+    """
+    Hashes an upload and rewinds it.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param max_bytes: The maximum size of the upload.
+    :type max_bytes: int
+    :return: The hex SHA-256 of the upload and ``AVATAR_VARIANT``.
+    :rtype: str
+    :raises HTTPException: 413 if the upload is larger than ``max_bytes``.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise too_large(max_bytes)
+    digest = hashlib.sha256(AVATAR_VARIANT.encode())
+    size = 0
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large(max_bytes)
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+def make_thumbnail(source: BinaryIO) -> bytes:
+    """
+    Crops and resizes an image to the avatar size.
+
+    :param source: The image file.
+    :type source: BinaryIO
+    :return: The thumbnail, encoded as ``AVATAR_FORMAT``.
+    :rtype: bytes
+    :raises HTTPException: 422 if the file is not a supported image.
+    """
+    try:
+        with Image.open(source) as image:
+            # Lets the JPEG decoder skip most of the pixels of big photos.
+            image.draft("RGB", (AVATAR_SIZE[0] * 2, AVATAR_SIZE[1] * 2))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            thumbnail = ImageOps.fit(image, AVATAR_SIZE,
+                                     Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Avatar is not a supported image")
+    output = io.BytesIO()
+    thumbnail.save(output, AVATAR_FORMAT, quality=85)
+    return output.getvalue()
+
+
+class AvatarStorage:
+    """
+    Stores avatar thumbnails under the hash of their source, so an
+    avatar is stored once however often and by whoever it is uploaded,
+    and is never overwritten. ``save`` blocks and is run in a worker
+    thread.
+    """
+
+    def save(self, key: str, data: bytes) -> str:
+        """
+        Stores a thumbnail, unless it is already stored.
+
+        :param key: The hash of the avatar.
+        :type key: str
+        :param data: The encoded thumbnail.
+        :type data: bytes
+        :return: The public URL of the avatar.
+        :rtype: str
+        """
+        raise NotImplementedError
+
+
+class CloudinaryStorage(AvatarStorage):
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str,
+                 folder: str = "ContactsApp"):
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key,
+                          api_secret=api_secret, secure=True)
+        self.folder = folder
+
+    def save(self, key: str, data: bytes) -> str:
+        # An existing public id is returned as is; Cloudinary serves the
+        # versioned URL with long-lived caching.
+        result = cloudinary.uploader.upload(
+            io.BytesIO(data), public_id=f"{self.folder}/{key}",
+            overwrite=False)
+        return result["secure_url"]
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Keeps the avatars in a directory served by the app under
+    ``base_url``, see :class:`AvatarStaticFiles`.
+    """
+
+    def __init__(self, directory: str, base_url: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, key: str, data: bytes) -> str:
+        name = f"{key}.{AVATAR_FORMAT.lower()}"
+        path = self.directory / name
+        if not path.exists():
+            # A unique temporary file per call, since threads of the
+            # avatar pool may save the same key at once; readers never
+            # see a partially written file.
+            with tempfile.NamedTemporaryFile(
+                    dir=self.directory, prefix=f".{name}.",
+                    delete=False) as temporary:
+                temporary.write(data)
+            try:
+                os.chmod(temporary.name, 0o644)
+                os.replace(temporary.name, path)
+            except OSError:
+                os.unlink(temporary.name)
+                raise
+        return f"{self.base_url}/{name}"
+
+
+class S3Storage(AvatarStorage):
+    """
+    Stores the avatars in an S3-compatible bucket (AWS, MinIO, R2, ...).
+    """
+
+    def __init__(self, bucket: str, public_url: str,
+                 endpoint_url: str | None = None,
+                 access_key: str | None = None,
+                 secret_key: str | None = None):
+        if boto3 is None:
+            raise RuntimeError("The S3 avatar storage requires boto3")
+        self.client = boto3.client(
+            "s3", endpoint_url=endpoint_url, aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key)
+        self.bucket = bucket
+        self.public_url = public_url.rstrip("/")
+
+    def save(self, key: str, data: bytes) -> str:
+        name = f"avatars/{key}.{AVATAR_FORMAT.lower()}"
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=name)
+        except self.client.exceptions.ClientError:
+            self.client.put_object(
+                Bucket=self.bucket, Key=name, Body=data,
+                ContentType=AVATAR_CONTENT_TYPE,
+                CacheControl=IMMUTABLE_CACHE_CONTROL)
+        return f"{self.public_url}/{name}"
+
+
+class AvatarStaticFiles(StaticFiles):
+    """
+    Serves the avatars of :class:`LocalStorage` with far-future caching.
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+@lru_cache
+def get_avatar_storage() -> AvatarStorage:
+    """
+    Returns the avatar storage selected by ``avatar_storage``, created
+    on first use; the app creates it at startup.
+
+    :return: The storage.
+    :rtype: AvatarStorage
+    """
+    if settings.avatar_storage == "local":
+        return LocalStorage(settings.avatar_local_dir,
+                            settings.avatar_base_url)
+    if settings.avatar_storage == "s3":
+        return S3Storage(
+            settings.avatar_s3_bucket, settings.avatar_s3_public_url,
+            settings.avatar_s3_endpoint_url or None,
+            settings.avatar_s3_access_key or None,
+            settings.avatar_s3_secret_key or None)
+    return CloudinaryStorage(settings.cloudinary_name,
+                             settings.cloudinary_api_key,
+                             settings.cloudinary_api_secret)
+
+
+async def store_avatar(source: BinaryIO, key: str,
+                       storage: AvatarStorage) -> str:
+    """
+    Makes the thumbnail of an uploaded image and stores it, without
+    blocking the event loop.
+
+    :param source: The image, e.g. the ``file`` of an upload.
+    :type source: BinaryIO
+    :param key: The hash of the image, as returned by :func:`hash_upload`.
+    :type key: str
+    :param storage: The storage.
+    :type storage: AvatarStorage
+    :return: The public URL of the avatar.
+    :rtype: str
+    """
+    thumbnail = await anyio.to_thread.run_sync(
+        make_thumbnail, source, limiter=avatar_threads)
+    return await anyio.to_thread.run_sync(
+        storage.save, key, thumbnail, limiter=avatar_threads)
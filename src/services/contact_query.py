@@ -0,0 +1,119 @@
+from datetime import date, datetime
+from typing import List
+
+from src.conf.config import settings
+from src.database.models import Contact
+from src.services.normalization import (
+    normalize_email, normalize_name, normalize_phone
+)
+from src.services.serialization import CONTACT_FIELDS
+
+
+def _phone(value: str) -> str:
+    return normalize_phone(value, settings.phone_default_country_code)
+
+
+# field -> (column, value parser, allowed operators)
+FILTER_FIELDS = {
+    "first_name": (Contact.first_name_key, normalize_name, {"eq", "prefix"}),
+    "last_name": (Contact.last_name_key, normalize_name, {"eq", "prefix"}),
+    "email": (Contact.email_key, normalize_email, {"eq", "prefix"}),
+    "phone": (Contact.phone, _phone, {"eq"}),
+    "birth_date": (Contact.birth_date, date.fromisoformat,
+                   {"eq", "gte", "lte"}),
+    "created_at": (Contact.created_at, datetime.fromisoformat,
+                   {"eq", "gte", "lte"}),
+}
+
+# Names and emails are sorted by their lookup keys, which are indexed
+# together with user_id.
+SORT_FIELDS = {
+    "id": Contact.id,
+    "first_name": Contact.first_name_key,
+    "last_name": Contact.last_name_key,
+    "email": Contact.email_key,
+    "birth_date": Contact.birth_date,
+    "created_at": Contact.created_at,
+}
+
+
+def parse_filters(filters: List[str]) -> list:
+    """
+    Compiles ``field:operator:value`` expressions into SQL conditions.
+
+    Supported operators are ``eq``, ``prefix``, ``gte`` and ``lte``; which
+    of them apply depends on the field.
+
+    :param filters: The filter expressions, e.g. ``last_name:prefix:sm``.
+    :type filters: List[str]
+    :return: The SQL conditions.
+    :rtype: list
+    :raises ValueError: If an expression is malformed or not allowed.
+    """
+    conditions = []
+    for expression in filters:
+        field, _, rest = expression.partition(":")
+        operator, _, raw_value = rest.partition(":")
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter by '{field}'")
+        column, parse, operators = FILTER_FIELDS[field]
+        if operator not in operators:
+            raise ValueError(
+                f"Operator '{operator}' is not supported for '{field}'")
+        value = parse(raw_value)
+        if operator == "eq":
+            conditions.append(column == value)
+        elif operator == "prefix":
+            conditions.append(column.startswith(value, autoescape=True))
+        elif operator == "gte":
+            conditions.append(column >= value)
+        else:
+            conditions.append(column <= value)
+    return conditions
+
+
+def parse_sort(sort: str) -> list:
+    """
+    Compiles a comma-separated list of fields into an ORDER BY clause.
+
+    A leading ``-`` sorts the field in descending order. The contact ID
+    is appended as a tie breaker so that pages are stable.
+
+    :param sort: The sort fields, e.g. ``last_name,-birth_date``.
+    :type sort: str
+    :return: The columns to order by.
+    :rtype: list
+    :raises ValueError: If a field cannot be sorted by.
+    """
+    order_by = []
+    fields = []
+    for item in filter(None, (item.strip() for item in sort.split(","))):
+        field = item.lstrip("-")
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by '{field}'")
+        column = SORT_FIELDS[field]
+        order_by.append(column.desc() if item.startswith("-")
+                        else column.asc())
+        fields.append(field)
+    if "id" not in fields:
+        order_by.append(Contact.id.asc())
+    return order_by
+
+
+def parse_fields(fields: str) -> List[str]:
+    """
+    Validates a comma-separated list of fields to return.
+
+    :param fields: The fields, e.g. ``first_name,email``.
+    :type fields: str
+    :return: The field names, always starting with ``id``.
+    :rtype: List[str]
+    :raises ValueError: If a field cannot be returned.
+    """
+    selected = ["id"]
+    for field in filter(None, (item.strip() for item in fields.split(","))):
+        if field not in CONTACT_FIELDS:
+            raise ValueError(f"Unknown field '{field}'")
+        if field not in selected:
+            selected.append(field)
+    return selected
@@ -0,0 +1,94 @@
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+
+from src.services.tracing import tracer
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, JSON is always available
+    msgpack = None
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Set by MsgPackRoute for the duration of a request that accepts msgpack.
+wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+def is_msgpack(media_type: str) -> bool:
+    return media_type.split(";")[0].strip().lower() in (
+        MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def accepts_msgpack(accept: str) -> bool:
+    return any(is_msgpack(item) for item in accept.split(","))
+
+
+class MsgPackRequest(Request):
+    """
+    A request with a MessagePack body that FastAPI reads as if it were JSON.
+    """
+
+    def __init__(self, scope, receive):
+        headers = [
+            (name, b"application/json") if name == b"content-type"
+            else (name, value)
+            for name, value in scope["headers"]
+            ]
+        super().__init__({**scope, "headers": headers}, receive)
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body())
+        return self._json
+
+
+class NegotiatedResponse(ORJSONResponse):
+    """
+    The default response class: JSON, or MessagePack when the route is a
+    MsgPackRoute and the client sent ``Accept: application/msgpack``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with tracer.span("serialize"):
+            if wants_msgpack.get():
+                self.media_type = MSGPACK_MEDIA_TYPE
+                return msgpack.packb(content)
+            return super().render(content)
+
+
+class MsgPackRoute(APIRoute):
+    """
+    A route that also accepts and returns MessagePack.
+
+    Request bodies are decoded from MessagePack when the ``Content-Type``
+    says so and validated against the same schemas as JSON bodies.
+    """
+
+    def get_route_handler(self) -> Callable[[Request],
+                                            Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            accept = request.headers.get("accept", "")
+            if not (is_msgpack(content_type) or accepts_msgpack(accept)):
+                return await handler(request)
+            if msgpack is None:
+                return Response(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                    if is_msgpack(content_type)
+                    else status.HTTP_406_NOT_ACCEPTABLE)
+            if is_msgpack(content_type):
+                request = MsgPackRequest(request.scope, request.receive)
+            token = wants_msgpack.set(accepts_msgpack(accept))
+            try:
+                return await handler(request)
+            finally:
+                wants_msgpack.reset(token)
+
+        return route_handler
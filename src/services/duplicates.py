@@ -0,0 +1,105 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Iterable, List, Tuple
+
+from src.services.normalization import soundex
+
+
+# (id, first_name_key, last_name_key, email_key, phone)
+ContactKeys = Tuple[int, str, str, str, str]
+
+
+def find_duplicate_groups(
+        rows: Iterable[ContactKeys],
+        max_block_size: int = 50) -> List[dict]:
+    """
+    Groups contacts that are probably the same person.
+
+    Contacts are bucketed by blocking keys (normalized email, phone and the
+    Soundex codes of the name), buckets sharing a contact are joined with
+    a union-find, and only the members of each resulting group are
+    compared, so the work grows with the number of contacts rather than
+    with the number of pairs.
+
+    :param rows: The lookup keys of the contacts to check.
+    :type rows: Iterable[ContactKeys]
+    :param max_block_size: Name buckets larger than this (very common
+      names) are ignored instead of producing one huge group.
+    :type max_block_size: int
+    :return: The groups as dicts with ``contact_ids``, ``reasons`` and
+      ``score``, best score first.
+    :rtype: List[dict]
+    """
+    parent = {}
+    keys = {}
+    blocks = defaultdict(list)
+    for contact_id, first_name, last_name, email, phone in rows:
+        parent[contact_id] = contact_id
+        keys[contact_id] = (f"{first_name} {last_name}", email, phone)
+        if email:
+            blocks[("email", email)].append(contact_id)
+        if phone:
+            blocks[("phone", phone)].append(contact_id)
+        name_key = soundex(first_name or "") + soundex(last_name or "")
+        if name_key:
+            blocks[("name", name_key)].append(contact_id)
+
+    def find(contact_id):
+        while parent[contact_id] != contact_id:
+            parent[contact_id] = parent[parent[contact_id]]
+            contact_id = parent[contact_id]
+        return contact_id
+
+    joined = []
+    for (kind, _), ids in blocks.items():
+        if len(ids) < 2 or (kind == "name" and len(ids) > max_block_size):
+            continue
+        joined.append((kind, ids[0]))
+        root = find(ids[0])
+        for contact_id in ids[1:]:
+            parent[find(contact_id)] = root
+
+    members = defaultdict(list)
+    for contact_id in parent:
+        members[find(contact_id)].append(contact_id)
+    reasons = defaultdict(set)
+    for kind, contact_id in joined:
+        reasons[find(contact_id)].add(kind)
+
+    groups = []
+    for root, ids in members.items():
+        if len(ids) < 2:
+            continue
+        groups.append({
+            "contact_ids": sorted(ids),
+            "reasons": sorted(reasons[root]),
+            "score": group_score([keys[contact_id] for contact_id in ids]),
+        })
+    groups.sort(key=lambda group: group["score"], reverse=True)
+    return groups
+
+
+def group_score(members: List[Tuple[str, str, str]]) -> float:
+    """
+    Scores how likely the members of a group are the same person.
+
+    Every member is compared with the first one only: an equal email or
+    phone counts as a near-certain match, otherwise the name similarity
+    is used.
+
+    :param members: The ``(full name, email, phone)`` keys of the group.
+    :type members: List[Tuple[str, str, str]]
+    :return: The mean similarity, from 0 to 1.
+    :rtype: float
+    """
+    anchor_name, anchor_email, anchor_phone = members[0]
+    matcher = SequenceMatcher(b=anchor_name, autojunk=False)
+    total = 0.0
+    for name, email, phone in members[1:]:
+        matcher.set_seq1(name)
+        score = matcher.ratio()
+        if (email and email == anchor_email) or \
+                (phone and phone == anchor_phone):
+            score = max(score, 0.9)
+        total += score
+    return round(total / (len(members) - 1), 3)
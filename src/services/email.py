@@ -1,57 +1,137 @@
+from email.message import EmailMessage
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
+from src.services.smtp_pool import SMTPPool
+from src.services.templating import TemplateRenderer
+from src.services.tracing import traced
 
 from src.conf.config import settings
 
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Desired Name",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+templates = TemplateRenderer(
+    Path(__file__).parent / 'templates',
+    cache_dir=settings.template_cache_dir or None,
+)
+
+# Started and closed by the outbox worker (src.workers.email_outbox).
+smtp_pool = SMTPPool(
+    hostname=settings.mail_server,
+    port=settings.mail_port,
+    username=settings.mail_username,
+    password=settings.mail_password,
+    use_tls=True,
+    size=settings.smtp_pool_size,
+    max_messages=settings.smtp_max_messages_per_connection,
 )
 
 
-async def send_email(email: EmailStr,
-                     #  username: str,
-                     host: str):
+def build_confirmation_email(email: EmailStr, host: str) -> EmailMessage:
     """
-    Send email for email verification.
+    Builds the email for email verification.
 
     :param email: email to send to.
-    :type data: EmailStr.
+    :type email: EmailStr
     :param host: host.
-    :type host: str.
-    :await: send_message
-    :rtype: Note | None
-    """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        # host = "localhost"
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={
-                "host": host,
-                # "username": username,
-                "token": token_verification
-                },
-            subtype=MessageType.html
+    :type host: str
+    :return: The message.
+    :rtype: EmailMessage
+    """
+    token_verification = auth_service.create_email_token({"sub": email})
+    message = EmailMessage()
+    message["Subject"] = "Confirm your email "
+    message["From"] = f"{settings.mail_from_name} <{settings.mail_from}>"
+    message["To"] = email
+    message.set_content(
+        templates.render(
+            "email_template.html",
+            host=host,
+            # username=username,
+            token=token_verification
+            ),
+        subtype="html"
+        )
+    return message
+
+
+def build_birthday_greeting(email: EmailStr, first_name: str,
+                            sender: str = "") -> EmailMessage:
+    """
+    Builds the birthday greeting sent to a contact, signed with the
+      service's name: the contact never sees its user's email address.
+
+    :param email: email to send to.
+    :type email: EmailStr
+    :param first_name: The first name of the contact.
+    :type first_name: str
+    :param sender: Ignored; greetings queued by earlier versions carry
+      the user's email here.
+    :type sender: str
+    :return: The message.
+    :rtype: EmailMessage
+    """
+    message = EmailMessage()
+    message["Subject"] = f"Happy birthday, {first_name}!"
+    message["From"] = f"{settings.mail_from_name} <{settings.mail_from}>"
+    message["To"] = email
+    message.set_content(
+        templates.render("birthday_greeting.html", first_name=first_name,
+                         sender=settings.mail_from_name),
+        subtype="html"
         )
+    return message
+
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+def build_birthday_reminder(email: EmailStr, contact_name: str, date: str,
+                            days: int) -> EmailMessage:
+    """
+    Builds the reminder of a contact's birthday sent to its user.
+
+    :param email: email to send to.
+    :type email: EmailStr
+    :param contact_name: The full name of the contact.
+    :type contact_name: str
+    :param date: The birthday, in ISO format.
+    :type date: str
+    :param days: The number of days until the birthday.
+    :type days: int
+    :return: The message.
+    :rtype: EmailMessage
+    """
+    message = EmailMessage()
+    message["Subject"] = f"Birthday reminder: {contact_name}"
+    message["From"] = f"{settings.mail_from_name} <{settings.mail_from}>"
+    message["To"] = email
+    message.set_content(
+        templates.render("birthday_reminder.html",
+                         contact_name=contact_name, date=date, days=days),
+        subtype="html"
+        )
+    return message
+
+
+# Outbox kinds -> builders taking the recipient and the payload.
+EMAIL_BUILDERS = {
+    "confirm_email": build_confirmation_email,
+    "birthday_greeting": build_birthday_greeting,
+    "birthday_reminder": build_birthday_reminder,
+}
+
+
+@traced
+async def send_outbox_email(kind: str, recipient: str,
+                            payload: dict) -> None:
+    """
+    Builds and sends an email queued in the outbox.
+
+    :param kind: The kind of email.
+    :type kind: str
+    :param recipient: The recipient address.
+    :type recipient: str
+    :param payload: The data the email is built from.
+    :type payload: dict
+    :raises aiosmtplib.SMTPException: If the email cannot be sent.
+    """
+    await smtp_pool.send(EMAIL_BUILDERS[kind](recipient, **payload))
@@ -0,0 +1,182 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"'
+             for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra.items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """
+    Base class of the metrics; values are kept per tuple of label values.
+
+    Metrics are updated without locks: they are almost always updated
+    from the event loop, and a rare lost update from a worker thread is
+    acceptable for monitoring.
+    """
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} {self.type}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.values.items()
+            ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """
+        Observes the duration of the ``with`` block in seconds.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, *labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_labels(self.labelnames, labels, le=bound)} "
+                    f"{cumulative}")
+            cumulative += series[-2]
+            lines.append(
+                f"{self.name}_bucket"
+                f"{_labels(self.labelnames, labels, le='+Inf')} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_labels(self.labelnames, labels)} "
+                f"{series[-1]}")
+            lines.append(
+                f"{self.name}_count{_labels(self.labelnames, labels)} "
+                f"{cumulative}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """
+    A counter or gauge whose value is read from a callback when the
+    metrics are scraped, e.g. totals kept by another module.
+    """
+
+    def __init__(self, name, help, type, callback: Callable[[], float]):
+        super().__init__(name, help)
+        self.type = type
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name} {self.callback()}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        :return: The exposition text.
+        :rtype: str
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.",
+    ("method", "route", "status")))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.",
+    ("method", "route")))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests being handled.",
+    ("method",)))
+db_pool_checkout_seconds = registry.register(Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a database connection from the pool."))
+db_queries_per_request = registry.register(Histogram(
+    "db_queries_per_request", "SQL queries issued by one HTTP request.",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100)))
+redis_command_duration_seconds = registry.register(Histogram(
+    "redis_command_duration_seconds", "Redis command latency.",
+    ("command",)))
+rate_limit_rejections_total = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter.",
+    ("route",)))
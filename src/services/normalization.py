@@ -0,0 +1,113 @@
+import unicodedata
+
+
+def fold_text(value: str) -> str:
+    """
+    Folds a string for case- and accent-insensitive comparison.
+
+    :param value: The text to fold.
+    :type value: str
+    :return: The text without diacritics, casefolded and stripped.
+    :rtype: str
+    """
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+        )
+    return stripped.casefold().strip()
+
+
+def normalize_email(email: str) -> str:
+    """
+    Builds the lookup key for an email address.
+
+    :param email: The email address.
+    :type email: str
+    :return: The lowercased email address.
+    :rtype: str
+    """
+    return email.strip().lower()
+
+
+def normalize_name(name: str) -> str:
+    """
+    Builds the lookup key for a first or last name.
+
+    :param name: The name.
+    :type name: str
+    :return: The case- and accent-folded name.
+    :rtype: str
+    """
+    return fold_text(name)
+
+
+def normalize_phone(phone: str | int, default_country_code: str) -> str:
+    """
+    Normalizes a phone number to the E.164 format.
+
+    Numbers written with a national trunk prefix (a single leading zero)
+    get the default country code; numbers without any prefix are assumed
+    to already start with a country code.
+
+    :param phone: The phone number as typed, e.g. ``(050) 123-45-67``.
+    :type phone: str | int
+    :param default_country_code: The country calling code used for
+      national numbers, without the plus sign.
+    :type default_country_code: str
+    :return: The phone number as ``+`` followed by up to 15 digits.
+    :rtype: str
+    :raises ValueError: If the value is not a valid phone number.
+    """
+    value = str(phone).strip()
+    for separator in " -.()/":
+        value = value.replace(separator, "")
+    if value.startswith("+"):
+        digits = value[1:]
+    elif value.startswith("00"):
+        digits = value[2:]
+    elif value.startswith("0"):
+        digits = default_country_code + value[1:]
+    else:
+        digits = value
+    if not digits.isdigit() or digits.startswith("0") \
+            or not 7 <= len(digits) <= 15:
+        raise ValueError(f"Invalid phone number: {phone}")
+    return f"+{digits}"
+
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def soundex(name: str) -> str:
+    """
+    Computes the American Soundex code of a name, so that names spelled
+    differently but pronounced alike (``Smith``/``Smyth``) share a key.
+
+    :param name: The name.
+    :type name: str
+    :return: A letter followed by three digits, or an empty string if the
+      name has no latin letters.
+    :rtype: str
+    """
+    letters = [
+        char for char in fold_text(name) if char.isascii() and char.isalpha()
+        ]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+        # "h" and "w" do not separate letters with the same code.
+        if char not in "hw":
+            previous = digit
+    return (code + "000")[:4]
@@ -0,0 +1,178 @@
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+from uuid import uuid4
+
+from src.conf.config import settings
+
+
+PROFILE_SUFFIX = ".folded"
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.folded$")
+
+
+class ProfilingSwitch:
+    """
+    Whether and how often requests are profiled, changed at runtime
+    through the admin routes.
+
+    The state is kept per process: with several workers, a change
+    applies to the worker that served it.
+    """
+
+    def __init__(self, enabled: bool = True, sample_rate: float = 0.0):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+
+
+profiling_switch = ProfilingSwitch(
+    settings.profiling_enabled, settings.profiling_sample_rate)
+
+
+class StackSampler:
+    """
+    A statistical profiler: a background thread that records the Python
+    stacks of the other threads at a fixed interval.
+
+    Every thread is sampled, the event loop as well as the threadpool
+    that runs sync endpoints, so a profile taken under load also shows
+    the other requests in flight. Stacks are rooted at the thread name.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name
+                             for thread in threading.enumerate()}
+                name = names.get(thread_id, str(thread_id))
+                self.stacks[collapse_stack(name, frame)] += 1
+
+    def collapsed(self) -> str:
+        """
+        Renders the samples in the collapsed stack format read by
+        ``flamegraph.pl``, speedscope and most flamegraph viewers.
+
+        :return: One ``frame;frame;frame count`` line per distinct stack.
+        :rtype: str
+        """
+        return "".join(f"{stack} {count}\n"
+                       for stack, count in self.stacks.most_common())
+
+
+def collapse_stack(thread_name: str, frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        name = getattr(code, "co_qualname", code.co_name)
+        frames.append(f"{name} "
+                      f"({os.path.basename(code.co_filename)}:"
+                      f"{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.append(thread_name)
+    # ";" separates frames and the last space separates the count.
+    return ";".join(item.replace(";", ":") for item in reversed(frames))
+
+
+def new_profile_name(method: str, path: str) -> str:
+    """
+    Builds a unique, filesystem-safe file name for a request's profile.
+
+    :param method: The request method.
+    :type method: str
+    :param path: The route template or path of the request.
+    :type path: str
+    :return: The file name.
+    :rtype: str
+    """
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    route = re.sub(r"[^\w]+", "_", path).strip("_") or "root"
+    return (f"{timestamp}-{method.lower()}-{route[:60]}-"
+            f"{uuid4().hex[:8]}{PROFILE_SUFFIX}")
+
+
+def save_profile(directory: str, name: str, sampler: StackSampler,
+                 keep: int) -> None:
+    """
+    Writes a profile and deletes the oldest ones beyond ``keep``.
+
+    :param directory: The profile directory.
+    :type directory: str
+    :param name: The profile file name.
+    :type name: str
+    :param sampler: The stopped sampler.
+    :type sampler: StackSampler
+    :param keep: How many profiles to keep.
+    :type keep: int
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), "w") as file:
+        file.write(sampler.collapsed())
+    for old in list_profiles(directory)[keep:]:
+        os.remove(os.path.join(directory, old["name"]))
+
+
+def list_profiles(directory: str) -> List[dict]:
+    """
+    Lists the saved profiles, newest first.
+
+    :param directory: The profile directory.
+    :type directory: str
+    :return: Dicts with ``name``, ``size`` and ``created_at``.
+    :rtype: List[dict]
+    """
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                "name": entry.name,
+                "size": stat.st_size,
+                "created_at": datetime.fromtimestamp(
+                    stat.st_mtime, timezone.utc),
+            })
+    profiles.sort(key=lambda profile: profile["created_at"], reverse=True)
+    return profiles
+
+
+def profile_path(directory: str, name: str) -> Optional[str]:
+    """
+    Resolves a profile name to its path, refusing anything that is not a
+    plain profile file name.
+
+    :param directory: The profile directory.
+    :type directory: str
+    :param name: The profile file name.
+    :type name: str
+    :return: The path, or None if there is no such profile.
+    :rtype: str | None
+    """
+    if not _PROFILE_NAME.match(name) or name.startswith("."):
+        return None
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from typing import Dict, NamedTuple
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.metrics import (CallbackMetric, Counter,
+                                  rate_limit_rejections_total, registry)
+
+
+logger = logging.getLogger("src.services.rate_limiter")
+
+# Takes up to ARGV[3] tokens from the bucket KEYS[1], refilled at ARGV[2]
+# tokens per millisecond up to ARGV[1], and returns how many were taken
+# and, if none, the milliseconds until the next token. The clock is the
+# Redis server's, so the workers need not agree on the time.
+LEASE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1000)
+local wait = 0
+if granted == 0 then
+    wait = math.ceil((1 - tokens) / rate)
+end
+return {granted, wait}
+"""
+
+# Errors after which the limiter stops using Redis for a while.
+REDIS_ERRORS = (RedisError, ConnectionError, TimeoutError, OSError)
+
+UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Limit(NamedTuple):
+    times: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        """
+        Parses ``"10/minute"`` or ``"10/60"`` (requests per seconds).
+
+        :param value: The limit.
+        :type value: str
+        :return: The limit.
+        :rtype: Limit
+        """
+        times, _, per = value.partition("/")
+        seconds = UNITS.get(per.strip().rstrip("s"))
+        return cls(int(times), seconds or float(per))
+
+
+class TokenBucket:
+    """
+    An in-process token bucket, used while Redis is unavailable.
+    """
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """
+        Takes a token.
+
+        :return: 0 if a token was taken, otherwise the seconds until the
+          next token.
+        :rtype: float
+        """
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Lease:
+    __slots__ = ("tokens", "expires")
+
+    def __init__(self, tokens: int, expires: float):
+        self.tokens = tokens
+        self.expires = expires
+
+
+class RateLimiter:
+    """
+    A token-bucket rate limiter shared by all workers through Redis.
+
+    Every bucket lives in Redis, but a worker does not ask Redis for each
+    request: it leases a chunk of tokens (``lease_fraction`` of the
+    limit) with one atomic script call and spends them locally, so most
+    requests are decided without a round trip. Leased tokens that are
+    not spent within ``lease_seconds`` are dropped, which keeps an idle
+    worker from holding on to quota.
+
+    When Redis fails, the limiter falls back to local buckets holding a
+    ``1 / local_share`` part of every limit, where ``local_share`` is
+    the number of workers, and tries Redis again after
+    ``retry_seconds``. Without Redis at all (:meth:`init` not called) it
+    only uses the local buckets.
+    """
+
+    def __init__(self, lease_fraction: float = 0.1,
+                 lease_seconds: float = 5, local_share: int = 1,
+                 retry_seconds: float = 5, prefix: str = "rate_limit",
+                 enabled: bool = True, max_keys: int = 100_000):
+        self.lease_fraction = lease_fraction
+        self.lease_seconds = lease_seconds
+        self.local_share = local_share
+        self.retry_seconds = retry_seconds
+        self.prefix = prefix
+        self.enabled = enabled
+        self.max_keys = max_keys
+        self.redis = None
+        self.script = None
+        self.redis_down_until = 0.0
+        self.leases: Dict[str, Lease] = {}
+        self.locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.local: Dict[str, TokenBucket] = {}
+
+    def init(self, redis) -> None:
+        """
+        Starts sharing the limits through Redis.
+
+        :param redis: An asyncio Redis client.
+        """
+        self.redis = redis
+        self.script = redis.register_script(LEASE_SCRIPT)
+        self.redis_down_until = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        return self.redis is None or \
+            time.monotonic() < self.redis_down_until
+
+    async def hit(self, key: str, limit: Limit) -> float:
+        """
+        Counts a request against a limit.
+
+        :param key: The bucket, e.g. the route and the user.
+        :type key: str
+        :param limit: The limit of the bucket.
+        :type limit: Limit
+        :return: 0 if the request is allowed, otherwise the seconds until
+          it would be.
+        :rtype: float
+        """
+        if not self.enabled:
+            return 0.0
+        if self.take_leased(key):
+            return 0.0
+        if self.degraded:
+            return self.take_local(key, limit)
+        async with self.locks[key]:
+            # Another request may have leased tokens while this one
+            # waited for the lock.
+            if self.take_leased(key):
+                return 0.0
+            chunk = max(1, int(limit.times * self.lease_fraction))
+            try:
+                granted, wait = await self.script(
+                    keys=[f"{self.prefix}:{key}"],
+                    args=[limit.times, limit.times / limit.seconds / 1000,
+                          chunk])
+            except REDIS_ERRORS as error:
+                if not self.degraded:
+                    logger.warning("Rate limiting locally, Redis failed: %r",
+                                   error)
+                self.redis_down_until = time.monotonic() + self.retry_seconds
+                return self.take_local(key, limit)
+        rate_limit_leases_total.inc()
+        if not granted:
+            return wait / 1000
+        self.prune()
+        self.leases[key] = Lease(granted - 1,
+                                 time.monotonic() + self.lease_seconds)
+        return 0.0
+
+    def take_leased(self, key: str) -> bool:
+        lease = self.leases.get(key)
+        if lease is None or lease.tokens < 1 or \
+                lease.expires < time.monotonic():
+            return False
+        lease.tokens -= 1
+        return True
+
+    def take_local(self, key: str, limit: Limit) -> float:
+        bucket = self.local.get(key)
+        if bucket is None:
+            self.prune()
+            share = limit.times / self.local_share
+            bucket = self.local[key] = TokenBucket(
+                max(1.0, share), share / limit.seconds)
+        return bucket.take(time.monotonic())
+
+    def prune(self) -> None:
+        """
+        Drops the expired leases and idle buckets once there are
+        ``max_keys`` of them.
+        """
+        if len(self.leases) + len(self.local) < self.max_keys:
+            return
+        now = time.monotonic()
+        self.leases = {key: lease for key, lease in self.leases.items()
+                       if lease.expires > now}
+        self.local = {key: bucket for key, bucket in self.local.items()
+                      if bucket.tokens + (now - bucket.updated)
+                      * bucket.rate < bucket.capacity}
+        for key in [key for key, lock in self.locks.items()
+                    if not lock.locked()]:
+            del self.locks[key]
+
+
+rate_limiter = RateLimiter(
+    lease_fraction=settings.rate_limit_lease_fraction,
+    lease_seconds=settings.rate_limit_lease_seconds,
+    local_share=settings.rate_limit_local_share,
+    retry_seconds=settings.rate_limit_retry_seconds,
+    enabled=settings.rate_limit_enabled,
+)
+
+rate_limit_leases_total = registry.register(Counter(
+    "rate_limit_leases_total", "Token leases requested from Redis."))
+registry.register(CallbackMetric(
+    "rate_limit_degraded",
+    "1 while the rate limiter runs without Redis.", "gauge",
+    lambda: int(rate_limiter.degraded)))
+
+# Route, plan and user specific limits, e.g.
+# {"contacts:list": "100/minute", "contacts:list:plan:pro": "1000/minute",
+#  "contacts:list:user:42": "5/minute"}
+RULES = {name: Limit.parse(value)
+         for name, value in settings.rate_limit_rules.items()}
+
+
+def resolve_limit(name: str, default: Limit, user: User) -> Limit:
+    """
+    Picks the limit of a route for a user: the user's own, their plan's,
+    the route's or the default.
+
+    :param name: The name of the limited route.
+    :type name: str
+    :param default: The limit when no rule applies.
+    :type default: Limit
+    :param user: The user.
+    :type user: User
+    :return: The limit.
+    :rtype: Limit
+    """
+    for rule in (f"{name}:user:{user.id}",
+                 f"{name}:plan:{getattr(user, 'plan', None)}", name):
+        if rule in RULES:
+            return RULES[rule]
+    return default
+
+
+class RateLimit:
+    """
+    A dependency that limits the requests of every user to a route.
+
+    :param name: The name of the limit in ``rate_limit_rules``.
+    :type name: str
+    :param default: The limit when no rule applies, e.g. ``"10/minute"``.
+    :type default: str
+    """
+
+    def __init__(self, name: str, default: str):
+        self.name = name
+        self.default = Limit.parse(default)
+
+    async def __call__(
+            self,
+            request: Request,
+            current_user: User = Depends(auth_service.get_current_user)):
+        limit = resolve_limit(self.name, self.default, current_user)
+        wait = await rate_limiter.hit(
+            f"{self.name}:user:{current_user.id}", limit)
+        if wait:
+            rate_limit_rejections_total.inc(request.scope["route"].path)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too Many Requests",
+                headers={"Retry-After": str(math.ceil(wait))})
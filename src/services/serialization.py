@@ -0,0 +1,102 @@
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Sequence
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+from src.services.content_negotiation import (
+    MSGPACK_MEDIA_TYPE, msgpack, wants_msgpack
+)
+from src.services.tracing import traced
+
+
+# The fields of ContactResponse, in the order the columns are selected.
+CONTACT_FIELDS = (
+    "id", "first_name", "last_name", "email", "phone", "birth_date",
+    "additional_data", "created_at",
+)
+
+
+class ContactRow(TypedDict, total=False):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    phone: str
+    birth_date: date
+    additional_data: Optional[str]
+    created_at: datetime
+
+
+# Built once: the serializers are compiled by pydantic-core on creation.
+contact_rows_adapter = TypeAdapter(List[ContactRow])
+contact_row_adapter = TypeAdapter(ContactRow)
+
+
+def contact_rows_json(
+        rows: Iterable[Sequence],
+        fields: Sequence[str] = CONTACT_FIELDS) -> bytes:
+    """
+    Serializes contact rows selected from the database straight to JSON,
+      without building and validating response models.
+
+    :param rows: The selected rows, with columns in the order of ``fields``.
+    :type rows: Iterable[Sequence]
+    :param fields: The names of the selected columns.
+    :type fields: Sequence[str]
+    :return: The JSON array of contacts.
+    :rtype: bytes
+    """
+    return contact_rows_adapter.dump_json(
+        [dict(zip(fields, row)) for row in rows]
+        )
+
+
+@traced(name="serialize")
+def contact_rows_response(
+        rows: Iterable[Sequence],
+        fields: Sequence[str] = CONTACT_FIELDS,
+        headers: dict | None = None) -> Response:
+    """
+    Builds a JSON response from contact rows, or a MessagePack one if the
+      client asked for it.
+
+    :param rows: The selected rows, with columns in the order of ``fields``.
+    :type rows: Iterable[Sequence]
+    :param fields: The names of the selected columns.
+    :type fields: Sequence[str]
+    :param headers: Extra response headers.
+    :type headers: dict | None
+    :return: The response.
+    :rtype: Response
+    """
+    if wants_msgpack.get():
+        content = msgpack.packb(contact_rows_adapter.dump_python(
+            [dict(zip(fields, row)) for row in rows], mode="json"))
+        return Response(
+            content, media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+    return Response(
+        contact_rows_json(rows, fields),
+        media_type="application/json",
+        headers=headers
+        )
+
+
+def contact_rows_ndjson(
+        rows: Iterable[Sequence],
+        fields: Sequence[str] = CONTACT_FIELDS) -> bytes:
+    """
+    Serializes contact rows to newline-delimited JSON, one contact per line.
+
+    :param rows: The selected rows, with columns in the order of ``fields``.
+    :type rows: Iterable[Sequence]
+    :param fields: The names of the selected columns.
+    :type fields: Sequence[str]
+    :return: The JSON lines, each terminated by a newline.
+    :rtype: bytes
+    """
+    return b"".join(
+        contact_row_adapter.dump_json(dict(zip(fields, row))) + b"\n"
+        for row in rows
+        )
@@ -0,0 +1,128 @@
+import asyncio
+import socket
+from email.message import EmailMessage
+from typing import List, Optional
+
+import aiosmtplib
+
+
+# Errors after which a connection cannot be reused.
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    OSError,
+)
+
+
+class SMTPPool:
+    """
+    A pool of long-lived, authenticated SMTP connections.
+
+    Connections are opened on demand up to ``size``, kept open between
+    messages and reused, so a burst of messages costs one TLS handshake
+    and login per pooled connection instead of one per message. A
+    connection is recycled after ``max_messages`` messages or when it has
+    been idle longer than ``idle_timeout`` seconds, since relays drop
+    idle sessions. A message that fails because its connection broke is
+    retried once on a fresh connection.
+    """
+
+    def __init__(
+            self,
+            hostname: str,
+            port: int,
+            username: Optional[str] = None,
+            password: Optional[str] = None,
+            use_tls: bool = False,
+            start_tls: Optional[bool] = False,
+            validate_certs: bool = True,
+            size: int = 4,
+            max_messages: int = 100,
+            idle_timeout: float = 60,
+            timeout: float = 30):
+        self.options = dict(
+            hostname=hostname, port=port, username=username,
+            password=password, use_tls=use_tls, start_tls=start_tls,
+            validate_certs=validate_certs, timeout=timeout)
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.local_hostname: Optional[str] = None
+        self.idle: List[tuple] = []
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.connections_opened = 0
+
+    async def start(self) -> None:
+        """
+        Prepares the pool; connections are opened by the first messages.
+        """
+        self.slots = asyncio.Semaphore(self.size)
+        if self.local_hostname is None:
+            # getfqdn can block on DNS, so it is resolved once, off-loop.
+            self.local_hostname = await asyncio.get_running_loop(
+                ).run_in_executor(None, socket.getfqdn)
+
+    async def close(self) -> None:
+        """
+        Closes the idle connections.
+        """
+        idle, self.idle = self.idle, []
+        await asyncio.gather(*(self._quit(smtp) for smtp, _, _ in idle))
+
+    async def send(self, message: EmailMessage) -> None:
+        """
+        Sends a message over a pooled connection.
+
+        :param message: The message, with its sender and recipients set.
+        :type message: EmailMessage
+        :raises aiosmtplib.SMTPException: If the server rejects the
+          message or it cannot be delivered after a reconnect.
+        """
+        if self.slots is None:
+            await self.start()
+        async with self.slots:
+            for attempt in range(2):
+                smtp, sent = await self._acquire()
+                try:
+                    await smtp.send_message(message)
+                except CONNECTION_ERRORS:
+                    await self._quit(smtp)
+                    if attempt:
+                        raise
+                    continue
+                except aiosmtplib.SMTPException:
+                    # The message was refused, the session is still good.
+                    await self._release(smtp, sent)
+                    raise
+                await self._release(smtp, sent + 1)
+                return
+
+    async def _acquire(self) -> tuple:
+        loop = asyncio.get_running_loop()
+        while self.idle:
+            smtp, sent, idle_since = self.idle.pop()
+            if smtp.is_connected and \
+                    loop.time() - idle_since < self.idle_timeout:
+                return smtp, sent
+            await self._quit(smtp)
+        smtp = aiosmtplib.SMTP(local_hostname=self.local_hostname,
+                               **self.options)
+        await smtp.connect()
+        self.connections_opened += 1
+        return smtp, 0
+
+    async def _release(self, smtp: aiosmtplib.SMTP, sent: int) -> None:
+        if sent >= self.max_messages or not smtp.is_connected:
+            await self._quit(smtp)
+            return
+        self.idle.append((smtp, sent, asyncio.get_running_loop().time()))
+
+    async def _quit(self, smtp: aiosmtplib.SMTP) -> None:
+        if not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except CONNECTION_ERRORS + (aiosmtplib.SMTPException,):
+            smtp.close()
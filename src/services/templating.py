@@ -0,0 +1,64 @@
+from pathlib import Path
+from typing import Optional, Union
+
+from jinja2 import (Environment, FileSystemBytecodeCache, FileSystemLoader,
+                    Template, select_autoescape)
+
+
+class TemplateRenderer:
+    """
+    Renders the Jinja templates of a set of directories.
+
+    The templates are compiled once, by :meth:`load` at startup or on
+    first use, and kept in the environment's cache for the life of the
+    process; templates are not reloaded when their files change. The
+    compiled bytecode is cached on disk, so a restarted process or
+    another worker skips the Jinja compiler as well.
+    """
+
+    def __init__(self, *directories: Union[str, Path],
+                 cache_dir: Optional[str] = None,
+                 bytecode_cache: bool = True):
+        self.environment = Environment(
+            loader=FileSystemLoader(directories),
+            autoescape=select_autoescape(["html"]),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir)
+            if bytecode_cache else None,
+            auto_reload=False,
+            cache_size=-1,
+        )
+
+    def load(self) -> int:
+        """
+        Compiles every template of the directories.
+
+        :return: The number of templates.
+        :rtype: int
+        """
+        names = self.environment.list_templates()
+        for name in names:
+            self.get(name)
+        return len(names)
+
+    def get(self, name: str) -> Template:
+        """
+        Returns a compiled template, compiling it on first use.
+
+        :param name: The template name.
+        :type name: str
+        :return: The template.
+        :rtype: Template
+        """
+        return self.environment.get_template(name)
+
+    def render(self, name: str, /, **context) -> str:
+        """
+        Renders a template.
+
+        :param name: The template name.
+        :type name: str
+        :param context: The template variables.
+        :return: The rendered text.
+        :rtype: str
+        """
+        return self.get(name).render(**context)
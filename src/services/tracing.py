@@ -0,0 +1,240 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger("src.services.tracing")
+
+
+class Span:
+    """
+    A timed operation within a trace.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start",
+                 "duration", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# The innermost open span, or UNSAMPLED inside a trace that is not
+# recorded, so that its children are skipped without a new decision.
+UNSAMPLED = object()
+current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """
+    Receives finished spans. Subclass it to send spans to a collector.
+    """
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """
+    Appends spans to a local file, one JSON object per line.
+
+    :meth:`export` only queues the span: a background thread serializes
+    the spans and writes them, up to ``batch_size`` at a time, so that
+    the event loop never waits for the file. Spans beyond ``max_queue``
+    waiting ones are dropped and counted in ``dropped``.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100,
+                 max_queue: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.queue: queue.Queue = queue.Queue(max_queue)
+        self.thread = threading.Thread(
+            target=self._run, name="span-writer", daemon=True)
+        self.thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """
+        Waits until the queued spans are written.
+        """
+        self.queue.join()
+
+    def _run(self) -> None:
+        while True:
+            spans = [self.queue.get()]
+            while len(spans) < self.batch_size:
+                try:
+                    spans.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(spans)
+            except Exception:
+                logger.exception("Cannot write %d spans to %s",
+                                 len(spans), self.path)
+            finally:
+                for _ in spans:
+                    self.queue.task_done()
+
+    def _write(self, spans: List[Span]) -> None:
+        lines = [json.dumps(span.to_dict(), default=str) for span in spans]
+        with open(self.path, "a") as file:
+            file.write("\n".join(lines) + "\n")
+
+
+class Tracer:
+    """
+    Creates spans and hands the finished ones to an exporter.
+
+    A new trace is recorded with probability ``sample_rate``; spans
+    opened inside it follow the decision of the trace. Until
+    :meth:`configure` is called no span is recorded at all.
+    """
+
+    def __init__(self):
+        self.exporter: Optional[SpanExporter] = None
+        self.sample_rate = 0.0
+
+    def configure(self, exporter: Optional[SpanExporter],
+                  sample_rate: float = 1.0) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None,
+             parent_id: Optional[str] = None,
+             sampled: Optional[bool] = None,
+             **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Records the ``with`` block as a span of the current trace, or
+        starts a new trace if there is none.
+
+        :param name: The span name.
+        :type name: str
+        :param trace_id: Continue this remote trace instead of starting
+          a new one (root spans only).
+        :type trace_id: str | None
+        :param parent_id: The remote parent span (root spans only).
+        :type parent_id: str | None
+        :param sampled: The remote sampling decision (root spans only).
+        :type sampled: bool | None
+        :return: The span, or None when it is not recorded.
+        :rtype: Span | None
+        """
+        parent = current_span.get()
+        if self.exporter is None or parent is UNSAMPLED:
+            yield None
+            return
+        if parent is None:
+            if sampled is None:
+                sampled = random.random() < self.sample_rate
+            if not sampled:
+                token = current_span.set(UNSAMPLED)
+                try:
+                    yield None
+                finally:
+                    current_span.reset(token)
+                return
+            span = Span(name, trace_id or os.urandom(16).hex(), parent_id,
+                        attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+        token = current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = type(exc).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            current_span.reset(token)
+            self.exporter.export(span)
+
+
+tracer = Tracer()
+
+
+def traced(func=None, *, name: Optional[str] = None):
+    """
+    Decorates a function or coroutine function to run in a span named
+    after it, e.g. ``src.repository.users.get_user_by_email``.
+    """
+    if func is None:
+        return functools.partial(traced, name=name)
+    span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.span(span_name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def parse_traceparent(header: str) -> Optional[tuple]:
+    """
+    Parses a W3C ``traceparent`` header.
+
+    :param header: The header value.
+    :type header: str
+    :return: ``(trace_id, parent_id, sampled)`` or None if malformed.
+    :rtype: tuple | None
+    """
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
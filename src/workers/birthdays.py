@@ -0,0 +1,181 @@
+"""
+Queues the birthday emails of a day in the outbox.
+
+* ``greeting``: a greeting to every contact whose birthday is today, on
+  behalf of its user;
+* ``reminder``: a reminder to the user of every contact whose birthday is
+  ``--remind-days`` from today.
+
+The contacts are read from the birthday index in chunks, and every chunk
+is queued in one transaction together with a checkpoint of the shard. A
+run that crashed resumes after its last committed chunk, and a finished
+run does nothing when started again. The outbox ``dedupe_key`` keeps
+every email of the day unique even if the checkpoints are lost.
+
+Run it once a day, e.g. from cron::
+
+    python -m src.workers.birthdays
+
+The work can be split by user into shards, either in worker processes::
+
+    python -m src.workers.birthdays --shards 4 --workers 4
+
+or across machines, one shard each::
+
+    python -m src.workers.birthdays --shards 4 --shard 0
+
+A shard must not be processed by two workers at the same time.
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from src.repository import checkpoints as repository_checkpoints
+from src.repository import contacts as repository_contacts
+from src.repository import outbox as repository_outbox
+
+
+KINDS = ("greeting", "reminder")
+
+
+def birthday_email(kind: str, row, run_date: date, birthday: date) -> dict:
+    """
+    Builds the outbox entry of one contact.
+
+    :param kind: ``greeting`` or ``reminder``.
+    :type kind: str
+    :param row: A row of ``get_birthday_chunk``.
+    :param run_date: The day of the run.
+    :type run_date: date
+    :param birthday: The day of the birthday.
+    :type birthday: date
+    :return: The ``enqueue_emails`` entry.
+    :rtype: dict
+    """
+    dedupe_key = f"birthday_{kind}:{run_date.isoformat()}:{row.id}"
+    if kind == "greeting":
+        return {"kind": "birthday_greeting", "recipient": row.email,
+                "payload": {"first_name": row.first_name},
+                "dedupe_key": dedupe_key}
+    return {"kind": "birthday_reminder", "recipient": row.user_email,
+            "payload": {"contact_name": f"{row.first_name} {row.last_name}",
+                        "date": birthday.isoformat(),
+                        "days": (birthday - run_date).days},
+            "dedupe_key": dedupe_key}
+
+
+async def dispatch_shard(
+        kind: str,
+        run_date: date,
+        shard: int,
+        shards: int,
+        db: Session,
+        chunk_size: int = 1000,
+        remind_days: int = 1) -> int:
+    """
+    Queues the birthday emails of one shard, resuming from its
+    checkpoint.
+
+    :param kind: ``greeting`` or ``reminder``.
+    :type kind: str
+    :param run_date: The day of the run.
+    :type run_date: date
+    :param shard: The shard, from 0 to ``shards - 1``.
+    :type shard: int
+    :param shards: The number of shards.
+    :type shards: int
+    :param db: The database session.
+    :type db: Session
+    :param chunk_size: The number of contacts per chunk and transaction.
+    :type chunk_size: int
+    :param remind_days: How many days ahead reminders are sent.
+    :type remind_days: int
+    :return: The number of emails queued by this call.
+    :rtype: int
+    """
+    birthday = run_date + timedelta(
+        days=remind_days if kind == "reminder" else 0)
+    checkpoint = await repository_checkpoints.get_checkpoint(
+        f"birthday_{kind}", run_date, shard, shards, db)
+    queued = 0
+    while checkpoint.finished_at is None:
+        rows = await repository_contacts.get_birthday_chunk(
+            birthday, shard, shards,
+            (checkpoint.last_user_id, checkpoint.last_id), chunk_size, db)
+        if rows:
+            queued += await repository_outbox.enqueue_emails(
+                [birthday_email(kind, row, run_date, birthday)
+                 for row in rows],
+                db, commit=False)
+            checkpoint.last_user_id = rows[-1].user_id
+            checkpoint.last_id = rows[-1].id
+            checkpoint.processed += len(rows)
+        if len(rows) < chunk_size:
+            checkpoint.finished_at = datetime.now()
+        db.commit()
+    return queued
+
+
+def run_shard(kinds: list, run_date: date, shard: int, shards: int,
+              chunk_size: int, remind_days: int) -> int:
+    """
+    Processes one shard for every kind, with its own session (a worker
+    process).
+
+    :return: The number of queued emails.
+    :rtype: int
+    """
+    from src.database.db import SessionLocal, engine
+
+    # Connections inherited from the parent process must not be reused.
+    engine.dispose(close=False)
+    db = SessionLocal()
+    try:
+        return sum(asyncio.run(dispatch_shard(
+            kind, run_date, shard, shards, db, chunk_size, remind_days))
+            for kind in kinds)
+    finally:
+        db.close()
+
+
+def main(args) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+
+    shards = [args.shard] if args.shard is not None else range(args.shards)
+    jobs = [(args.kinds, args.date, shard, args.shards, args.chunk_size,
+             args.remind_days) for shard in shards]
+    if args.workers == 1:
+        queued = sum(run_shard(*job) for job in jobs)
+    else:
+        with ProcessPoolExecutor(args.workers) as executor:
+            queued = sum(executor.map(run_shard, *zip(*jobs)))
+    print(f"Queued {queued} birthday emails for {args.date}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Queue the birthday emails of a day.")
+    parser.add_argument(
+        "--date", type=date.fromisoformat, default=date.today(),
+        help="The day to run for, YYYY-MM-DD; defaults to today")
+    parser.add_argument(
+        "--kinds", nargs="+", choices=KINDS, default=list(KINDS),
+        help="The emails to queue")
+    parser.add_argument(
+        "--remind-days", type=int, default=1,
+        help="How many days ahead users are reminded of birthdays")
+    parser.add_argument(
+        "--chunk-size", type=int, default=1000,
+        help="Contacts read and queued per transaction")
+    parser.add_argument(
+        "--shards", type=int, default=1,
+        help="The number of shards the users are split into")
+    parser.add_argument(
+        "--shard", type=int, default=None,
+        help="Process only this shard; all shards if omitted")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes for the shards")
+    main(parser.parse_args())
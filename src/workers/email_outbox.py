@@ -0,0 +1,138 @@
+"""
+Sends the emails queued in the outbox table.
+
+Several workers can run side by side: every batch is claimed with
+``SELECT ... FOR UPDATE SKIP LOCKED``. Failed emails are retried with
+exponential backoff and marked as failed after ``--max-attempts``.
+
+Run it next to the API::
+
+    python -m src.workers.email_outbox
+
+or drain the outbox once, e.g. from cron::
+
+    python -m src.workers.email_outbox --once
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from src.database.db import SessionLocal
+from src.database.models import EmailOutbox
+from src.repository import outbox as repository_outbox
+from src.services.email import send_outbox_email, smtp_pool, templates
+
+
+# Sends still running after this share of the lease are given up, so that
+# the outcomes of a batch are committed before its claim expires and
+# another worker sends the emails again.
+LEASE_SHARE = 0.8
+
+
+async def send_one(email: EmailOutbox,
+                   timeout: Optional[float] = None) -> Optional[str]:
+    """
+    Sends an outbox email.
+
+    :param email: The outbox entry.
+    :type email: EmailOutbox
+    :param timeout: Seconds after which the send is given up.
+    :type timeout: Optional[float]
+    :return: None if it was sent, otherwise the error.
+    :rtype: Optional[str]
+    """
+    try:
+        await asyncio.wait_for(send_outbox_email(
+            email.kind, email.recipient, email.payload), timeout)
+    except asyncio.TimeoutError:
+        return f"Not sent within {timeout:g} seconds"
+    except Exception as err:
+        return f"{type(err).__name__}: {err}"
+    return None
+
+
+async def process_batch(
+        db: Session,
+        batch_size: int = 100,
+        max_attempts: int = 5,
+        backoff: timedelta = timedelta(seconds=30),
+        lease: timedelta = timedelta(minutes=5)) -> int:
+    """
+    Claims and sends one batch of due emails.
+
+    The emails of a batch are sent concurrently; the SMTP pool bounds
+    the number of connections. Their outcomes are then recorded in one
+    transaction. Sends that have not finished within ``LEASE_SHARE`` of
+    the lease count as failed, so the transaction commits while the
+    claim still holds, however slow the relay is.
+
+    :param db: The database session.
+    :type db: Session
+    :param batch_size: The maximum number of emails to claim.
+    :type batch_size: int
+    :param max_attempts: Attempts before an email is marked as failed.
+    :type max_attempts: int
+    :param backoff: The delay before the first retry.
+    :type backoff: timedelta
+    :param lease: How long a claim lasts if the worker dies.
+    :type lease: timedelta
+    :return: The number of claimed emails.
+    :rtype: int
+    """
+    emails = await repository_outbox.claim_emails(batch_size, lease, db)
+    timeout = lease.total_seconds() * LEASE_SHARE
+    errors = await asyncio.gather(
+        *(send_one(email, timeout) for email in emails))
+    for email, error in zip(emails, errors):
+        if error is None:
+            await repository_outbox.mark_sent(email, db, commit=False)
+        else:
+            await repository_outbox.mark_failed(
+                email, error, max_attempts, backoff, db, commit=False)
+    if emails:
+        db.commit()
+    return len(emails)
+
+
+async def main(args) -> None:
+    templates.load()
+    await smtp_pool.start()
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                claimed = await process_batch(
+                    db, args.batch_size, args.max_attempts,
+                    timedelta(seconds=args.backoff))
+            finally:
+                db.close()
+            if claimed < args.batch_size:
+                if args.once:
+                    return
+                await asyncio.sleep(args.poll_interval)
+    finally:
+        await smtp_pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Send the emails queued in the outbox.")
+    parser.add_argument(
+        "--batch-size", type=int, default=100,
+        help="Emails claimed per batch")
+    parser.add_argument(
+        "--poll-interval", type=float, default=1.0,
+        help="Seconds to wait when the outbox is drained")
+    parser.add_argument(
+        "--max-attempts", type=int, default=5,
+        help="Attempts before an email is marked as failed")
+    parser.add_argument(
+        "--backoff", type=float, default=30,
+        help="Seconds before the first retry; doubles on every attempt")
+    parser.add_argument(
+        "--once", action="store_true",
+        help="Exit when no email is due instead of polling")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+"""
+Reconciles the per-user contact counters with the contacts table.
+
+Run once, e.g. from cron::
+
+    python -m src.workers.reconcile_counts
+
+or keep it running and reconcile every hour::
+
+    python -m src.workers.reconcile_counts --interval 3600
+"""
+import argparse
+import asyncio
+
+from src.database.db import SessionLocal
+from src.repository.users import reconcile_contact_counts
+
+
+async def reconcile_once() -> int:
+    """
+    Runs a single reconciliation pass.
+
+    :return: The number of corrected users.
+    :rtype: int
+    """
+    db = SessionLocal()
+    try:
+        return await reconcile_contact_counts(db)
+    finally:
+        db.close()
+
+
+async def main(interval: float | None) -> None:
+    while True:
+        corrected = await reconcile_once()
+        print(f"Reconciled contact counters of {corrected} users")
+        if not interval:
+            return
+        await asyncio.sleep(interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Reconcile the per-user contact counters.")
+    parser.add_argument(
+        "--interval", type=float, default=None,
+        help="Seconds between passes; run once if omitted")
+    args = parser.parse_args()
+    asyncio.run(main(args.interval))
@@ -5,7 +5,8 @@ from sqlalchemy.orm import sessionmaker
 
 from main import app
 from src.database.models import Base
-from src.database.db import get_db
+from src.database.db import get_db, get_session_factory
+from src.services.rate_limiter import rate_limiter
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -41,10 +42,19 @@ def client(session):
             session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = \
+        lambda: TestingSessionLocal
 
     yield TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    # Every test starts with full buckets, as they all share one client.
+    rate_limiter.leases.clear()
+    rate_limiter.local.clear()
+
+
 @pytest.fixture(scope="module")
 def user():
     return {"username": "deadpool", "email": "deadpool@example.com", "password": "123456789"}
@@ -0,0 +1,112 @@
+"""
+A minimal local SMTP server that accepts and keeps every message.
+
+It speaks just enough ESMTP for ``aiosmtplib`` (EHLO, AUTH PLAIN/LOGIN,
+MAIL, RCPT, DATA, RSET, NOOP, QUIT) and can delay the greeting and the
+login to stand in for the TLS handshake and authentication of a real
+relay. Used by the SMTP tests and by ``benchmarks.bench_smtp``.
+
+Run it on its own to point a development server at it::
+
+    python -m tests.smtp_sink --port 1025
+"""
+import argparse
+import asyncio
+from typing import List, Optional, Set
+
+
+class SMTPSink:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 connect_delay: float = 0.0, auth_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.connect_delay = connect_delay
+        self.auth_delay = auth_delay
+        self.messages: List[bytes] = []
+        self.connections = 0
+        self.logins = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(
+            self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.drop_connections()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop_connections(self) -> None:
+        """
+        Closes every open session, as a relay restart would.
+        """
+        for writer in list(self.writers):
+            writer.close()
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self.writers.add(writer)
+
+        async def reply(line: str) -> None:
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        try:
+            await asyncio.sleep(self.connect_delay)
+            await reply("220 sink ESMTP")
+            while line := await reader.readline():
+                command = line.decode().strip()
+                verb = command[:4].upper()
+                if verb == "EHLO":
+                    await reply("250-sink\r\n250-AUTH PLAIN LOGIN\r\n"
+                                "250 8BITMIME")
+                elif verb == "HELO":
+                    await reply("250 sink")
+                elif verb == "AUTH":
+                    if command.upper().startswith("AUTH LOGIN"):
+                        await reply("334 VXNlcm5hbWU6")
+                        await reader.readline()
+                        await reply("334 UGFzc3dvcmQ6")
+                        await reader.readline()
+                    await asyncio.sleep(self.auth_delay)
+                    self.logins += 1
+                    await reply("235 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while (chunk := await reader.readline()) not in (
+                            b".\r\n", b""):
+                        data.append(chunk)
+                    self.messages.append(b"".join(data))
+                    await reply("250 Queued")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+async def serve(port: int) -> None:
+    sink = SMTPSink(port=port)
+    await sink.start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    while True:
+        await asyncio.sleep(10)
+        print(f"{len(sink.messages)} messages received")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink.")
+    parser.add_argument("--port", type=int, default=1025)
+    asyncio.run(serve(parser.parse_args().port))
@@ -1,11 +1,7 @@
-from unittest.mock import MagicMock
+from src.database.models import EmailOutbox, User
 
-from src.database.models import User
 
-
-def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def test_create_user(client, session, user):
     response = client.post(
         "/api/auth/signup",
         json=user,
@@ -14,6 +10,11 @@ def test_create_user(client, user, monkeypatch):
     data = response.json()
     assert data["user"]["email"] == user.get("email")
     assert "id" in data["user"]
+    email = session.query(EmailOutbox).filter(
+        EmailOutbox.recipient == user.get("email")).one()
+    assert email.kind == "confirm_email"
+    assert email.status == "pending"
+    assert email.payload == {"host": "http://testserver/"}
 
 
 def test_repeat_create_user(client, user):
@@ -26,6 +27,11 @@ def test_repeat_create_user(client, user):
     assert data["detail"] == "Account already exists"
 
 
+def test_create_user_without_body(client):
+    response = client.post("/api/auth/signup")
+    assert response.status_code == 422, response.text
+
+
 def test_login_user_not_confirmed(client, user):
     response = client.post(
         "/api/auth/login",
@@ -68,3 +74,19 @@ def test_login_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == "Invalid email"
+
+
+def test_request_email(client, session, user):
+    response = client.post(
+        "/api/auth/request_email",
+        json={"email": user.get("email")},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == "Your email is already confirmed"
+    response = client.post(
+        "/api/auth/request_email",
+        json={"email": "nobody@example.com"},
+    )
+    assert response.status_code == 200, response.text
+    assert session.query(EmailOutbox).filter(
+        EmailOutbox.recipient == "nobody@example.com").count() == 0
@@ -1,3 +1,4 @@
+import json
 from unittest.mock import MagicMock, patch
 from datetime import datetime
 from sqlalchemy.orm import Session, sessionmaker
@@ -6,10 +7,10 @@ import pytest
 from fastapi.testclient import TestClient
 from main import app
 
+from src.conf.config import settings
 from src.database.models import User, Contact
 from src.services.auth import auth_service
 from src.database.db import get_db, SessionLocal
-from fastapi_limiter import FastAPILimiter
 import redis.asyncio as redis
 
 
@@ -43,9 +44,7 @@ import redis.asyncio as redis
 
 
 @pytest.fixture()
-def token(client, user, session, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+def token(client, user, session):
     client.post("/api/auth/signup", json=user)
     current_user: User = session.query(User).filter(
         User.email == user.get('email')).first()
@@ -107,6 +106,77 @@ def test_get_contact_not_found(client, token):
         assert data["detail"] == "Contact not found"
 
 
+def test_suggest_contacts(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.get(
+            "/api/contacts/suggest",
+            params={"prefix": "test_f"},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert [c["first_name"] for c in data] == ["test_first_name"]
+
+        response = client.get(
+            "/api/contacts/suggest",
+            params={"prefix": "test%"},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        assert response.json() == []
+
+
+def test_get_contact_email_ignores_case(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.get(
+            "/api/contacts/email/Test_Email@Example.COM",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["email"] == "test_email@example.com"
+
+
+def test_get_contact_name_ignores_case(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.get(
+            "/api/contacts/name/TEST_FIRST_NAME",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data[0]["first_name"] == "test_first_name"
+
+
+def test_get_contacts_by_phone(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.get(
+            "/api/contacts/phone/+111 111 111",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data[0]["phone"] == "+111111111"
+
+
+def test_lookup_contacts_by_phones(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.post(
+            "/api/contacts/phone/lookup",
+            json={"numbers": ["00111111111", "+380501234567"]},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["+111111111"][0]["first_name"] == "test_first_name"
+        assert data["+380501234567"] == []
+
+
 def test_get_contacts(client, token):
     with patch.object(auth_service, 'r') as r_mock:
         r_mock.get.return_value = None
@@ -122,6 +192,53 @@ def test_get_contacts(client, token):
             assert "id" in data[0]
 
 
+def test_get_contacts_fast_json(client, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        expected = client.get("/api/contacts", headers=headers)
+        with patch.object(settings, "fast_json_responses", True):
+            response = client.get("/api/contacts", headers=headers)
+            suggestions = client.get(
+                "/api/contacts/suggest",
+                params={"prefix": "test_f"},
+                headers=headers
+            )
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["X-Total-Count"] == \
+            expected.headers["X-Total-Count"]
+        assert response.json() == expected.json()
+        assert response.json()[0]["first_name"] == "test_first_name"
+        assert suggestions.status_code == 200, suggestions.text
+        assert [c["first_name"] for c in suggestions.json()] == \
+            ["test_first_name"]
+
+
+def test_get_contact_with_legacy_phone(client, session, user, token):
+    owner = session.query(User).filter(
+        User.email == user.get('email')).first()
+    contact = Contact(
+        first_name="legacy", last_name="legacy",
+        email="legacy@example.com", phone="+123",
+        birth_date=datetime(1990, 1, 1).date(),
+        created_at=datetime(2024, 1, 1), user_id=owner.id)
+    session.add(contact)
+    session.commit()
+    try:
+        with patch.object(auth_service, 'r') as r_mock:
+            r_mock.get.return_value = None
+            response = client.get(
+                f"/api/contacts/{contact.id}",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+        assert response.status_code == 200, response.text
+        assert response.json()["phone"] == "+123"
+    finally:
+        session.delete(contact)
+        session.commit()
+
+
 def test_update_contact(client, token):
     with patch.object(auth_service, 'r') as r_mock:
         r_mock.get.return_value = None
@@ -140,7 +257,7 @@ def test_update_contact(client, token):
         )
         assert response.status_code == 200, response.text
         data = response.json()
-        assert data["phone"] == 222222222
+        assert data["phone"] == "+222222222"
         assert "id" in data
 
 
@@ -188,3 +305,110 @@ def test_repeat_delete_contact(client, token):
         assert response.status_code == 404, response.text
         data = response.json()
         assert data["detail"] == "Contact not found"
+
+
+def test_merge_duplicate_contacts(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        ids = []
+        for first_name, email, notes in [
+                ("Jon", "Jon.Smith@example.com", "met at work"),
+                ("John", "jon.smith@example.com", "likes tea")]:
+            response = client.post(
+                "/api/contacts",
+                json={
+                    "first_name": first_name,
+                    "last_name": "Smith",
+                    "email": email,
+                    "phone": "+380501234567",
+                    "birth_date": "1990-01-01",
+                    "additional_data": notes,
+                    "created_at": "2024-07-13"
+                },
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            ids.append(response.json()["id"])
+
+        response = client.get(
+            "/api/contacts/duplicates",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert [c["id"] for c in data[0]["contacts"]] == sorted(ids)
+        assert data[0]["reasons"] == ["email", "name", "phone"]
+
+        response = client.post(
+            "/api/contacts/merge",
+            json={"groups": [
+                {"primary_id": ids[0], "duplicate_ids": [ids[1]]}
+            ]},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data[0]["additional_data"] == "met at work\nlikes tea"
+        response = client.get(
+            f"/api/contacts/{ids[1]}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 404, response.text
+
+
+def test_import_contacts_msgpack(client, token):
+    msgpack = pytest.importorskip("msgpack")
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.post(
+            "/api/contacts/import",
+            content=msgpack.packb({"contacts": [{
+                "first_name": "packed_first_name",
+                "last_name": "packed_last_name",
+                "email": "packed@example.com",
+                "phone": "+380501112233",
+                "birth_date": "1980-02-02",
+                "created_at": "2024-07-13T00:00:00"
+            }]}),
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/msgpack",
+                "Accept": "application/msgpack"
+            }
+        )
+        assert response.status_code == 201, response.text
+        assert response.headers["content-type"] == "application/msgpack"
+        data = msgpack.unpackb(response.content)
+        assert data[0]["first_name"] == "packed_first_name"
+        assert "id" in data[0]
+
+
+def test_export_contacts(client, session, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.get(
+            "/api/contacts/export",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert "packed_first_name" in [line["first_name"] for line in lines]
+        # The export session, from the overridden factory, is closed
+        # once the body is sent, and the request's session is not
+        # reopened.
+        assert session.get_bind().pool.checkedout() == 0
+
+
+def test_metrics(client, token):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        client.get(
+            "/api/contacts/1",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    response = client.get("/metrics")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/contacts/{contact_id}"' in response.text
+    assert 'redis_command_duration_seconds_count{command="get"}' \
+        in response.text
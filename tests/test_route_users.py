@@ -0,0 +1,98 @@
+import io
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from main import app
+from src.database.models import User
+from src.services.auth import auth_service
+from src.conf.config import settings
+from src.services import avatars as avatar_service
+from src.services.avatars import LocalStorage, get_avatar_storage
+
+
+@pytest.fixture()
+def token(client, user, session):
+    client.post("/api/auth/signup", json=user)
+    current_user: User = session.query(User).filter(
+        User.email == user.get('email')).first()
+    current_user.confirmed = True
+    session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": user.get('password')},
+    )
+    return response.json()["access_token"]
+
+
+@pytest.fixture()
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path), "/avatars")
+    app.dependency_overrides[get_avatar_storage] = lambda: storage
+    yield storage
+    del app.dependency_overrides[get_avatar_storage]
+
+
+def make_image(size, format="PNG") -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format)
+    return output.getvalue()
+
+
+def test_update_avatar(client, token, storage, tmp_path):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.patch(
+            "/api/users/avatar",
+            files={"file": ("me.png", make_image((800, 600)), "image/png")},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200, response.text
+        avatar = response.json()["avatar"]
+        assert avatar.startswith("/avatars/")
+        name = avatar.split("/")[-1].split("?")[0]
+        with Image.open(tmp_path / name) as image:
+            assert image.size == (250, 250)
+
+
+def test_update_avatar_not_an_image(client, token, storage):
+    with patch.object(auth_service, 'r') as r_mock:
+        r_mock.get.return_value = None
+        response = client.patch(
+            "/api/users/avatar",
+            files={"file": ("me.png", b"not an image", "image/png")},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 422, response.text
+
+
+def test_update_avatar_unchanged(client, token, storage):
+    image = make_image((300, 300))
+    with patch.object(auth_service, 'r') as r_mock, \
+            patch.object(storage, "save", wraps=storage.save) as save:
+        r_mock.get.return_value = None
+        avatars = []
+        for _ in range(2):
+            response = client.patch(
+                "/api/users/avatar",
+                files={"file": ("me.png", image, "image/png")},
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            assert response.status_code == 200, response.text
+            avatars.append(response.json()["avatar"])
+        assert avatars[0] == avatars[1]
+        assert save.call_count == 1
+
+
+def test_update_avatar_too_large(client, token, storage):
+    with patch.object(auth_service, 'r') as r_mock, \
+            patch.object(settings, "avatar_max_bytes", 1000), \
+            patch.object(avatar_service, "MULTIPART_OVERHEAD", 1000):
+        r_mock.get.return_value = None
+        response = client.patch(
+            "/api/users/avatar",
+            files={"file": ("me.png", b"x" * 5000, "image/png")},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 413, response.text
@@ -0,0 +1,156 @@
+import asyncio
+import unittest
+from collections import Counter
+from email.message import EmailMessage
+from unittest.mock import patch
+
+import httpx
+
+from mail import main as mail_main
+from mail.delivery import DeliveryQueue
+from src.services.smtp_pool import SMTPPool
+from tests.smtp_sink import SMTPSink
+
+
+def make_message(recipient: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = "Hello"
+    message["From"] = "sender@example.com"
+    message["To"] = recipient
+    message.set_content("Hello")
+    return message
+
+
+class SlowPool:
+    """
+    Records how many messages are sent to each domain at the same time.
+    """
+
+    def __init__(self):
+        self.active = Counter()
+        self.peak = Counter()
+        self.sent = []
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send(self, message):
+        domain = message["To"].split("@")[1]
+        self.active[domain] += 1
+        self.peak[domain] = max(self.peak[domain], self.active[domain])
+        await asyncio.sleep(0.01)
+        self.active[domain] -= 1
+        if message["To"].startswith("bounce"):
+            raise ConnectionError("refused")
+        self.sent.append(message["To"])
+
+
+class TestDeliveryQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.pool = SlowPool()
+        self.delivery = DeliveryQueue(self.pool, queue_size=20, workers=8,
+                                      per_domain_limit=2)
+        await self.delivery.start()
+
+    async def asyncTearDown(self):
+        await self.delivery.stop(drain_timeout=1)
+
+    async def test_per_domain_limit(self):
+        messages = [make_message(f"user{i}@{domain}")
+                    for i in range(6) for domain in ("a.com", "b.com")]
+        self.assertTrue(self.delivery.submit(messages))
+        await self.delivery.join()
+        self.assertEqual(len(self.pool.sent), 12)
+        self.assertEqual(self.pool.peak, {"a.com": 2, "b.com": 2})
+
+    async def test_busy_domain_does_not_block_others(self):
+        self.assertTrue(self.delivery.submit(
+            [make_message(f"user{i}@a.com") for i in range(16)]
+            + [make_message("user@b.com")]))
+        await self.delivery.join()
+        self.assertEqual(self.pool.peak["a.com"], 2)
+        # Sent with the first messages, not after the other domain.
+        self.assertLess(self.pool.sent.index("user@b.com"), 4)
+        self.assertEqual(self.delivery.active, {})
+
+    async def test_batch_is_rejected_when_queue_is_full(self):
+        self.assertFalse(self.delivery.submit(
+            [make_message(f"user{i}@a.com") for i in range(21)]))
+        self.assertEqual(self.delivery.waiting, 0)
+        self.assertEqual(self.delivery.rejected.values, {(): 21})
+
+    async def test_failures_are_counted(self):
+        self.delivery.submit([make_message("bounce@a.com"),
+                              make_message("user@a.com")])
+        await self.delivery.join()
+        self.assertEqual(self.delivery.delivered.values,
+                         {("failed",): 1, ("sent",): 1})
+        self.assertIn("mail_messages_delivered_total",
+                      self.delivery.registry.render())
+
+
+class TestSendBatch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.sink = SMTPSink()
+        await self.sink.start()
+        pool = SMTPPool("127.0.0.1", self.sink.port, size=2)
+        pool.local_hostname = "localhost"
+        self.delivery = DeliveryQueue(pool, queue_size=10, workers=4)
+        await self.delivery.start()
+        self.patch = patch.object(mail_main, "delivery", self.delivery)
+        self.patch.start()
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=mail_main.app),
+            base_url="http://testserver")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        self.patch.stop()
+        await self.delivery.stop(drain_timeout=1)
+        await self.sink.stop()
+
+    async def test_send_batch(self):
+        response = await self.client.post("/send-batch", json={
+            "template": "example_email.html",
+            "subject": "Invitation",
+            "context": {"fullname": "Guest"},
+            "recipients": [
+                {"email": "ann@example.com", "context": {"fullname": "Ann"}},
+                {"email": "bob@example.org"},
+            ],
+        })
+        self.assertEqual(response.status_code, 202, response.text)
+        self.assertEqual(response.json(), {"queued": 2})
+        await self.delivery.join()
+        bodies = b"".join(self.sink.messages)
+        self.assertIn(b"Hi Ann,", bodies)
+        self.assertIn(b"Hi Guest,", bodies)
+        self.assertLessEqual(self.sink.connections, 2)
+
+    async def test_unknown_template(self):
+        response = await self.client.post("/send-batch", json={
+            "template": "missing.html", "subject": "x",
+            "recipients": [{"email": "ann@example.com"}]})
+        self.assertEqual(response.status_code, 422)
+
+    async def test_full_queue(self):
+        response = await self.client.post("/send-batch", json={
+            "template": "example_email.html", "subject": "x",
+            "recipients": [{"email": f"u{i}@example.com"}
+                           for i in range(11)]})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "5")
+
+    async def test_metrics(self):
+        response = await self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("mail_queue_depth 0", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
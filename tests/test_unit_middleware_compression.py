@@ -0,0 +1,83 @@
+import gzip
+import unittest
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.middleware.compression import CompressionMiddleware, choose_encoding
+
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100, offload_size=1000)
+
+
+@app.get("/large")
+def large():
+    return PlainTextResponse("x" * 5000)
+
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("x" * 10)
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(
+        (f"line {i}\n" for i in range(1000)), media_type="text/plain")
+
+
+@app.get("/image")
+def image():
+    return PlainTextResponse("x" * 5000, media_type="image/png")
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_compresses_large_body(self):
+        response = self.client.get(
+            "/large", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertLess(int(response.headers["content-length"]), 5000)
+        self.assertEqual(response.text, "x" * 5000)
+
+    def test_skips_small_body(self):
+        response = self.client.get(
+            "/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.text, "x" * 10)
+
+    def test_skips_incompressible_type(self):
+        response = self.client.get(
+            "/image", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_skips_when_not_accepted(self):
+        response = self.client.get(
+            "/large", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_compresses_stream_incrementally(self):
+        with self.client.stream(
+                "GET", "/stream",
+                headers={"Accept-Encoding": "gzip"}) as response:
+            self.assertEqual(response.headers["content-encoding"], "gzip")
+            self.assertNotIn("content-length", response.headers)
+            raw = b"".join(response.iter_raw())
+        self.assertEqual(
+            gzip.decompress(raw).decode(),
+            "".join(f"line {i}\n" for i in range(1000)))
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("deflate, gzip;q=0.5"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, deflate"))
+        self.assertIsNone(choose_encoding(""))
+
+
+if __name__ == '__main__':
+    unittest.main()
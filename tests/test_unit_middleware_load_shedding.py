@@ -0,0 +1,129 @@
+import asyncio
+import time
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware import load_shedding
+from src.middleware.load_shedding import (BULK, CRITICAL, NORMAL,
+                                          LoadSheddingMiddleware,
+                                          LoopLagMonitor)
+
+
+async def noop(scope, receive, send):
+    pass
+
+
+def http_scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path}
+
+
+class TestPriorities(unittest.TestCase):
+
+    def test_priority(self):
+        middleware = LoadSheddingMiddleware(noop)
+        self.assertEqual(middleware.priority(
+            http_scope("GET", "/api/auth/refresh_token")), CRITICAL)
+        self.assertEqual(middleware.priority(
+            http_scope("GET", "/api/contacts/42")), CRITICAL)
+        self.assertEqual(middleware.priority(
+            http_scope("DELETE", "/api/contacts/42")), NORMAL)
+        self.assertEqual(middleware.priority(
+            http_scope("GET", "/api/contacts/export")), BULK)
+        self.assertEqual(middleware.priority(
+            http_scope("POST", "/api/contacts/import/")), BULK)
+        self.assertEqual(middleware.priority(
+            http_scope("GET", "/api/contacts/")), NORMAL)
+
+    def test_in_flight_shares(self):
+        middleware = LoadSheddingMiddleware(noop, max_in_flight=10)
+        middleware.in_flight = 5
+        self.assertFalse(middleware.admit(BULK))
+        self.assertTrue(middleware.admit(NORMAL))
+        middleware.in_flight = 8
+        self.assertFalse(middleware.admit(NORMAL))
+        self.assertTrue(middleware.admit(CRITICAL))
+        middleware.in_flight = 10
+        self.assertFalse(middleware.admit(CRITICAL))
+
+
+class TestLoopLagMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def test_blocked_loop(self):
+        monitor = LoopLagMonitor(interval=0.01)
+        monitor.ensure_started()
+        await asyncio.sleep(0.03)
+        self.assertLess(monitor.lag(), 0.05)
+        time.sleep(0.2)
+        # Overdue before the timer gets to run.
+        self.assertGreaterEqual(monitor.lag(), 0.15)
+        await asyncio.sleep(0.001)
+        self.assertGreaterEqual(monitor.last_lag, 0.15)
+
+
+class TestLoadSheddingMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+
+        @app.get("/api/contacts/export")
+        async def export():
+            return {}
+
+        @app.get("/api/contacts/{contact_id}")
+        async def read_contact(contact_id: int):
+            return {}
+
+        app.add_middleware(LoadSheddingMiddleware, target_lag=0.1,
+                           retry_after=3)
+        self.client = TestClient(app)
+        self.lag = load_shedding.loop_lag.lag
+        load_shedding.loop_lag.lag = lambda: 0.15
+
+    def tearDown(self):
+        load_shedding.loop_lag.lag = self.lag
+
+    def test_sheds_bulk_first(self):
+        shed = load_shedding.http_requests_shed_total.values.get(
+            (BULK,), 0)
+        response = self.client.get("/api/contacts/export")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "3")
+        self.assertEqual(
+            load_shedding.http_requests_shed_total.values[(BULK,)],
+            shed + 1)
+        self.assertEqual(self.client.get("/api/contacts/1").status_code,
+                         200)
+
+
+class TestLoadSheddingInApp(unittest.TestCase):
+
+    def setUp(self):
+        from main import app
+        self.client = TestClient(app)
+        self.lag = load_shedding.loop_lag.lag
+        load_shedding.loop_lag.lag = lambda: 60
+
+    def tearDown(self):
+        load_shedding.loop_lag.lag = self.lag
+
+    def test_shed_responses_carry_cors_headers(self):
+        origin = {"Origin": "http://localhost:3000"}
+        response = self.client.get("/api/contacts/", headers=origin)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["access-control-allow-origin"],
+                         "http://localhost:3000")
+        self.assertIn("retry-after",
+                      response.headers["access-control-expose-headers"]
+                      .lower())
+
+    def test_preflight_is_not_shed(self):
+        response = self.client.options("/api/contacts/", headers={
+            "Origin": "http://localhost:3000",
+            "Access-Control-Request-Method": "GET"})
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
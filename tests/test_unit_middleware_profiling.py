@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.conf.config import settings
+from src.middleware.profiling import ProfilingMiddleware
+from src.routes import profiles
+from src.services.profiling import (
+    ProfilingSwitch, list_profiles, profile_path
+)
+
+
+def slow_function():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfilingMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        app = FastAPI()
+        self.switch = ProfilingSwitch()
+        app.add_middleware(ProfilingMiddleware, directory=self.directory,
+                           admin_token="secret", switch=self.switch,
+                           interval=0.001, keep=2)
+        app.include_router(profiles.router)
+
+        @app.get("/slow")
+        def slow():
+            slow_function()
+            return {"ok": True}
+
+        self.client = TestClient(app)
+        self.settings = patch.multiple(
+            settings, profiling_admin_token="secret",
+            profiling_dir=self.directory)
+        self.settings.start()
+        self.switch_patch = patch.object(
+            profiles, "profiling_switch", self.switch)
+        self.switch_patch.start()
+
+    def tearDown(self):
+        self.switch_patch.stop()
+        self.settings.stop()
+        shutil.rmtree(self.directory)
+
+    def test_not_profiled_without_token(self):
+        response = self.client.get("/slow", headers={"X-Profile": "wrong"})
+        self.assertNotIn("x-profile-id", response.headers)
+        self.assertEqual(list_profiles(self.directory), [])
+
+    def test_profiled_with_token(self):
+        response = self.client.get("/slow", headers={"X-Profile": "secret"})
+        name = response.headers["x-profile-id"]
+        with open(os.path.join(self.directory, name)) as file:
+            content = file.read()
+        self.assertIn("slow_function", content)
+        stack, count = content.splitlines()[0].rsplit(" ", 1)
+        self.assertTrue(int(count) > 0)
+
+    def test_old_profiles_are_removed(self):
+        for _ in range(3):
+            self.client.get("/slow", headers={"X-Profile": "secret"})
+        self.assertEqual(len(list_profiles(self.directory)), 2)
+
+    def test_admin_routes(self):
+        name = self.client.get(
+            "/slow", headers={"X-Profile": "secret"}
+            ).headers["x-profile-id"]
+        response = self.client.get("/admin/profiles/")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            "/admin/profiles/", headers={"X-Admin-Token": "secret"})
+        self.assertEqual(response.json()[0]["name"], name)
+        response = self.client.get(
+            f"/admin/profiles/{name}", headers={"X-Admin-Token": "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("slow_function", response.text)
+
+    def test_non_ascii_tokens_are_rejected(self):
+        token = "sécret".encode("latin-1")
+        response = self.client.get("/slow", headers={"X-Profile": token})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("x-profile-id", response.headers)
+        response = self.client.get(
+            "/admin/profiles/", headers={"X-Admin-Token": token})
+        self.assertEqual(response.status_code, 403)
+
+    def test_switch_at_runtime(self):
+        headers = {"X-Admin-Token": "secret"}
+        response = self.client.put("/admin/profiles/switch", headers=headers,
+                                   json={"enabled": False})
+        self.assertEqual(response.json(),
+                         {"enabled": False, "sample_rate": 0.0})
+        response = self.client.get("/slow", headers={"X-Profile": "secret"})
+        self.assertNotIn("x-profile-id", response.headers)
+
+        self.client.put("/admin/profiles/switch", headers=headers,
+                        json={"enabled": True, "sample_rate": 1})
+        response = self.client.get("/slow")
+        self.assertIn("x-profile-id", response.headers)
+        response = self.client.get("/admin/profiles/switch")
+        self.assertEqual(response.status_code, 403)
+
+    def test_profile_path_rejects_traversal(self):
+        self.assertIsNone(profile_path(self.directory, "../x.folded"))
+        self.assertIsNone(profile_path(self.directory, "missing.folded"))
+
+
+if __name__ == '__main__':
+    unittest.main()
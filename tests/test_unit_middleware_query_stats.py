@@ -0,0 +1,60 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from src.database.instrumentation import instrument_engine, redact
+from src.middleware.query_stats import QueryStatsMiddleware
+
+
+engine = create_engine(
+    "sqlite://", poolclass=StaticPool,
+    connect_args={"check_same_thread": False})
+instrument_engine(engine, slow_query_seconds=0)
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware, repeated_threshold=3)
+
+
+@app.get("/queries/{count}")
+def run_queries(count: int):
+    with engine.connect() as connection:
+        for value in range(count):
+            connection.execute(text("SELECT :value"), {"value": value})
+    return {"count": count}
+
+
+class TestQueryStatsMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_server_timing_header(self):
+        response = self.client.get("/queries/2")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="2 queries"', response.headers["server-timing"])
+        self.assertTrue(response.headers["server-timing"].startswith("db;"))
+
+    def test_repeated_queries_are_logged(self):
+        with self.assertLogs("src.database.repeated_queries") as logs:
+            self.client.get("/queries/3")
+        self.assertIn("ran the same query 3 times", logs.output[0])
+
+    def test_slow_queries_are_logged_without_parameters(self):
+        with self.assertLogs("src.database.slow_queries") as logs:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 'secret@example.com', :v"),
+                                   {"v": "hidden"})
+        self.assertNotIn("secret", logs.output[0])
+        self.assertNotIn("hidden", logs.output[0])
+
+    def test_redact(self):
+        self.assertEqual(
+            redact("SELECT * FROM users WHERE id = 5 AND\n email = 'a'"),
+            "SELECT * FROM users WHERE id = ? AND email = ?")
+
+
+if __name__ == '__main__':
+    unittest.main()
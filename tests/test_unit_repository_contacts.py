@@ -1,9 +1,11 @@
 import unittest
 from unittest.mock import MagicMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
 
-from src.database.models import Contact, User
+from src.database.models import Base, Contact, User
+from src.schemas import ContactResponse
 from src.schemas import (
     ContactBase, ContactUpdate
 )
@@ -11,9 +13,11 @@ from src.repository.contacts import (
     get_contacts,
     get_contact_id,
     create_contact,
+    create_contacts,
     remove_contact,
     update_contact,
-
+    get_contact_suggestions,
+    get_contact_count,
 )
 
 import sys
@@ -38,6 +42,33 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             )
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_projection(self):
+        rows = [(1, "test@example.com")]
+        self.session.query().filter().order_by().offset().limit()\
+            .all.return_value = rows
+        result = await get_contacts(
+            skip=0, limit=10, user=self.user, db=self.session,
+            order_by=[Contact.id], fields=["id", "email"]
+            )
+        self.assertEqual(result, rows)
+        self.session.query.assert_called_with(Contact.id, Contact.email)
+
+    async def test_get_contact_count_reads_counter(self):
+        self.session.query().filter().scalar.return_value = 3
+        result = await get_contact_count(user=self.user, db=self.session)
+        self.assertEqual(result, 3)
+        self.session.query.assert_called_with(User.contact_count)
+
+    async def test_get_contact_count_filtered(self):
+        self.session.query().filter().scalar.return_value = 1
+        result = await get_contact_count(
+            user=self.user, db=self.session,
+            filters=[Contact.last_name_key == "smith"]
+            )
+        self.assertEqual(result, 1)
+        self.assertNotEqual(
+            self.session.query.call_args.args, (User.contact_count,))
+
     async def test_get_contact_found(self):
         contact = Contact()
         self.session.query().filter()\
@@ -54,6 +85,15 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             )
         self.assertIsNone(result)
 
+    async def test_get_contact_suggestions(self):
+        contacts = [Contact(), Contact()]
+        self.session.query().filter().order_by().limit()\
+            .all.return_value = contacts
+        result = await get_contact_suggestions(
+            prefix="jo", limit=10, user=self.user, db=self.session
+            )
+        self.assertEqual(result, contacts)
+
     async def test_create_contact(self):
         body = ContactBase(
             first_name="test_first_name",
@@ -80,6 +120,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.session.add.assert_called_once_with(result)
         self.session.commit.assert_called_once()
         self.session.refresh.assert_called_once_with(result)
+        self.session.query().filter().update.assert_called_once()
         self.assertTrue(hasattr(result, "id"))
 
     async def test_remove_contact_found(self):
@@ -92,6 +133,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             db=self.session)
         self.assertEqual(result, contact)
         self.session.delete.assert_called_once_with(contact)
+        self.session.query().filter().update.assert_called_once()
         self.session.commit.assert_called_once()
 
     async def test_remove_contact_not_found(self):
@@ -147,5 +189,38 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(result)
 
 
+class TestCreateContacts(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.user = User(email="owner@example.com", password="x")
+        self.session.add(self.user)
+        self.session.commit()
+        self.session.refresh(self.user)
+
+    def tearDown(self):
+        self.session.close()
+
+    async def test_created_contacts_are_loaded_in_one_query(self):
+        bodies = [ContactBase(
+            first_name=f"first{number}", last_name="last",
+            email=f"contact{number}@example.com", phone="+380501112233",
+            birth_date="2000-01-01", created_at="2024-07-13")
+            for number in range(50)]
+        statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+        contacts = await create_contacts(bodies, self.user, self.session)
+        responses = [ContactResponse.model_validate(contact)
+                     for contact in contacts]
+        self.assertEqual([response.first_name for response in responses],
+                         [body.first_name for body in bodies])
+        selects = [statement for statement in statements
+                   if statement.lstrip().upper().startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Base, EmailOutbox
+from src.repository.outbox import (
+    claim_emails,
+    enqueue_email,
+    mark_failed,
+    mark_sent
+)
+from src.workers import email_outbox
+
+
+class TestOutbox(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+
+    async def test_enqueue_without_commit(self):
+        await enqueue_email("confirm_email", "a@example.com",
+                            {"host": "h"}, self.session, commit=False)
+        self.session.rollback()
+        self.assertEqual(self.session.query(EmailOutbox).count(), 0)
+
+    async def test_claimed_emails_are_leased(self):
+        for number in range(3):
+            await enqueue_email("confirm_email", f"{number}@example.com",
+                                {"host": "h"}, self.session)
+        claimed = await claim_emails(2, timedelta(minutes=5), self.session)
+        self.assertEqual([email.recipient for email in claimed],
+                         ["0@example.com", "1@example.com"])
+        self.assertTrue(all(email.attempts == 1 for email in claimed))
+        claimed = await claim_emails(2, timedelta(minutes=5), self.session)
+        self.assertEqual([email.recipient for email in claimed],
+                         ["2@example.com"])
+
+    async def test_mark_sent(self):
+        email = await enqueue_email("confirm_email", "a@example.com",
+                                    {"host": "h"}, self.session)
+        await mark_sent(email, self.session)
+        self.assertEqual(email.status, "sent")
+        self.assertIsNotNone(email.sent_at)
+
+    async def test_mark_failed_backs_off_then_gives_up(self):
+        email = await enqueue_email("confirm_email", "a@example.com",
+                                    {"host": "h"}, self.session)
+        email.attempts = 2
+        before = datetime.now()
+        await mark_failed(email, "refused", 3, timedelta(seconds=10),
+                          self.session)
+        self.assertEqual(email.status, "pending")
+        self.assertGreaterEqual(email.next_attempt_at,
+                                before + timedelta(seconds=20))
+        email.attempts = 3
+        await mark_failed(email, "refused", 3, timedelta(seconds=10),
+                          self.session)
+        self.assertEqual(email.status, "failed")
+        self.assertEqual(email.last_error, "refused")
+
+    async def test_worker_records_outcomes(self):
+        await enqueue_email("confirm_email", "ok@example.com",
+                            {"host": "h"}, self.session)
+        await enqueue_email("confirm_email", "bad@example.com",
+                            {"host": "h"}, self.session)
+
+        async def send(kind, recipient, payload):
+            if recipient == "bad@example.com":
+                raise ConnectionError("relay down")
+
+        with patch.object(email_outbox, "send_outbox_email",
+                          new=AsyncMock(side_effect=send)):
+            claimed = await email_outbox.process_batch(self.session)
+        self.assertEqual(claimed, 2)
+        statuses = dict(self.session.query(
+            EmailOutbox.recipient, EmailOutbox.status))
+        self.assertEqual(statuses, {"ok@example.com": "sent",
+                                    "bad@example.com": "pending"})
+        failed = self.session.query(EmailOutbox).filter(
+            EmailOutbox.recipient == "bad@example.com").one()
+        self.assertIn("relay down", failed.last_error)
+
+    async def test_worker_gives_up_before_the_lease_expires(self):
+        await enqueue_email("confirm_email", "slow@example.com",
+                            {"host": "h"}, self.session)
+
+        async def send(kind, recipient, payload):
+            await asyncio.sleep(10)
+
+        with patch.object(email_outbox, "send_outbox_email",
+                          new=AsyncMock(side_effect=send)):
+            claimed = await asyncio.wait_for(email_outbox.process_batch(
+                self.session, lease=timedelta(seconds=0.1)), 1)
+        self.assertEqual(claimed, 1)
+        email = self.session.query(EmailOutbox).one()
+        self.assertEqual(email.status, "pending")
+        self.assertEqual(email.last_error, "Not sent within 0.08 seconds")
+        self.assertGreater(email.next_attempt_at, datetime.now())
+
+    async def test_worker_batch_queries(self):
+        for number in range(100):
+            await enqueue_email("confirm_email", f"{number}@example.com",
+                                {"host": "h"}, self.session)
+        statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2].lstrip()))
+        with patch.object(email_outbox, "send_outbox_email",
+                          new=AsyncMock()):
+            await email_outbox.process_batch(self.session)
+        selects = [statement for statement in statements
+                   if statement.upper().startswith("SELECT")]
+        # The claim and the reload after its commit.
+        self.assertEqual(len(selects), 2)
+        updates = [statement for statement in statements
+                   if statement.upper().startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
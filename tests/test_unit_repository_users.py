@@ -12,7 +12,8 @@ from src.repository.users import (
     create_user,
     update_token,
     confirmed_email,
-    update_avatar
+    update_avatar,
+    reconcile_contact_counts
 )
 
 
@@ -94,6 +95,24 @@ class TestUsers(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.avatar, new_avatar_url)
         self.session.commit.assert_called_once()
 
+    async def test_update_avatar_unchanged_hash(self):
+        self.user.avatar_hash = "abc"
+        self.session.query().filter().first.return_value = self.user
+        result = await update_avatar(
+            email="test@example.com",
+            url="http://example.com/new_avatar.png",
+            db=self.session,
+            avatar_hash="abc"
+            )
+        self.assertEqual(result, self.user)
+        self.session.commit.assert_not_called()
+
+    async def test_reconcile_contact_counts(self):
+        self.session.query().filter().update.return_value = 2
+        result = await reconcile_contact_counts(db=self.session)
+        self.assertEqual(result, 2)
+        self.session.commit.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()
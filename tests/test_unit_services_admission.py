@@ -0,0 +1,110 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from fastapi import Depends, FastAPI, Form
+from fastapi.testclient import TestClient
+
+from src.services import admission
+from src.services.admission import AuthAdmission, HashBudget
+from src.services.rate_limiter import Limit, RateLimiter
+
+
+class TestHashBudget(unittest.IsolatedAsyncioTestCase):
+
+    async def test_admit(self):
+        budget = HashBudget(concurrency=1, queue=1)
+        self.assertTrue(budget.admit())
+        self.assertTrue(budget.admit())
+        self.assertFalse(budget.admit())
+        budget.release()
+        self.assertTrue(budget.admit())
+
+    async def test_run_in_thread(self):
+        budget = HashBudget(concurrency=1, queue=0)
+        thread = await budget.run(threading.get_ident)
+        self.assertNotEqual(thread, threading.get_ident())
+
+
+class TestAuthAdmission(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+        self.budget = HashBudget(concurrency=1, queue=1)
+        self.dependency = AuthAdmission("test:login", "username")
+        self.dependency.ip_limit = Limit(4, 60)
+        self.dependency.account_limit = Limit(2, 60)
+        self.dependency.account_total_limit = Limit(3, 60)
+        app = FastAPI()
+
+        @app.post("/login", dependencies=[Depends(self.dependency)])
+        async def login(username: str = Form()):
+            self.calls += 1
+            return {}
+
+        async def from_address(scope, receive, send):
+            headers = dict(scope.get("headers", []))
+            if b"x-client-host" in headers:
+                scope["client"] = (headers[b"x-client-host"].decode(), 1)
+            await app(scope, receive, send)
+
+        self.client = TestClient(from_address)
+        self.patches = [
+            patch.object(admission, "hash_budget", self.budget),
+            patch.object(admission, "rate_limiter", RateLimiter())]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    def login(self, username: str, host: str = "10.0.0.1"):
+        return self.client.post("/login", data={"username": username},
+                                headers={"X-Client-Host": host})
+
+    def test_account_limit(self):
+        statuses = [self.login("Ann@example.com ").status_code,
+                    self.login("ann@example.com").status_code]
+        rejected = self.login("ann@example.com")
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected.headers["Retry-After"], "30")
+        self.assertEqual(self.login("bob@example.com").status_code, 200)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.budget.admitted, 0)
+
+    def test_account_limit_is_per_address(self):
+        for _ in range(3):
+            self.login("ann@example.com", "10.0.0.66")
+        response = self.login("ann@example.com", "10.0.0.2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 3)
+
+    def test_account_total_limit(self):
+        statuses = [self.login("ann@example.com", f"10.0.0.{i}").status_code
+                    for i in range(4)]
+        self.assertEqual(statuses, [200] * 3 + [429])
+        self.assertEqual(self.login("bob@example.com").status_code, 200)
+
+    def test_ip_limit(self):
+        statuses = [self.login(f"user{i}@example.com").status_code
+                    for i in range(5)]
+        self.assertEqual(statuses, [200] * 4 + [429])
+        self.assertEqual(self.calls, 4)
+
+    def test_busy(self):
+        self.budget.admitted = self.budget.capacity
+        rejections = admission.auth_admission_rejections_total.values.get(
+            ("busy",), 0)
+        response = self.login("ann@example.com")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(
+            admission.auth_admission_rejections_total.values[("busy",)],
+            rejections + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from unittest.mock import patch
+
+from fastapi import APIRouter, FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src.conf.config import settings
+from src.services import avatars
+from src.services.avatars import (AvatarStaticFiles, AvatarUploadRoute,
+                                  LocalStorage,
+                                  hash_upload, make_thumbnail, store_avatar)
+
+
+def make_image(size, mode="RGB", format="PNG", color="red") -> bytes:
+    output = io.BytesIO()
+    Image.new(mode, size, color).save(output, format)
+    return output.getvalue()
+
+
+def make_upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="avatar.png")
+
+
+class TestHashUpload(unittest.IsolatedAsyncioTestCase):
+
+    async def test_rewinds_file(self):
+        data = b"x" * 200_000
+        upload = make_upload(data)
+        await hash_upload(upload, len(data))
+        self.assertEqual(await upload.read(), data)
+
+    async def test_hash_depends_only_on_content(self):
+        hashes = set()
+        for data in (b"a" * 100_000, b"a" * 100_000, b"b" * 100_000):
+            hashes.add(await hash_upload(make_upload(data), len(data)))
+        self.assertEqual(len(hashes), 2)
+
+    async def test_rejects_large_file(self):
+        with self.assertRaises(HTTPException) as error:
+            await hash_upload(make_upload(b"x" * 200_001), 200_000)
+        self.assertEqual(error.exception.status_code, 413)
+
+    async def test_rejects_by_size_before_reading(self):
+        upload = UploadFile(io.BytesIO(b"x"), size=200_001)
+        with self.assertRaises(HTTPException) as error:
+            await hash_upload(upload, 200_000)
+        self.assertEqual(error.exception.status_code, 413)
+        self.assertEqual(upload.file.tell(), 0)
+
+
+class TestAvatarUploadRoute(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        router = APIRouter(route_class=AvatarUploadRoute)
+
+        @router.patch("/avatar")
+        async def upload(file: UploadFile = File()):
+            return {}
+
+        self.app = FastAPI()
+        self.app.include_router(router)
+        self.patches = [patch.object(settings, "avatar_max_bytes", 1000),
+                        patch.object(avatars, "MULTIPART_OVERHEAD", 1000)]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    async def upload(self, headers: list, chunks: int) -> tuple:
+        received = []
+        sent = []
+
+        async def receive():
+            body = (b'--b\r\nContent-Disposition: form-data; name="file"; '
+                    b'filename="a.png"\r\n\r\n' if not received else b"")
+            body += b"x" * (1000 - len(body))
+            received.append(len(body))
+            return {"type": "http.request", "body": body,
+                    "more_body": len(received) < chunks}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "PATCH", "path": "/avatar",
+                 "query_string": b"", "root_path": "",
+                 "headers": [(b"content-type",
+                              b"multipart/form-data; boundary=b")]
+                 + headers}
+        await self.app(scope, receive, send)
+        return sent[0]["status"], sum(received)
+
+    async def test_rejects_declared_length(self):
+        status, received = await self.upload(
+            [(b"content-length", b"100000")], 100)
+        self.assertEqual(status, 413)
+        self.assertEqual(received, 0)
+
+    async def test_stops_receiving_at_the_limit(self):
+        status, received = await self.upload([], 100)
+        self.assertEqual(status, 413)
+        self.assertEqual(received, 3000)
+
+
+class TestMakeThumbnail(unittest.TestCase):
+
+    def thumbnail(self, data: bytes) -> Image.Image:
+        return Image.open(io.BytesIO(make_thumbnail(io.BytesIO(data))))
+
+    def test_crops_and_resizes(self):
+        image = self.thumbnail(make_image((1200, 600)))
+        self.assertEqual(image.size, (250, 250))
+        self.assertEqual(image.format, "WEBP")
+
+    def test_keeps_transparency(self):
+        image = self.thumbnail(make_image((300, 300), mode="RGBA",
+                                          color=(255, 0, 0, 0)))
+        self.assertEqual(image.mode, "RGBA")
+
+    def test_large_jpeg(self):
+        image = self.thumbnail(make_image((4000, 3000), format="JPEG"))
+        self.assertEqual(image.size, (250, 250))
+
+    def test_rejects_non_images(self):
+        with self.assertRaises(HTTPException) as error:
+            make_thumbnail(io.BytesIO(b"GIF89a but not really"))
+        self.assertEqual(error.exception.status_code, 422)
+
+
+class TestStoreAvatar(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.directory.name, "/avatars/")
+
+    async def asyncTearDown(self):
+        self.directory.cleanup()
+
+    async def store(self, data: bytes) -> str:
+        upload = make_upload(data)
+        avatar_hash = await hash_upload(upload, 10 ** 6)
+        return await store_avatar(upload.file, avatar_hash, self.storage)
+
+    async def test_local_storage(self):
+        url = await self.store(make_image((500, 500)))
+        name = url.removeprefix("/avatars/")
+        self.assertRegex(name, r"^[0-9a-f]{64}\.webp$")
+        self.assertEqual(
+            [path.name for path in Path(self.directory.name).iterdir()],
+            [name])
+
+    async def test_same_image_is_stored_once(self):
+        first = await self.store(make_image((500, 500)))
+        path = Path(self.directory.name) / first.removeprefix("/avatars/")
+        modified = path.stat().st_mtime_ns
+        self.assertEqual(await self.store(make_image((500, 500))), first)
+        self.assertEqual(path.stat().st_mtime_ns, modified)
+        self.assertNotEqual(await self.store(make_image((400, 500))), first)
+
+    async def test_concurrent_saves_use_their_own_files(self):
+        sources = []
+        with patch.object(avatars.os, "replace",
+                          side_effect=lambda src, dst: sources.append(src)):
+            # The first file is not in place yet when the second save
+            # of the same key starts.
+            self.storage.save("key", b"first")
+            self.storage.save("key", b"second")
+        self.assertEqual(len(set(sources)), 2)
+        self.assertEqual([Path(source).read_bytes() for source in sources],
+                         [b"first", b"second"])
+
+    async def test_served_with_immutable_caching(self):
+        url = await self.store(make_image((500, 500)))
+        app = FastAPI()
+        app.mount("/avatars",
+                  AvatarStaticFiles(directory=self.directory.name))
+        response = TestClient(app).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"],
+                         "public, max-age=31536000, immutable")
+
+
+if __name__ == '__main__':
+    unittest.main()
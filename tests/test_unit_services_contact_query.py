@@ -0,0 +1,55 @@
+import unittest
+
+from src.services.contact_query import (
+    parse_fields,
+    parse_filters,
+    parse_sort
+)
+
+
+class TestContactQuery(unittest.TestCase):
+
+    def test_parse_filters(self):
+        conditions = parse_filters(
+            ["last_name:prefix:Sm", "birth_date:gte:2000-01-01"])
+        self.assertEqual(len(conditions), 2)
+        self.assertIn("last_name_key LIKE", str(conditions[0]))
+        self.assertEqual(conditions[0].right.value, "sm")
+        self.assertIn("birth_date >=", str(conditions[1]))
+
+    def test_parse_filters_rejects_unknown_field(self):
+        with self.assertRaises(ValueError):
+            parse_filters(["additional_data:eq:x"])
+
+    def test_parse_filters_rejects_unsupported_operator(self):
+        with self.assertRaises(ValueError):
+            parse_filters(["email:gte:a"])
+
+    def test_parse_filters_rejects_bad_value(self):
+        with self.assertRaises(ValueError):
+            parse_filters(["birth_date:eq:yesterday"])
+
+    def test_parse_sort(self):
+        order_by = [str(clause) for clause in parse_sort("-birth_date, email")]
+        self.assertEqual(order_by, [
+            "contacts.birth_date DESC",
+            "contacts.email_key ASC",
+            "contacts.id ASC",
+        ])
+
+    def test_parse_sort_rejects_unknown_field(self):
+        with self.assertRaises(ValueError):
+            parse_sort("user_id")
+
+    def test_parse_fields(self):
+        self.assertEqual(
+            parse_fields("email,first_name,email"),
+            ["id", "email", "first_name"])
+
+    def test_parse_fields_rejects_unknown_field(self):
+        with self.assertRaises(ValueError):
+            parse_fields("password")
+
+
+if __name__ == '__main__':
+    unittest.main()
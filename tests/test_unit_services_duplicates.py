@@ -0,0 +1,36 @@
+import unittest
+
+from src.services.duplicates import find_duplicate_groups
+
+
+class TestDuplicates(unittest.TestCase):
+
+    def test_groups_by_email_phone_and_name(self):
+        rows = [
+            (1, "john", "smith", "john@x.com", "+380501234567"),
+            (2, "jon", "smyth", "other@x.com", "+380501234567"),
+            (3, "anna", "brown", "john@x.com", None),
+            (4, "mary", "jones", "mary@x.com", "+12125550100"),
+            (5, "marie", "jonas", "m.jones@x.com", None),
+        ]
+        groups = find_duplicate_groups(rows)
+        self.assertEqual(
+            [group["contact_ids"] for group in groups], [[1, 2, 3], [4, 5]])
+        self.assertEqual(groups[0]["reasons"], ["email", "name", "phone"])
+        self.assertEqual(groups[0]["score"], 0.9)
+        self.assertEqual(groups[1]["reasons"], ["name"])
+
+    def test_no_duplicates(self):
+        rows = [
+            (1, "john", "smith", "john@x.com", "+380501234567"),
+            (2, "anna", "brown", "anna@x.com", "+380501234568"),
+        ]
+        self.assertEqual(find_duplicate_groups(rows), [])
+
+    def test_skips_oversized_name_blocks(self):
+        rows = [(i, "john", "smith", f"{i}@x.com", None) for i in range(5)]
+        self.assertEqual(find_duplicate_groups(rows, max_block_size=4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
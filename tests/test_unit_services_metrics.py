@@ -0,0 +1,70 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware.metrics import MetricsMiddleware
+from src.services.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    http_request_duration_seconds,
+    http_requests_total
+)
+
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/items/{item_id}")
+def read_item(item_id: int):
+    return {"id": item_id}
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counter_render(self):
+        counter = Counter("requests_total", "Requests.", ("route",))
+        counter.inc("/a")
+        counter.inc("/a", amount=2)
+        registry = Registry()
+        registry.register(counter)
+        text = registry.render()
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{route="/a"} 3', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Latency.", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        lines = histogram.render()
+        self.assertIn('latency_bucket{le="0.1"} 2', lines)
+        self.assertIn('latency_bucket{le="1.0"} 3', lines)
+        self.assertIn('latency_bucket{le="+Inf"} 4', lines)
+        self.assertIn("latency_count 4", lines)
+
+    def test_label_values_are_escaped(self):
+        counter = Counter("c", "C.", ("path",))
+        counter.inc('a"b')
+        self.assertIn('c{path="a\\"b"} 1', counter.render())
+
+    def test_middleware_uses_route_template(self):
+        client = TestClient(app)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        self.assertEqual(
+            http_requests_total.values[("GET", "/items/{item_id}", "200")], 2)
+        self.assertEqual(
+            http_requests_total.values[("GET", "unmatched", "404")], 1)
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{method="GET",route="/items/{item_id}"} 2',
+            http_request_duration_seconds.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
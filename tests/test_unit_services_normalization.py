@@ -0,0 +1,41 @@
+import unittest
+
+from src.services.normalization import (
+    fold_text,
+    normalize_email,
+    normalize_name,
+    normalize_phone
+)
+
+
+class TestNormalization(unittest.TestCase):
+
+    def test_fold_text_strips_accents_and_case(self):
+        self.assertEqual(fold_text("  Zoë Ångström "), "zoe angstrom")
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email("John@X.com "), "john@x.com")
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("José"), normalize_name("JOSE"))
+
+    def test_normalize_phone_international(self):
+        self.assertEqual(
+            normalize_phone("+1 (212) 555-0100", "380"), "+12125550100")
+        self.assertEqual(
+            normalize_phone("0044 20 7946 0958", "380"), "+442079460958")
+
+    def test_normalize_phone_national(self):
+        self.assertEqual(
+            normalize_phone("050 123 45 67", "380"), "+380501234567")
+
+    def test_normalize_phone_integer(self):
+        self.assertEqual(normalize_phone(111111111, "380"), "+111111111")
+
+    def test_normalize_phone_invalid(self):
+        with self.assertRaises(ValueError):
+            normalize_phone("12ab", "380")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+
+from src.services import rate_limiter as rate_limiter_module
+from src.services.auth import auth_service
+from src.services.rate_limiter import (Limit, RateLimit, RateLimiter,
+                                       TokenBucket, resolve_limit)
+
+try:
+    import fakeredis
+except ImportError:  # fakeredis is optional, only these tests need it
+    fakeredis = None
+
+
+class TestLimit(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(Limit.parse("10/minute"), Limit(10, 60))
+        self.assertEqual(Limit.parse("5/seconds"), Limit(5, 1))
+        self.assertEqual(Limit.parse("100/30"), Limit(100, 30.0))
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(2, 1)
+        now = bucket.updated
+        self.assertEqual(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now), 0)
+        self.assertAlmostEqual(bucket.take(now), 1)
+        self.assertEqual(bucket.take(now + 1), 0)
+
+    def test_resolve_limit(self):
+        rules = {"list": Limit(100, 60), "list:plan:pro": Limit(1000, 60),
+                 "list:user:7": Limit(5, 60)}
+        default = Limit(10, 60)
+        with patch.object(rate_limiter_module, "RULES", rules):
+            self.assertEqual(resolve_limit(
+                "list", default, SimpleNamespace(id=7, plan="pro")),
+                Limit(5, 60))
+            self.assertEqual(resolve_limit(
+                "list", default, SimpleNamespace(id=8, plan="pro")),
+                Limit(1000, 60))
+            self.assertEqual(resolve_limit(
+                "list", default, SimpleNamespace(id=8, plan="free")),
+                Limit(100, 60))
+            self.assertEqual(resolve_limit(
+                "other", default, SimpleNamespace(id=8, plan="free")),
+                default)
+
+
+class TestLocalRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def test_without_redis(self):
+        limiter = RateLimiter()
+        results = [await limiter.hit("k", Limit(3, 60)) for _ in range(4)]
+        self.assertEqual(results[:3], [0, 0, 0])
+        self.assertGreater(results[3], 0)
+        self.assertTrue(limiter.degraded)
+
+    async def test_disabled(self):
+        limiter = RateLimiter(enabled=False)
+        for _ in range(10):
+            self.assertEqual(await limiter.hit("k", Limit(1, 60)), 0)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TestRedisRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+
+    async def asyncTearDown(self):
+        await self.redis.aclose()
+
+    def make_limiter(self, **kwargs) -> RateLimiter:
+        limiter = RateLimiter(**kwargs)
+        limiter.init(self.redis)
+        return limiter
+
+    async def test_workers_share_the_limit(self):
+        workers = [self.make_limiter(lease_fraction=0.1) for _ in range(2)]
+        limit = Limit(100, 3600)
+        allowed = 0
+        for _ in range(80):
+            for worker in workers:
+                allowed += await worker.hit("k", limit) == 0
+        self.assertEqual(allowed, 100)
+        wait = await workers[0].hit("k", limit)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 36.1)
+
+    async def test_requests_are_served_from_leases(self):
+        limiter = self.make_limiter(lease_fraction=0.1)
+        leases = rate_limiter_module.rate_limit_leases_total.values.get(
+            (), 0)
+        for _ in range(50):
+            await limiter.hit("k", Limit(1000, 60))
+        self.assertEqual(
+            rate_limiter_module.rate_limit_leases_total.values[()] - leases,
+            1)
+
+    async def test_unused_leases_expire(self):
+        limiter = self.make_limiter(lease_fraction=0.5, lease_seconds=0)
+        limit = Limit(4, 3600)
+        self.assertEqual(await limiter.hit("k", limit), 0)
+        self.assertEqual(await limiter.hit("k", limit), 0)
+        self.assertGreater(await limiter.hit("k", limit), 0)
+
+    async def test_degrades_when_redis_fails(self):
+        limiter = self.make_limiter(local_share=2, retry_seconds=60)
+        limiter.script = AsyncMock(side_effect=ConnectionError("down"))
+        with self.assertLogs("src.services.rate_limiter", "WARNING"):
+            results = [await limiter.hit("k", Limit(10, 60))
+                       for _ in range(6)]
+        self.assertTrue(limiter.degraded)
+        # Every worker gets its share of the limit.
+        self.assertEqual(results[:5], [0] * 5)
+        self.assertGreater(results[5], 0)
+        self.assertEqual(limiter.script.await_count, 1)
+        limiter.redis_down_until = 0
+        limiter.script = self.redis.register_script(
+            rate_limiter_module.LEASE_SCRIPT)
+        self.assertEqual(await limiter.hit("k", Limit(10, 60)), 0)
+
+
+class TestRateLimitDependency(unittest.TestCase):
+
+    def test_rejects_with_retry_after(self):
+        app = FastAPI()
+
+        @app.get("/limited",
+                 dependencies=[Depends(RateLimit("test:limited", "2/hour"))])
+        async def limited():
+            return {}
+
+        app.dependency_overrides[auth_service.get_current_user] = \
+            lambda: SimpleNamespace(id=1, plan="free")
+        client = TestClient(app)
+        with patch.object(rate_limiter_module, "rate_limiter", RateLimiter()):
+            statuses = [client.get("/limited") for _ in range(3)]
+        self.assertEqual([response.status_code for response in statuses],
+                         [200, 200, 429])
+        self.assertEqual(statuses[2].headers["Retry-After"], "1800")
+        self.assertEqual(
+            rate_limiter_module.rate_limit_rejections_total.values[
+                ("/limited",)], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from email.message import EmailMessage
+from unittest.mock import AsyncMock, patch
+
+from src.conf.config import settings
+from src.services import email as email_service
+from src.services.smtp_pool import SMTPPool
+from tests.smtp_sink import SMTPSink
+
+
+def make_message(number: int) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = f"Message {number}"
+    message["From"] = "sender@example.com"
+    message["To"] = "recipient@example.com"
+    message.set_content("Hello")
+    return message
+
+
+class TestSMTPPool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.sink = SMTPSink()
+        await self.sink.start()
+        self.pool = SMTPPool(
+            "127.0.0.1", self.sink.port, username="user", password="secret",
+            size=2, max_messages=50)
+        self.pool.local_hostname = "localhost"
+        await self.pool.start()
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        await self.sink.stop()
+
+    async def test_connections_are_reused(self):
+        for number in range(10):
+            await self.pool.send(make_message(number))
+        self.assertEqual(len(self.sink.messages), 10)
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(self.sink.logins, 1)
+
+    async def test_concurrent_sends_are_limited_to_pool_size(self):
+        await asyncio.gather(*(self.pool.send(make_message(number))
+                               for number in range(20)))
+        self.assertEqual(len(self.sink.messages), 20)
+        self.assertEqual(self.sink.connections, 2)
+
+    async def test_reconnects_after_disconnect(self):
+        await self.pool.send(make_message(1))
+        self.sink.drop_connections()
+        await self.pool.send(make_message(2))
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(self.sink.connections, 2)
+
+    async def test_connection_is_recycled_after_max_messages(self):
+        self.pool.max_messages = 3
+        for number in range(7):
+            await self.pool.send(make_message(number))
+        self.assertEqual(self.sink.connections, 3)
+
+
+class TestSendOutboxEmail(unittest.IsolatedAsyncioTestCase):
+
+    async def test_confirmation_email_is_rendered(self):
+        with patch.object(email_service.smtp_pool, "send",
+                          new=AsyncMock()) as send:
+            await email_service.send_outbox_email(
+                "confirm_email", "new@example.com",
+                {"host": "http://testserver/"})
+        message = send.await_args.args[0]
+        self.assertEqual(message["To"], "new@example.com")
+        self.assertIn("http://testserver/api/auth/confirmed_email/",
+                      message.get_content())
+
+    async def test_birthday_reminder_is_rendered(self):
+        with patch.object(email_service.smtp_pool, "send",
+                          new=AsyncMock()) as send:
+            await email_service.send_outbox_email(
+                "birthday_reminder", "user@example.com",
+                {"contact_name": "Ann Lee", "date": "2026-10-20",
+                 "days": 1})
+        message = send.await_args.args[0]
+        self.assertEqual(message["Subject"], "Birthday reminder: Ann Lee")
+        self.assertIn("Tomorrow is Ann Lee's birthday",
+                      message.get_content())
+
+    async def test_birthday_greeting_hides_the_user(self):
+        with patch.object(email_service.smtp_pool, "send",
+                          new=AsyncMock()) as send:
+            # Greetings queued by earlier versions still carry a sender.
+            await email_service.send_outbox_email(
+                "birthday_greeting", "ann@example.com",
+                {"first_name": "Ann", "sender": "owner@example.com"})
+        message = send.await_args.args[0]
+        content = message.get_content()
+        self.assertNotIn("owner@example.com", content)
+        self.assertIn(settings.mail_from_name, content)
+
+
+if __name__ == '__main__':
+    unittest.main()
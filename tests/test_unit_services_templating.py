@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from jinja2 import UndefinedError
+
+from src.services.templating import TemplateRenderer
+
+
+class TestTemplateRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = tempfile.TemporaryDirectory()
+        path = Path(self.directory.name)
+        (path / "hello.html").write_text(
+            "<p>Hi {{ name }} from {{ site }}</p>")
+        (path / "broken.html").write_text("{{ user.name.first }}")
+        self.renderer = TemplateRenderer(path, cache_dir=self.cache.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+        self.cache.cleanup()
+
+    def test_load_compiles_every_template(self):
+        self.assertEqual(self.renderer.load(), 2)
+        self.assertIs(self.renderer.get("hello.html"),
+                      self.renderer.get("hello.html"))
+        self.assertTrue(any(Path(self.cache.name).iterdir()))
+
+    def test_render_escapes_html(self):
+        self.assertEqual(
+            self.renderer.render("hello.html", name="<b>", site="x"),
+            "<p>Hi &lt;b&gt; from x</p>")
+
+    def test_render_raises_template_errors(self):
+        with self.assertRaises(UndefinedError):
+            self.renderer.render("broken.html")
+
+    def test_templates_are_not_reloaded(self):
+        self.renderer.load()
+        path = Path(self.directory.name) / "hello.html"
+        path.write_text("changed")
+        self.assertIn("Ann", self.renderer.render("hello.html", name="Ann"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import json
+import os
+import queue
+import tempfile
+import threading
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware.tracing import TracingMiddleware
+from src.services.tracing import (
+    JsonLinesExporter,
+    SpanExporter,
+    parse_traceparent,
+    traced,
+    tracer
+)
+
+
+class ListExporter(SpanExporter):
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@traced
+async def load_contact():
+    return 1
+
+
+app = FastAPI()
+app.add_middleware(TracingMiddleware)
+
+
+@app.get("/contacts/{contact_id}")
+async def read_contact(contact_id: int):
+    return {"id": await load_contact()}
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = ListExporter()
+        tracer.configure(self.exporter, sample_rate=1.0)
+
+    def tearDown(self):
+        tracer.configure(None)
+
+    def test_child_spans_share_the_trace(self):
+        with tracer.span("parent") as parent:
+            with tracer.span("child", key="value") as child:
+                pass
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, parent.span_id)
+        self.assertEqual(child.attributes, {"key": "value"})
+        self.assertEqual([span.name for span in self.exporter.spans],
+                         ["child", "parent"])
+
+    def test_unsampled_trace_records_nothing(self):
+        tracer.configure(self.exporter, sample_rate=0.0)
+        with tracer.span("parent") as parent:
+            with tracer.span("child") as child:
+                pass
+        self.assertIsNone(parent)
+        self.assertIsNone(child)
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_error_is_recorded(self):
+        with self.assertRaises(KeyError):
+            with tracer.span("failing"):
+                raise KeyError("x")
+        self.assertEqual(self.exporter.spans[0].error, "KeyError")
+
+    def test_middleware_continues_remote_trace(self):
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        client = TestClient(app)
+        response = client.get("/contacts/1", headers={
+            "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+        self.assertEqual(response.status_code, 200)
+        names = {span.name: span for span in self.exporter.spans}
+        root = names["GET /contacts/{contact_id}"]
+        self.assertEqual(root.trace_id, trace_id)
+        self.assertEqual(root.parent_id, "00f067aa0ba902b7")
+        self.assertEqual(root.attributes["http.status_code"], 200)
+        child = names[f"{__name__}.load_contact"]
+        self.assertEqual(child.parent_id, root.span_id)
+
+    def test_parse_traceparent(self):
+        self.assertIsNone(parse_traceparent("garbage"))
+        self.assertEqual(
+            parse_traceparent(f"00-{'a' * 32}-{'b' * 16}-00"),
+            ("a" * 32, "b" * 16, False))
+
+    def test_json_lines_exporter(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "traces.jsonl")
+        exporter = JsonLinesExporter(path, batch_size=2)
+        writers = []
+        write = exporter._write
+
+        def record_writer(spans):
+            writers.append(threading.get_ident())
+            write(spans)
+
+        exporter._write = record_writer
+        tracer.configure(exporter)
+        for name in ("a", "b", "c"):
+            with tracer.span(name):
+                pass
+        exporter.flush()
+        with open(path) as file:
+            spans = [json.loads(line) for line in file]
+        self.assertEqual([span["name"] for span in spans], ["a", "b", "c"])
+        self.assertNotIn(threading.get_ident(), writers)
+        os.remove(path)
+        os.rmdir(directory)
+
+    def test_json_lines_exporter_drops_when_full(self):
+        exporter = JsonLinesExporter(os.devnull)
+        # A full queue the writer thread does not read from.
+        exporter.queue = queue.Queue(1)
+        exporter.queue.put_nowait(None)
+        with tracer.span("dropped") as span:
+            pass
+        exporter.export(span)
+        self.assertEqual(exporter.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Base, Contact, EmailOutbox, User
+from src.repository import outbox as repository_outbox
+from src.repository.contacts import birthday_month_days
+from src.workers.birthdays import dispatch_shard
+
+
+TODAY = date(2026, 10, 19)
+
+
+class TestBirthdayMonthDays(unittest.TestCase):
+
+    def test_regular_day(self):
+        self.assertEqual(birthday_month_days(TODAY), [(10, 19)])
+
+    def test_february_29_in_common_year(self):
+        self.assertEqual(birthday_month_days(date(2027, 2, 28)),
+                         [(2, 28), (2, 29)])
+
+    def test_february_28_in_leap_year(self):
+        self.assertEqual(birthday_month_days(date(2028, 2, 28)), [(2, 28)])
+
+
+class TestDispatchBirthdays(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+        for user_id in range(1, 5):
+            self.session.add(User(id=user_id, email=f"user{user_id}@x.com",
+                                  password="x", confirmed=True))
+            for number, birth_date in enumerate(
+                    [date(1990, 10, 19), date(1985, 10, 19),
+                     date(1990, 10, 20), date(1990, 3, 1)]):
+                self.session.add(Contact(
+                    first_name=f"First{number}", last_name=f"Last{user_id}",
+                    email=f"c{number}.u{user_id}@x.com", phone="+1",
+                    birth_date=birth_date, birth_month=birth_date.month,
+                    birth_day=birth_date.day, created_at=datetime.now(),
+                    user_id=user_id))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def outbox(self, kind: str) -> list:
+        return self.session.query(EmailOutbox).filter(
+            EmailOutbox.kind == kind).order_by(EmailOutbox.id).all()
+
+    async def test_greetings_of_all_shards(self):
+        queued = 0
+        for shard in range(3):
+            queued += await dispatch_shard("greeting", TODAY, shard, 3,
+                                           self.session, chunk_size=3)
+        self.assertEqual(queued, 8)
+        emails = self.outbox("birthday_greeting")
+        self.assertEqual(
+            sorted(email.recipient for email in emails),
+            sorted(f"c{n}.u{u}@x.com" for n in (0, 1) for u in range(1, 5)))
+        email = next(email for email in emails
+                     if email.recipient == "c0.u2@x.com")
+        self.assertEqual(email.payload, {"first_name": "First0"})
+
+    async def test_reminders(self):
+        queued = await dispatch_shard("reminder", TODAY, 0, 1, self.session,
+                                      remind_days=1)
+        self.assertEqual(queued, 4)
+        email = self.outbox("birthday_reminder")[0]
+        self.assertEqual(email.recipient, "user1@x.com")
+        self.assertEqual(email.payload, {"contact_name": "First2 Last1",
+                                         "date": "2026-10-20", "days": 1})
+
+    async def test_second_run_queues_nothing(self):
+        await dispatch_shard("greeting", TODAY, 0, 1, self.session)
+        queued = await dispatch_shard("greeting", TODAY, 0, 1, self.session)
+        self.assertEqual(queued, 0)
+        self.assertEqual(len(self.outbox("birthday_greeting")), 8)
+
+    async def test_resumes_after_crash(self):
+        enqueue = repository_outbox.enqueue_emails
+        calls = []
+
+        async def crash_on_third_chunk(emails, db, commit=True):
+            calls.append(len(emails))
+            if len(calls) == 3:
+                raise RuntimeError("worker died")
+            return await enqueue(emails, db, commit)
+
+        with patch.object(repository_outbox, "enqueue_emails",
+                          new=crash_on_third_chunk):
+            with self.assertRaises(RuntimeError):
+                await dispatch_shard("greeting", TODAY, 0, 1, self.session,
+                                     chunk_size=2)
+        self.session.rollback()
+        self.assertEqual(len(self.outbox("birthday_greeting")), 4)
+        queued = await dispatch_shard("greeting", TODAY, 0, 1, self.session,
+                                      chunk_size=2)
+        self.assertEqual(queued, 4)
+        self.assertEqual(len(self.outbox("birthday_greeting")), 8)
+
+    async def test_dedupe_key_survives_lost_checkpoints(self):
+        await dispatch_shard("greeting", TODAY, 0, 1, self.session)
+        queued = await dispatch_shard("greeting", TODAY, 0, 2, self.session)
+        self.assertEqual(queued, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()